@@ -0,0 +1,311 @@
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import Date, bindparam, func, text
+from sqlalchemy.engine import Connection
+from sqlmodel import Session, select
+
+from .models import AnalyticsDailyRollup, JournalEntry, Mood
+
+
+# ---------------------------------------------------------
+# Mood / emotion analytics over incremental daily rollups
+# ---------------------------------------------------------
+# Every mood and (emotion-labelled) journal write adds or subtracts one
+# row's worth of counts in `analyticsdailyrollup`, keyed by
+# (source, day, mood, emotion_label), in the same transaction as the
+# write itself. Queries therefore read at most a few rows per day of the
+# requested range — never the mood or journal history — and aggregate
+# them column-wise with NumPy into day / week / month buckets.
+#
+# CLI:
+#   python -m app.analytics rebuild   recompute rollups from the source tables
+#   python -m app.analytics bench     time a one-year summary on synthetic data
+
+SOURCES = ("mood", "journal")
+GRANULARITIES = ("day", "week", "month")
+
+ANALYTICS_DEFAULT_DAYS = int(os.getenv("ANALYTICS_DEFAULT_DAYS", "365"))
+ANALYTICS_MAX_DAYS = int(os.getenv("ANALYTICS_MAX_DAYS", str(5 * 366)))
+ANALYTICS_DEFAULT_WINDOW = int(os.getenv("ANALYTICS_DEFAULT_WINDOW", "7"))
+
+_UPSERT = text(
+    "INSERT INTO analyticsdailyrollup"
+    " (source, day, mood, emotion_label, entries, score_sum, scored)"
+    " VALUES (:source, :day, :mood, :emotion_label, :entries, :score_sum, :scored)"
+    " ON CONFLICT (source, day, mood, emotion_label) DO UPDATE SET"
+    " entries = analyticsdailyrollup.entries + excluded.entries,"
+    " score_sum = analyticsdailyrollup.score_sum + excluded.score_sum,"
+    " scored = analyticsdailyrollup.scored + excluded.scored"
+).bindparams(bindparam("day", type_=Date))
+
+
+# -----------------------------
+# Incremental updates (writes)
+# -----------------------------
+def _delta(source: str, day: date, mood: Optional[str], label: Optional[str],
+           score: Optional[float], sign: int) -> dict:
+    return {
+        "source": source,
+        "day": day,
+        "mood": mood or "",
+        "emotion_label": label or "",
+        "entries": sign,
+        "score_sum": sign * score if score is not None else 0.0,
+        "scored": sign if score is not None else 0,
+    }
+
+
+def mood_delta(mood: Mood, sign: int = 1) -> dict:
+    """+1 when a mood is created, -1 when it is deleted."""
+    return _delta("mood", mood.date, mood.mood, mood.emotion_label, mood.emotion_score, sign)
+
+
+def journal_delta(entry: JournalEntry, sign: int = 1) -> Optional[dict]:
+    """Journal entries only count once they carry an emotion label."""
+    if not entry.emotion_label:
+        return None
+    return _delta("journal", entry.date, None, entry.emotion_label, entry.emotion_score, sign)
+
+
+def record(session: Session, deltas: Iterable[Optional[dict]]) -> None:
+    """Applies deltas in the caller's transaction (sync sessions). Does not commit."""
+    deltas = [d for d in deltas if d]
+    if deltas:
+        session.execute(_UPSERT, deltas)
+
+
+async def arecord(session, deltas: Iterable[Optional[dict]]) -> None:
+    """Async variant for routes (session from get_async_session). Does not commit."""
+    deltas = [d for d in deltas if d]
+    if deltas:
+        await session.execute(_UPSERT, deltas)
+
+
+def grouped_mood_deltas(session: Session, mood_ids: Sequence[int], sign: int = -1) -> List[dict]:
+    """Deltas for a set of moods, aggregated in SQL (bulk deletes)."""
+    if not mood_ids:
+        return []
+
+    rows = session.exec(
+        select(
+            Mood.date, Mood.mood, Mood.emotion_label,
+            func.count(), func.coalesce(func.sum(Mood.emotion_score), 0.0), func.count(Mood.emotion_score),
+        )
+        .where(Mood.id.in_(mood_ids))
+        .group_by(Mood.date, Mood.mood, Mood.emotion_label)
+    ).all()
+
+    return [
+        {
+            "source": "mood",
+            "day": day,
+            "mood": mood or "",
+            "emotion_label": label or "",
+            "entries": sign * count,
+            "score_sum": sign * float(score_sum),
+            "scored": sign * scored,
+        }
+        for day, mood, label, count, score_sum, scored in rows
+    ]
+
+
+def rebuild_rollups(conn: Connection) -> None:
+    """
+    Recomputes every rollup row from the mood and journal tables. Moods
+    archived by the daily reset (moodarchive) count as moods.
+    """
+    conn.execute(text("DELETE FROM analyticsdailyrollup"))
+    conn.execute(text(
+        "INSERT INTO analyticsdailyrollup"
+        " (source, day, mood, emotion_label, entries, score_sum, scored)"
+        " SELECT 'mood', date, mood, COALESCE(emotion_label, ''),"
+        " COUNT(*), COALESCE(SUM(emotion_score), 0), COUNT(emotion_score)"
+        " FROM (SELECT date, mood, emotion_label, emotion_score FROM mood"
+        " UNION ALL SELECT date, mood, emotion_label, emotion_score FROM moodarchive) AS moods"
+        " GROUP BY date, mood, COALESCE(emotion_label, '')"
+    ))
+    conn.execute(text(
+        "INSERT INTO analyticsdailyrollup"
+        " (source, day, mood, emotion_label, entries, score_sum, scored)"
+        " SELECT 'journal', date, '', emotion_label,"
+        " COUNT(*), COALESCE(SUM(emotion_score), 0), COUNT(emotion_score)"
+        " FROM journalentry WHERE emotion_label IS NOT NULL AND emotion_label != ''"
+        " GROUP BY date, emotion_label"
+    ))
+
+
+# -----------------------------
+# Queries
+# -----------------------------
+def rollup_statement(source: str, date_from: date, date_to: date):
+    R = AnalyticsDailyRollup
+    return (
+        select(R.day, R.mood, R.emotion_label, R.entries, R.score_sum, R.scored)
+        .where(R.source == source)
+        .where(R.day >= date_from)
+        .where(R.day <= date_to)
+        .where(R.entries > 0)
+    )
+
+
+def _nan_to_none(values: np.ndarray, digits: int = 4) -> List[Optional[float]]:
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+
+def _by_category(names: np.ndarray, row_period: np.ndarray, entries: np.ndarray,
+                 n_periods: int) -> Dict[str, List[int]]:
+    """{category: counts per period}; "" (not set) is left out."""
+    categories, codes = np.unique(names, return_inverse=True)
+    matrix = np.zeros((len(categories), n_periods), dtype=np.int64)
+    np.add.at(matrix, (codes, row_period), entries)
+    return {
+        str(name): matrix[i].tolist()
+        for i, name in enumerate(categories)
+        if name != ""
+    }
+
+
+def _windowed_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum of each trailing window (shorter at the start of the range)."""
+    cumulative = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    idx = np.arange(1, len(values) + 1)
+    return cumulative[idx] - cumulative[np.maximum(idx - window, 0)]
+
+
+def summarize(rows: Sequence[tuple], source: str, date_from: date, date_to: date,
+              granularity: str = "day", window: int = ANALYTICS_DEFAULT_WINDOW) -> dict:
+    """
+    Aggregates rollup rows (day, mood, emotion_label, entries, score_sum,
+    scored) into per-period counts, mean scores, rolling averages and
+    logging streaks.
+    """
+    start = np.datetime64(date_from, "D")
+    n_days = int((np.datetime64(date_to, "D") - start).astype(np.int64)) + 1
+
+    if rows:
+        days, moods, labels, entries, score_sum, scored = zip(*rows)
+    else:
+        days, moods, labels, entries, score_sum, scored = (), (), (), (), (), ()
+
+    day_idx = (np.array(days, dtype="datetime64[D]") - start).astype(np.int64)
+    moods = np.array(moods, dtype=str)
+    labels = np.array(labels, dtype=str)
+    entries = np.array(entries, dtype=np.int64)
+    score_sum = np.array(score_sum, dtype=np.float64)
+    scored = np.array(scored, dtype=np.int64)
+
+    # Bucket every day of the range into its period (weeks start Monday;
+    # day 0 of datetime64 was a Thursday)
+    grid = start + np.arange(n_days)
+    if granularity == "week":
+        period_start = grid - ((grid.astype(np.int64) + 3) % 7).astype("timedelta64[D]")
+    elif granularity == "month":
+        period_start = grid.astype("datetime64[M]").astype("datetime64[D]")
+    else:
+        period_start = grid
+    periods, day_to_period = np.unique(period_start, return_inverse=True)
+    n_periods = len(periods)
+    row_period = day_to_period[day_idx]
+
+    period_entries = np.bincount(row_period, weights=entries, minlength=n_periods)
+    period_score = np.bincount(row_period, weights=score_sum, minlength=n_periods)
+    period_scored = np.bincount(row_period, weights=scored, minlength=n_periods)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_score = np.where(period_scored > 0, period_score / period_scored, np.nan)
+
+        window = max(1, window)
+        window_scored = _windowed_sum(period_scored, window)
+        rolling_score = np.where(
+            window_scored > 0, _windowed_sum(period_score, window) / window_scored, np.nan
+        )
+        window_len = np.minimum(np.arange(1, n_periods + 1), window)
+        rolling_entries = _windowed_sum(period_entries, window) / window_len
+
+    # Streaks: runs of consecutive days with at least one entry. The
+    # current streak still counts if today has not been logged yet.
+    active = np.bincount(day_idx, weights=entries, minlength=n_days) > 0
+    edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    run_lengths = run_ends - run_starts
+    longest = int(run_lengths.max()) if len(run_lengths) else 0
+    current = int(run_lengths[-1]) if len(run_lengths) and run_ends[-1] >= n_days - 1 else 0
+
+    return {
+        "source": source,
+        "granularity": granularity,
+        "date_from": date_from,
+        "date_to": date_to,
+        "periods": periods.astype(object).tolist(),
+        "entries": period_entries.astype(np.int64).tolist(),
+        "by_mood": _by_category(moods, row_period, entries, n_periods),
+        "by_emotion": _by_category(labels, row_period, entries, n_periods),
+        "mean_emotion_score": _nan_to_none(mean_score),
+        "rolling_window": window,
+        "rolling_entries": [round(float(v), 4) for v in rolling_entries],
+        "rolling_mean_emotion_score": _nan_to_none(rolling_score),
+        "current_streak_days": current,
+        "longest_streak_days": longest,
+    }
+
+
+def default_range(date_from: Optional[date], date_to: Optional[date]) -> tuple:
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    return date_from, date_to
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _synthetic_rows(days: int) -> List[tuple]:
+    rng = np.random.default_rng(0)
+    first = date.today() - timedelta(days=days - 1)
+    moods = ["happy", "calm", "tired", "stressed", "sad"]
+    labels = ["joy", "sadness", "anger", "fear", "love", "surprise"]
+    rows = []
+    for offset in range(days):
+        day = first + timedelta(days=offset)
+        for _ in range(rng.integers(0, 4)):
+            n = int(rng.integers(1, 3))
+            rows.append((day, rng.choice(moods), rng.choice(labels), n, float(rng.random() * n), n))
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.analytics")
+    parser.add_argument("command", choices=["rebuild", "bench"])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    if args.command == "rebuild":
+        from .database import create_db_and_tables, engine
+
+        create_db_and_tables()
+        with engine.begin() as conn:
+            rebuild_rollups(conn)
+            count = conn.execute(text("SELECT COUNT(*) FROM analyticsdailyrollup")).scalar()
+        print(f"✔ Rebuilt analytics rollups: {count} row(s)")
+        return 0
+
+    rows = _synthetic_rows(args.days)
+    date_from, date_to = default_range(date.today() - timedelta(days=args.days - 1), None)
+    for granularity in GRANULARITIES:
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            summarize(rows, "mood", date_from, date_to, granularity)
+        elapsed_ms = 1000 * (time.perf_counter() - started) / args.repeat
+        print(f"{granularity:>5}: {len(rows)} rollup rows over {args.days} days -> {elapsed_ms:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+import copy
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from . import metrics
+
+
+# ---------------------------------------------------------
+# Google Calendar API client: bundled discovery, cached services
+# ---------------------------------------------------------
+# `googleapiclient.discovery.build("calendar", "v3")` fetches and parses
+# the discovery document on every call. Instead:
+#
+#   - the (trimmed) discovery document ships in app/discovery/ and is
+#     parsed once per process;
+#   - one service object is kept per user and reused until that user's
+#     stored credentials change;
+#   - requests run over a bounded pool of keep-alive httplib2
+#     connections (httplib2.Http is not thread-safe, so each request
+#     leases one for its duration).
+#
+# GOOGLE_CALENDAR_ROOT_URL points the client at another server, e.g.
+# the in-memory stand-in used by the tests (tests/calendar_standin.py),
+# so everything can be exercised without network access.
+
+DISCOVERY_PATH = Path(__file__).parent / "discovery" / "calendar_v3.json"
+GOOGLE_CALENDAR_ROOT_URL = os.getenv("GOOGLE_CALENDAR_ROOT_URL")
+
+GOOGLE_HTTP_POOL_SIZE = int(os.getenv("GOOGLE_HTTP_POOL_SIZE", "8"))
+GOOGLE_HTTP_TIMEOUT_S = float(os.getenv("GOOGLE_HTTP_TIMEOUT_S", "30"))
+GOOGLE_API_RETRIES = int(os.getenv("GOOGLE_API_RETRIES", "2"))
+
+FREEBUSY_CACHE_TTL_S = float(os.getenv("FREEBUSY_CACHE_TTL_S", "300"))
+FREEBUSY_CACHE_SIZE = int(os.getenv("FREEBUSY_CACHE_SIZE", "256"))
+
+_discovery: Optional[dict] = None
+_discovery_lock = threading.Lock()
+
+
+def load_discovery() -> dict:
+    """The bundled Calendar v3 discovery document (root URL overridable)."""
+    global _discovery
+
+    if _discovery is None:
+        with _discovery_lock:
+            if _discovery is None:
+                document = json.loads(DISCOVERY_PATH.read_text(encoding="utf-8"))
+                if GOOGLE_CALENDAR_ROOT_URL:
+                    root = GOOGLE_CALENDAR_ROOT_URL.rstrip("/") + "/"
+                    document["rootUrl"] = root
+                    document["mtlsRootUrl"] = root
+                    document["baseUrl"] = root + document["servicePath"]
+                _discovery = document
+
+    return _discovery
+
+
+# -----------------------------
+# HTTP connection pool
+# -----------------------------
+class HttpPool:
+    """Bounded pool of keep-alive httplib2.Http connections."""
+
+    def __init__(self, size: int, timeout: float):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.in_use = 0
+        self.leases = 0
+        self.waits = 0
+
+    def _take(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self.created < self.size:
+                import httplib2
+
+                self.created += 1
+                return httplib2.Http(timeout=self.timeout)
+            self.waits += 1
+
+        # Pool exhausted: wait for a connection to come back
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise RuntimeError("No Google API connection available (GOOGLE_HTTP_POOL_SIZE)")
+
+    @contextmanager
+    def lease(self, credentials) -> Iterator[Any]:
+        """An authorized http object backed by a pooled connection."""
+        from google_auth_httplib2 import AuthorizedHttp
+
+        http = self._take()
+        with self._lock:
+            self.in_use += 1
+            self.leases += 1
+        try:
+            yield AuthorizedHttp(credentials, http=http)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._idle.put(http)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self.created,
+                "in_use": self.in_use,
+                "leases": self.leases,
+                "waits": self.waits,
+            }
+
+
+# -----------------------------
+# Per-user service cache
+# -----------------------------
+class ServiceCache:
+    """
+    One Calendar service per user key. `fingerprint` identifies the
+    stored credentials; a different fingerprint rebuilds the service.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, Tuple[Hashable, Any, Any]] = {}
+        self.hits = 0
+        self.builds = 0
+        self.invalidations = 0
+
+    def get(self, user_key: Hashable, fingerprint: Hashable,
+            make_credentials: Callable[[], Any]) -> Tuple[Any, Any]:
+        """Returns (service, credentials)."""
+        with self._lock:
+            entry = self._entries.get(user_key)
+            if entry is not None and entry[0] == fingerprint:
+                self.hits += 1
+                return entry[1], entry[2]
+
+        from googleapiclient.discovery import build_from_document
+
+        credentials = make_credentials()
+        # build_from_document fixes up method descriptions in place, so
+        # each service gets its own copy of the document
+        service = build_from_document(copy.deepcopy(load_discovery()), credentials=credentials)
+
+        with self._lock:
+            self._entries[user_key] = (fingerprint, service, credentials)
+            self.builds += 1
+        return service, credentials
+
+    def invalidate(self, user_key: Hashable) -> None:
+        with self._lock:
+            if self._entries.pop(user_key, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "users": len(self._entries),
+                "hits": self.hits,
+                "builds": self.builds,
+                "invalidations": self.invalidations,
+            }
+
+
+# -----------------------------
+# Free/busy cache
+# -----------------------------
+class FreeBusyCache:
+    """
+    Busy intervals per (user key, window), kept FREEBUSY_CACHE_TTL_S.
+    Calendar writes made through this backend invalidate the user's
+    entries; changes made elsewhere show up once the entry expires.
+    """
+
+    def __init__(self, size: int, ttl_s: float):
+        self.size = max(1, size)
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[Hashable, Hashable], Tuple[float, List]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_key: Hashable, window: Hashable, fetch: Callable[[], List]) -> List:
+        key = (user_key, window)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        busy = fetch()
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, busy)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return busy
+
+    def invalidate(self, user_key: Hashable) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_key]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+http_pool = HttpPool(GOOGLE_HTTP_POOL_SIZE, GOOGLE_HTTP_TIMEOUT_S)
+service_cache = ServiceCache()
+freebusy_cache = FreeBusyCache(FREEBUSY_CACHE_SIZE, FREEBUSY_CACHE_TTL_S)
+
+
+def execute(request, credentials):
+    """Runs a googleapiclient request over a pooled connection."""
+    with http_pool.lease(credentials) as http:
+        return request.execute(http=http, num_retries=GOOGLE_API_RETRIES)
+
+
+def execute_batch(batch, credentials) -> None:
+    """Sends a BatchHttpRequest (one HTTP round trip) over a pooled connection."""
+    with http_pool.lease(credentials) as http:
+        batch.execute(http=http)
+
+
+def stats() -> dict:
+    return {
+        "root_url": GOOGLE_CALENDAR_ROOT_URL or "default",
+        "services": service_cache.stats(),
+        "http_pool": http_pool.stats(),
+        "freebusy": freebusy_cache.stats(),
+    }
+
+
+metrics.register("google_calendar", stats)
@@ -0,0 +1,251 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from . import calendar_client
+from .database import engine
+from .models import CalendarSyncLease, CalendarSyncRequest, CalendarSyncResult, Task, TaskCalendarLink
+
+
+# ---------------------------------------------------------
+# Task -> Google Calendar sync
+# ---------------------------------------------------------
+# Reconciles tasks that have a due_datetime with events on the user's
+# calendar. `taskcalendarlink` remembers, per user, which event belongs
+# to which task and the task's updated_at as of its last sync, so a
+# re-sync only sends:
+#
+#   insert  tasks with a due date and no event yet
+#   update  linked tasks whose updated_at moved since their last sync
+#   delete  events whose task was deleted or lost its due date
+#
+# Requests go out as Calendar batch requests of up to 50 calls each, so
+# a semester of tasks is a handful of HTTP round trips. Links are
+# committed after every batch; a failed call is simply retried by the
+# next sync.
+#
+# Only one sync per user runs at a time, across all workers: a sync
+# takes a lease row in `calendarsynclease` (like the scheduler's job
+# leases) and releases it when done; a crashed worker's lease expires
+# after CALENDAR_SYNC_LEASE_S.
+
+CALENDAR_ID = "primary"
+CALENDAR_BATCH_SIZE = min(50, max(1, int(os.getenv("CALENDAR_BATCH_SIZE", "50"))))
+CALENDAR_TIMEZONE = os.getenv("CALENDAR_TIMEZONE", "Asia/Kolkata")
+TASK_EVENT_DURATION_MIN = int(os.getenv("TASK_EVENT_DURATION_MIN", "60"))
+CALENDAR_SYNC_LEASE_S = float(os.getenv("CALENDAR_SYNC_LEASE_S", "300"))
+
+# (kind, task, link) — kind is "insert", "update" or "delete"
+Action = Tuple[str, Optional[Task], Optional[TaskCalendarLink]]
+
+
+
+class SyncInProgressError(Exception):
+    """Another calendar sync for the same user holds the lease."""
+
+
+def task_event_body(task: Task) -> dict:
+    start = task.due_datetime
+    end = start + timedelta(minutes=TASK_EVENT_DURATION_MIN)
+    summary = f"✔ {task.title}" if task.is_completed else task.title
+
+    return {
+        "summary": summary,
+        "description": task.description or "",
+        "start": {"dateTime": start.isoformat(), "timeZone": CALENDAR_TIMEZONE},
+        "end": {"dateTime": end.isoformat(), "timeZone": CALENDAR_TIMEZONE},
+        "extendedProperties": {"private": {"moodStudyTaskId": str(task.id)}},
+    }
+
+
+# -----------------------------
+# Planning
+# -----------------------------
+def plan_sync(session: Session, user_id: int, params: CalendarSyncRequest) -> List[Action]:
+    """Works out which calls `user_id`'s calendar needs, from their links."""
+    changed = (
+        select(Task, TaskCalendarLink)
+        .outerjoin(TaskCalendarLink, and_(
+            TaskCalendarLink.task_id == Task.id,
+            TaskCalendarLink.user_id == user_id,
+        ))
+        .where(Task.due_datetime.is_not(None))
+    )
+    if params.task_ids is not None:
+        changed = changed.where(Task.id.in_(params.task_ids))
+    if params.due_from:
+        changed = changed.where(Task.due_datetime >= params.due_from)
+    if params.due_to:
+        changed = changed.where(Task.due_datetime <= params.due_to)
+    if not params.include_completed:
+        changed = changed.where(Task.is_completed == False)  # noqa: E712
+    if not params.full:
+        changed = changed.where(or_(
+            TaskCalendarLink.task_id.is_(None),
+            Task.updated_at > TaskCalendarLink.synced_task_updated_at,
+        ))
+
+    actions: List[Action] = []
+    for task, link in session.exec(changed.order_by(Task.id)).all():
+        actions.append(("update" if link else "insert", task, link))
+
+    orphaned = (
+        select(TaskCalendarLink)
+        .outerjoin(Task, Task.id == TaskCalendarLink.task_id)
+        .where(TaskCalendarLink.user_id == user_id)
+        .where(or_(Task.id.is_(None), Task.due_datetime.is_(None)))
+    )
+    if params.task_ids is not None:
+        orphaned = orphaned.where(TaskCalendarLink.task_id.in_(params.task_ids))
+    for link in session.exec(orphaned).all():
+        actions.append(("delete", None, link))
+
+    return actions
+
+
+# -----------------------------
+# Lease (one sync per user)
+# -----------------------------
+def _acquire_lease(user_id: int, owner: str) -> bool:
+    now = datetime.utcnow()
+
+    with Session(engine) as session:
+        if session.get(CalendarSyncLease, user_id) is None:
+            session.add(CalendarSyncLease(user_id=user_id))
+            try:
+                session.commit()
+            except IntegrityError:
+                # Another worker created it first
+                session.rollback()
+
+        result = session.execute(
+            update(CalendarSyncLease)
+            .where(CalendarSyncLease.user_id == user_id)
+            .where(or_(
+                CalendarSyncLease.lease_expires_at.is_(None),
+                CalendarSyncLease.lease_expires_at < now,
+            ))
+            .values(lease_owner=owner, lease_expires_at=now + timedelta(seconds=CALENDAR_SYNC_LEASE_S))
+        )
+        session.commit()
+        return result.rowcount == 1
+
+
+def _release_lease(user_id: int, owner: str) -> None:
+    with Session(engine) as session:
+        session.execute(
+            update(CalendarSyncLease)
+            .where(CalendarSyncLease.user_id == user_id)
+            .where(CalendarSyncLease.lease_owner == owner)
+            .values(lease_owner=None, lease_expires_at=None)
+        )
+        session.commit()
+
+
+# -----------------------------
+# Execution
+# -----------------------------
+def _request_for(service, action: Action):
+    kind, task, link = action
+    events = service.events()
+
+    if kind == "insert":
+        return events.insert(calendarId=CALENDAR_ID, body=task_event_body(task))
+    if kind == "update":
+        return events.patch(calendarId=link.calendar_id, eventId=link.event_id, body=task_event_body(task))
+    return events.delete(calendarId=link.calendar_id, eventId=link.event_id)
+
+
+def _run_batches(service, credentials, actions: List[Action], result: CalendarSyncResult
+                 ) -> Iterator[Tuple[List[Action], Dict[str, tuple]]]:
+    """Sends actions in batches; yields each chunk with {request id: (response, error)}."""
+    for start in range(0, len(actions), CALENDAR_BATCH_SIZE):
+        chunk = actions[start:start + CALENDAR_BATCH_SIZE]
+        outcomes: Dict[str, tuple] = {}
+
+        def collect(request_id, response, exception):
+            outcomes[request_id] = (response, exception)
+
+        batch = service.new_batch_http_request(callback=collect)
+        for index, action in enumerate(chunk):
+            batch.add(_request_for(service, action), request_id=str(index))
+
+        calendar_client.execute_batch(batch, credentials)
+        result.batches += 1
+        yield chunk, outcomes
+
+
+def _status_of(exception) -> Optional[int]:
+    resp = getattr(exception, "resp", None)
+    return getattr(resp, "status", None)
+
+
+def _apply(session: Session, user_id: int, chunk: List[Action], outcomes: Dict[str, tuple],
+           result: CalendarSyncResult) -> List[Action]:
+    """Records one batch's results. Returns inserts to retry (event gone)."""
+    now = datetime.utcnow()
+    recreate: List[Action] = []
+
+    for index, (kind, task, link) in enumerate(chunk):
+        response, exception = outcomes.get(str(index), (None, RuntimeError("no response in batch")))
+        gone = exception is not None and _status_of(exception) in (404, 410)
+
+        if kind == "delete" and (exception is None or gone):
+            session.delete(link)
+            result.deleted += 1
+        elif kind == "update" and gone:
+            # Deleted on the calendar side: create it again
+            session.delete(link)
+            recreate.append(("insert", task, None))
+        elif exception is not None:
+            result.failed += 1
+            result.errors.append(f"{kind} task {task.id if task else link.task_id}: {exception}")
+        elif kind == "insert":
+            session.add(TaskCalendarLink(
+                user_id=user_id,
+                task_id=task.id,
+                calendar_id=CALENDAR_ID,
+                event_id=response["id"],
+                synced_task_updated_at=task.updated_at,
+                synced_at=now,
+            ))
+            result.inserted += 1
+        else:
+            link.synced_task_updated_at = task.updated_at
+            link.synced_at = now
+            session.add(link)
+            result.updated += 1
+
+    session.commit()
+    return recreate
+
+
+def sync_tasks(session: Session, service, credentials, user_id: int,
+               params: CalendarSyncRequest) -> CalendarSyncResult:
+    """
+    Runs a sync of every task to `user_id`'s calendar. Use a session with expire_on_commit=False: it commits
+    after every batch and keeps using the tasks it planned with. Raises
+    SyncInProgressError if a sync for this user is already running.
+    """
+    owner = uuid.uuid4().hex
+    if not _acquire_lease(user_id, owner):
+        raise SyncInProgressError(f"A calendar sync is already running for user {user_id}")
+
+    try:
+        result = CalendarSyncResult()
+        pending = plan_sync(session, user_id, params)
+
+        while pending:
+            recreate: List[Action] = []
+            for chunk, outcomes in _run_batches(service, credentials, pending, result):
+                recreate.extend(_apply(session, user_id, chunk, outcomes, result))
+            pending = recreate
+
+        return result
+    finally:
+        _release_lease(user_id, owner)
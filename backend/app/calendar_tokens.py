@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlmodel import Session, select
+
+from . import metrics
+from .database import engine
+from .models import User
+
+
+# ---------------------------------------------------------
+# Per-user Google Calendar tokens
+# ---------------------------------------------------------
+# OAuth tokens live on the user row (google_access_token,
+# google_refresh_token, google_token_expiry), so they survive restarts
+# and every worker sees the same ones. Reads go through a small
+# in-process cache; its TTL bounds how long a worker can miss another
+# worker's refresh.
+#
+# A scheduler job (refresh_expiring_tokens) refreshes access tokens
+# CALENDAR_REFRESH_AHEAD_S before they expire, so calendar requests
+# normally never pay for a token refresh. If one still refreshes
+# mid-request, persist_if_refreshed stores the new token.
+
+CALENDAR_CREDENTIAL_CACHE_TTL_S = float(os.getenv("CALENDAR_CREDENTIAL_CACHE_TTL_S", "300"))
+CALENDAR_REFRESH_AHEAD_S = float(os.getenv("CALENDAR_REFRESH_AHEAD_S", "900"))
+CALENDAR_REFRESH_INTERVAL_S = float(os.getenv("CALENDAR_REFRESH_INTERVAL_S", "300"))
+
+
+class StoredTokens(NamedTuple):
+    access_token: str
+    refresh_token: Optional[str]
+    expiry: Optional[datetime]  # naive UTC, as google-auth expects
+
+
+_lock = threading.Lock()
+_cache: Dict[int, Tuple[float, Optional[StoredTokens]]] = {}
+_stats = {"hits": 0, "loads": 0, "refreshed": 0, "refresh_failures": 0, "revoked": 0, "refreshed_in_request": 0}
+
+
+def _remember(user_id: int, tokens: Optional[StoredTokens]) -> None:
+    with _lock:
+        _cache[user_id] = (time.monotonic() + CALENDAR_CREDENTIAL_CACHE_TTL_S, tokens)
+
+
+def _count(counter: str) -> None:
+    with _lock:
+        _stats[counter] += 1
+
+
+# -----------------------------
+# Read / write
+# -----------------------------
+def load_tokens(user_id: int) -> Optional[StoredTokens]:
+    """The user's tokens, or None if their calendar is not connected."""
+    with _lock:
+        item = _cache.get(user_id)
+        if item is not None and item[0] > time.monotonic():
+            _stats["hits"] += 1
+            return item[1]
+
+    with Session(engine) as session:
+        user = session.get(User, user_id)
+        tokens = None
+        if user and user.google_access_token:
+            tokens = StoredTokens(user.google_access_token, user.google_refresh_token, user.google_token_expiry)
+
+    _remember(user_id, tokens)
+    _count("loads")
+    return tokens
+
+
+def save_tokens(user_id: int, access_token: str, refresh_token: Optional[str],
+                expiry: Optional[datetime]) -> Optional[StoredTokens]:
+    with Session(engine) as session:
+        user = session.get(User, user_id)
+        if user is None:
+            return None
+
+        user.google_access_token = access_token
+        # Google only sends a refresh token on the first consent
+        user.google_refresh_token = refresh_token or user.google_refresh_token
+        user.google_token_expiry = expiry
+        session.add(user)
+        session.commit()
+        tokens = StoredTokens(access_token, user.google_refresh_token, expiry)
+
+    _remember(user_id, tokens)
+    return tokens
+
+
+def clear_tokens(user_id: int) -> None:
+    with Session(engine) as session:
+        user = session.get(User, user_id)
+        if user is not None:
+            user.google_access_token = None
+            user.google_refresh_token = None
+            user.google_token_expiry = None
+            session.add(user)
+            session.commit()
+
+    _remember(user_id, None)
+
+
+def persist_if_refreshed(user_id: int, credentials) -> None:
+    """Stores a token that google-auth refreshed during a request."""
+    stored = load_tokens(user_id)
+    if credentials.token and (stored is None or credentials.token != stored.access_token):
+        save_tokens(user_id, credentials.token, credentials.refresh_token, credentials.expiry)
+        _count("refreshed_in_request")
+
+
+# -----------------------------
+# Background refresh (scheduler)
+# -----------------------------
+def _grant_revoked(error) -> bool:
+    """
+    True only for OAuth `invalid_grant` (revoked, expired or replaced
+    refresh token). google-auth raises RefreshError for transient token
+    endpoint failures too; those must not disconnect the user.
+    """
+    details = error.args[1] if len(error.args) > 1 else None
+    if isinstance(details, dict):
+        return details.get("error") == "invalid_grant"
+    return "invalid_grant" in str(error)
+
+
+def refresh_expiring_tokens() -> int:
+    """Refreshes every token expiring within CALENDAR_REFRESH_AHEAD_S. Returns the count."""
+    import google_auth_httplib2
+    import httplib2
+    from google.auth.exceptions import RefreshError
+
+    from .calendar_client import GOOGLE_HTTP_TIMEOUT_S
+    from .google_calendar import make_credentials
+
+    cutoff = datetime.utcnow() + timedelta(seconds=CALENDAR_REFRESH_AHEAD_S)
+    with Session(engine) as session:
+        rows = session.exec(
+            select(User.id, User.google_access_token, User.google_refresh_token, User.google_token_expiry)
+            .where(User.google_refresh_token.is_not(None))
+            .where(or_(User.google_token_expiry.is_(None), User.google_token_expiry < cutoff))
+        ).all()
+
+    request = google_auth_httplib2.Request(httplib2.Http(timeout=GOOGLE_HTTP_TIMEOUT_S))
+    refreshed = 0
+
+    for user_id, access_token, refresh_token, expiry in rows:
+        credentials = make_credentials(StoredTokens(access_token or "", refresh_token, expiry))
+        try:
+            credentials.refresh(request)
+        except RefreshError as e:
+            if _grant_revoked(e):
+                # Revoked or expired grant: the user has to connect again
+                print(f"✘ Calendar token refresh rejected for user {user_id}:", e)
+                clear_tokens(user_id)
+                _count("revoked")
+            else:
+                # Token endpoint 5xx / timeout etc.: keep the grant, retry next run
+                print(f"✘ Calendar token refresh failed for user {user_id}:", e)
+                _count("refresh_failures")
+            continue
+        except Exception as e:
+            print(f"✘ Calendar token refresh failed for user {user_id}:", e)
+            _count("refresh_failures")
+            continue
+
+        save_tokens(user_id, credentials.token, credentials.refresh_token, credentials.expiry)
+        refreshed += 1
+
+    with _lock:
+        _stats["refreshed"] += refreshed
+    return refreshed
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "cached_users": len(_cache),
+            "cache_ttl_s": CALENDAR_CREDENTIAL_CACHE_TTL_S,
+            "refresh_ahead_s": CALENDAR_REFRESH_AHEAD_S,
+            **_stats,
+        }
+
+
+metrics.register("google_calendar_tokens", stats)
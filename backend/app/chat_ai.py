@@ -1,9 +1,16 @@
+import asyncio
 import os
-from typing import Optional
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 
-import google.generativeai as genai
 from dotenv import load_dotenv
 
+from . import metrics
+from .prompt_cache import PromptCache
+from .readiness import track_load
+
 load_dotenv()
 
 # ----------------------------
@@ -15,10 +22,48 @@ if not GEMINI_API_KEY:
     # This block requires indentation after the 'if' statement
     print("WARNING: GEMINI_API_KEY not found in .env — AI features will not work.")
 
-genai.configure(api_key=GEMINI_API_KEY)
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "models/gemini-2.5-flash")
+GEMINI_TIMEOUT_S = float(os.getenv("GEMINI_TIMEOUT_S", "30"))
+# Max Gemini calls in flight from async routes; the rest wait in line
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+
+# Prompt-level response caches (see app/prompt_cache.py)
+CHAT_CACHE_ENABLED = os.getenv("CHAT_CACHE_ENABLED", "1") != "0"
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "512"))
+CHAT_CACHE_TTL_S = float(os.getenv("CHAT_CACHE_TTL_S", "600"))
+REFLECTION_CACHE_ENABLED = os.getenv("REFLECTION_CACHE_ENABLED", "1") != "0"
+REFLECTION_CACHE_SIZE = int(os.getenv("REFLECTION_CACHE_SIZE", "256"))
+REFLECTION_CACHE_TTL_S = float(os.getenv("REFLECTION_CACHE_TTL_S", "3600"))
+
+# The Gemini SDK is imported and configured on first use (see get_model)
+model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """Imports google.generativeai and builds the Gemini model once."""
+    global model
+
+    if model is not None:
+        return model
+
+    with _model_lock:
+        if model is None:
+            with track_load("gemini"):
+                import google.generativeai as genai
+
+                genai.configure(api_key=GEMINI_API_KEY)
+                model = genai.GenerativeModel(GEMINI_MODEL_NAME)
 
-# Load Gemini model
-model = genai.GenerativeModel("models/gemini-2.5-flash")
+    return model
+
+
+class EmptyReplyError(Exception):
+    """Gemini answered, but with no text."""
+
+
+class StreamInterruptedError(Exception):
+    """A streamed reply failed after some chunks were already sent."""
 
 
 # -----------------------------------------------------
@@ -54,16 +99,18 @@ def build_mood_context_text(
 
 
 # -----------------------------------------------------
-# Chat response generator — Study Buddy
+# Prompt builders
 # -----------------------------------------------------
-def generate_study_wellness_reply(
+CHAT_FALLBACK_EMPTY = "Let's take one small step. What would you like to work on? 😊"
+CHAT_FALLBACK_ERROR = "I'm here with you. Let's try again in a simple step. 💜"
+REFLECTION_FALLBACK_EMPTY = "Thanks for writing that. It sounds meaningful. Keep noticing your thoughts gently."
+REFLECTION_FALLBACK_ERROR = "Thanks for sharing. Keep being kind to yourself while you reflect. 🌿"
+
+
+def build_chat_prompt(
     user_message: str,
     mood_context: Optional[str] = None
 ) -> str:
-    """
-    Generates a short, friendly, aligned Study Buddy chat reply.
-    """
-    # Block starts here
     SYSTEM_PROMPT = """
 You are Study Buddy — a warm, concise academic support assistant.
 
@@ -83,39 +130,18 @@ Mood logic:
     if mood_context:
         SYSTEM_PROMPT += f"\nConsider this mood context: {mood_context}\n"
 
-    prompt = f"""
+    return f"""
 {SYSTEM_PROMPT}
 
 User: {user_message}
 Assistant:
 """
 
-    try:
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-
-        if not text:
-            return "Let's take one small step. What would you like to work on? 😊"
-
-        return text
 
-    except Exception as e:
-        print("Gemini API error:", e)
-        return "I'm here with you. Let's try again in a simple step. 💜"
-
-
-# -----------------------------------------------------
-# Journal AI reflection generator
-# -----------------------------------------------------
-def generate_reflection_text(
+def build_reflection_prompt(
     journal_text: str,
     emotion_label: Optional[str] = None
 ) -> str:
-    """
-    Generates a short reflective insight for a journal entry.
-    Used after saving a journal entry.
-    """
-    # Block starts here
     SYSTEM_PROMPT = """
 You are a gentle journal reflection assistant.
 Your job is to provide a short, warm reflection (2–3 sentences max).
@@ -133,7 +159,7 @@ Rules:
         if emotion_label else ""
     )
 
-    prompt = f"""
+    return f"""
 {SYSTEM_PROMPT}
 
 Journal Entry:
@@ -144,15 +170,268 @@ Journal Entry:
 Write the reflection:
 """
 
+
+def _reply_text(response) -> str:
+    text = response.text.strip()
+    if not text:
+        raise EmptyReplyError("Gemini returned an empty reply")
+    return text
+
+
+chat_cache = PromptCache("chat", CHAT_CACHE_ENABLED, CHAT_CACHE_SIZE, CHAT_CACHE_TTL_S)
+reflection_cache = PromptCache(
+    "reflection", REFLECTION_CACHE_ENABLED, REFLECTION_CACHE_SIZE, REFLECTION_CACHE_TTL_S
+)
+
+metrics.register("chat_cache", chat_cache.stats)
+metrics.register("reflection_cache", reflection_cache.stats)
+
+
+# -----------------------------------------------------
+# Sync client (background jobs, scripts)
+# -----------------------------------------------------
+def _generate(prompt: str, cache: PromptCache) -> str:
+    def call() -> str:
+        response = get_model().generate_content(
+            prompt, request_options={"timeout": GEMINI_TIMEOUT_S}
+        )
+        return _reply_text(response)
+
+    return cache.get_or_generate(prompt, call)
+
+
+# -----------------------------------------------------
+# Chat response generator — Study Buddy
+# -----------------------------------------------------
+def generate_study_wellness_reply(
+    user_message: str,
+    mood_context: Optional[str] = None
+) -> str:
+    """
+    Generates a short, friendly, aligned Study Buddy chat reply.
+    """
     try:
-        response = model.generate_content(prompt)
-        text = response.text.strip()
+        return _generate(build_chat_prompt(user_message, mood_context), chat_cache)
 
-        if not text:
-            return "Thanks for writing that. It sounds meaningful. Keep noticing your thoughts gently."
+    except EmptyReplyError:
+        return CHAT_FALLBACK_EMPTY
 
-        return text
+    except Exception as e:
+        print("Gemini API error:", e)
+        return CHAT_FALLBACK_ERROR
+
+
+# -----------------------------------------------------
+# Journal AI reflection generator
+# -----------------------------------------------------
+def request_reflection_text(
+    journal_text: str,
+    emotion_label: Optional[str] = None
+) -> str:
+    """
+    Calls Gemini for a short reflective insight on a journal entry.
+    Raises on API errors or an empty reply so callers can retry.
+    """
+    return _generate(build_reflection_prompt(journal_text, emotion_label), reflection_cache)
+
+
+def generate_reflection_text(
+    journal_text: str,
+    emotion_label: Optional[str] = None
+) -> str:
+    """
+    Generates a short reflective insight for a journal entry.
+    Never raises — falls back to a friendly default.
+    """
+    try:
+        return request_reflection_text(journal_text, emotion_label)
+
+    except EmptyReplyError:
+        return REFLECTION_FALLBACK_EMPTY
 
     except Exception as e:
         print("Gemini API error (reflection):", e)
-        return "Thanks for sharing. Keep being kind to yourself while you reflect. 🌿"
\ No newline at end of file
+        return REFLECTION_FALLBACK_ERROR
+
+
+# -----------------------------------------------------
+# Async client (used by async routes)
+# -----------------------------------------------------
+# One shared GenerativeModel (and its async gRPC channel) serves every
+# request. A semaphore caps concurrent calls; callers past the cap wait
+# on the event loop instead of holding a threadpool thread.
+
+class GeminiLimiter:
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self._semaphore = asyncio.Semaphore(self.limit)
+
+        self.waiting = 0
+        self.in_flight = 0
+        self.max_waiting = 0
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self._wait_total = 0.0
+        self._call_total = 0.0
+
+    @asynccontextmanager
+    async def slot(self):
+        queued = time.perf_counter()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        started = time.perf_counter()
+        self._wait_total += started - queued
+        self.in_flight += 1
+        try:
+            yield
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.calls += 1
+            self._call_total += time.perf_counter() - started
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.limit,
+            "timeout_s": GEMINI_TIMEOUT_S,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "avg_queue_wait_ms": round(self._wait_total / self.calls * 1000.0, 2) if self.calls else 0.0,
+            "avg_call_ms": round(self._call_total / self.calls * 1000.0, 2) if self.calls else 0.0,
+        }
+
+
+limiter = GeminiLimiter(GEMINI_MAX_CONCURRENCY)
+
+metrics.register("gemini", limiter.stats)
+
+
+async def _agenerate(prompt: str, cache: PromptCache, fresh: bool = False) -> str:
+    async def call() -> str:
+        async with limiter.slot():
+            response = await asyncio.wait_for(
+                get_model().generate_content_async(prompt), timeout=GEMINI_TIMEOUT_S
+            )
+        return _reply_text(response)
+
+    if fresh:
+        # Explicit regeneration: skip the cached reply, but keep the new one
+        text = await call()
+        cache.put(prompt, text)
+        return text
+
+    return await cache.aget_or_generate(prompt, call)
+
+
+async def agenerate_study_wellness_reply(
+    user_message: str,
+    mood_context: Optional[str] = None
+) -> str:
+    """Async version of generate_study_wellness_reply."""
+    try:
+        return await _agenerate(build_chat_prompt(user_message, mood_context), chat_cache)
+
+    except EmptyReplyError:
+        return CHAT_FALLBACK_EMPTY
+
+    except Exception as e:
+        print("Gemini API error:", repr(e))
+        return CHAT_FALLBACK_ERROR
+
+
+async def astream_study_wellness_reply(
+    user_message: str,
+    mood_context: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Streams a Study Buddy reply as text chunks, as Gemini produces them.
+    Falls back to the usual friendly defaults if nothing was generated;
+    raises StreamInterruptedError if Gemini fails part-way through.
+    A cached reply is sent as a single chunk; a completed stream is
+    stored in the chat cache.
+    """
+    prompt = build_chat_prompt(user_message, mood_context)
+
+    cached = chat_cache.get(prompt)
+    if cached is not None:
+        yield cached
+        return
+
+    produced = []
+
+    try:
+        async with limiter.slot():
+            response = await asyncio.wait_for(
+                get_model().generate_content_async(prompt, stream=True),
+                timeout=GEMINI_TIMEOUT_S,
+            )
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=GEMINI_TIMEOUT_S)
+                except StopAsyncIteration:
+                    break
+
+                text = chunk.text if chunk.parts else ""
+                if text:
+                    produced.append(text)
+                    yield text
+
+    except Exception as e:
+        print("Gemini API error (stream):", repr(e))
+        if produced:
+            # The caller already sent part of a reply; it must not look complete
+            raise StreamInterruptedError(str(e)) from e
+        yield CHAT_FALLBACK_ERROR
+        return
+
+    if not produced:
+        yield CHAT_FALLBACK_EMPTY
+        return
+
+    chat_cache.put(prompt, "".join(produced).strip())
+
+
+async def arequest_reflection_text(
+    journal_text: str,
+    emotion_label: Optional[str] = None,
+    fresh: bool = False
+) -> str:
+    """
+    Async version of request_reflection_text (raises on failure).
+    fresh=True bypasses the reflection cache (on-demand regeneration).
+    """
+    return await _agenerate(build_reflection_prompt(journal_text, emotion_label), reflection_cache, fresh)
+
+
+async def agenerate_reflection_text(
+    journal_text: str,
+    emotion_label: Optional[str] = None,
+    fresh: bool = False
+) -> str:
+    """Async version of generate_reflection_text (never raises)."""
+    try:
+        return await arequest_reflection_text(journal_text, emotion_label, fresh)
+
+    except EmptyReplyError:
+        return REFLECTION_FALLBACK_EMPTY
+
+    except Exception as e:
+        print("Gemini API error (reflection):", repr(e))
+        return REFLECTION_FALLBACK_ERROR
@@ -1,16 +1,219 @@
+import os
+from typing import AsyncIterator
+
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+load_dotenv()
+
+# ---------------------------------------------------------
+# Engine configuration
+# ---------------------------------------------------------
+# One node can run on SQLite (WAL, tuned pragmas on every connection);
+# larger deployments point DATABASE_URL at Postgres and get a pooled
+# engine. No code changes either way.
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///database.db")
+DB_ECHO = os.getenv("DB_ECHO", "0") == "1"
+
+# SQLite pragmas
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Server database pool (Postgres etc.)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", "30"))
+DB_POOL_RECYCLE_S = int(os.getenv("DB_POOL_RECYCLE_S", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") != "0"
+
+IS_SQLITE = make_url(DATABASE_URL).get_backend_name() == "sqlite"
+
+# Async routes use an AsyncSession (aiosqlite / asyncpg). DB_ASYNC=0 falls
+# back to the sync engine, run in the threadpool behind the same API.
+DB_ASYNC = os.getenv("DB_ASYNC", "1") != "0"
+
+# Sync driver -> async driver for the same database
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None or parsed.drivername.endswith(("aiosqlite", "asyncpg")):
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+
+def engine_options(url: str) -> dict:
+    """create_engine keyword arguments for the given database URL."""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {"connect_args": {"check_same_thread": False}}
+
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_S,
+        "pool_recycle": DB_POOL_RECYCLE_S,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None) -> None:
+    """Runs on every new SQLite connection (sync or async driver)."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
 
-DATABASE_URL = "sqlite:///database.db"
 
 engine = create_engine(
     DATABASE_URL,
-    echo=False,
-    connect_args={"check_same_thread": False}
+    echo=DB_ECHO,
+    **engine_options(DATABASE_URL)
 )
 
+if IS_SQLITE:
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+
 
 def create_db_and_tables():
+    """Creates missing tables, then applies pending schema migrations."""
+    from . import models  # noqa: F401  (registers every table, e.g. for the migrations CLI)
+    from .migrations import run_migrations
+
     SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
+
+
+def log_database_settings() -> dict:
+    """
+    Startup self-check: connects once and logs the settings actually in
+    effect (read back from the database, not just the config).
+    """
+    url = make_url(DATABASE_URL)
+    settings = {"backend": url.get_backend_name(), "url": url.render_as_string(hide_password=True)}
+
+    with engine.connect() as conn:
+        if IS_SQLITE:
+            for pragma in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size"):
+                settings[pragma] = conn.execute(text(f"PRAGMA {pragma}")).scalar()
+        else:
+            conn.execute(text("SELECT 1"))
+            settings.update(
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout_s=DB_POOL_TIMEOUT_S,
+                pool_recycle_s=DB_POOL_RECYCLE_S,
+                pool_pre_ping=DB_POOL_PRE_PING,
+                pool_status=engine.pool.status(),
+            )
+
+    print("✔ Database settings:", settings)
+    return settings
+
+
+# ---------------------------------------------------------
+# Async engine + session dependency
+# ---------------------------------------------------------
+async_engine = None
+
+
+def get_async_engine():
+    """Creates the async engine on first use (keeps aiosqlite/asyncpg lazy)."""
+    global async_engine
+
+    if async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        created = create_async_engine(
+            ASYNC_DATABASE_URL,
+            echo=DB_ECHO,
+            **engine_options(ASYNC_DATABASE_URL)
+        )
+        if IS_SQLITE:
+            event.listen(created.sync_engine, "connect", apply_sqlite_pragmas)
+        async_engine = created
+
+    return async_engine
+
+
+class SyncSessionAdapter:
+    """
+    Fallback for DB_ASYNC=0: wraps a sync Session with the awaitable
+    subset of the AsyncSession API used by the routes, running each call
+    in the threadpool.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def add(self, instance) -> None:
+        self.session.add(instance)
+
+    def expire_all(self) -> None:
+        self.session.expire_all()
+
+    async def exec(self, statement):
+        return await run_in_threadpool(self.session.exec, statement)
+
+    async def execute(self, statement, params=None):
+        return await run_in_threadpool(self.session.execute, statement, params)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(lambda: self.session.get(entity, ident, **kwargs))
+
+    async def delete(self, instance) -> None:
+        await run_in_threadpool(self.session.delete, instance)
+
+    async def flush(self) -> None:
+        await run_in_threadpool(self.session.flush)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.session.commit)
+
+    async def refresh(self, instance) -> None:
+        await run_in_threadpool(self.session.refresh, instance)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.session.rollback)
+
+
+async def get_async_session() -> AsyncIterator:
+    """
+    Dependency for async routes. Yields an AsyncSession, or the sync
+    fallback adapter when DB_ASYNC=0.
+    """
+    if DB_ASYNC:
+        async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+            yield session
+    else:
+        session = Session(engine, expire_on_commit=False)
+        try:
+            yield SyncSessionAdapter(session)
+        finally:
+            await run_in_threadpool(session.close)
+
+
+async def dispose_async_engine() -> None:
+    if async_engine is not None:
+        await async_engine.dispose()
 
 
 def get_session():
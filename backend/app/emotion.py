@@ -1,17 +1,33 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch.nn.functional as F
+import os
+import threading
+from typing import List, Optional, Tuple
+
+from . import metrics
+from .emotion_batching import EmotionBatcher
+from .emotion_cache import EmotionCache
+from .readiness import track_load
 
 
 # ---------------------------------------------------------
 # Load emotion model (DistilBERT fine-tuned on emotions)
 # ---------------------------------------------------------
 
-MODEL_NAME = "bhadresh-savani/distilbert-base-uncased-emotion"
+MODEL_NAME = os.getenv("EMOTION_MODEL_NAME", "bhadresh-savani/distilbert-base-uncased-emotion")
+MODEL_REVISION = os.getenv("EMOTION_MODEL_REVISION", "main")
+
+# Which inference backend serves the model: torch | torch-int8 | onnx
+# (see app/emotion_backends.py for export, parity check and benchmark)
+EMOTION_BACKEND = os.getenv("EMOTION_BACKEND", "torch")
+EMOTION_ONNX_PATH = os.getenv("EMOTION_ONNX_PATH", "models/emotion.onnx")
+EMOTION_TORCH_THREADS = int(os.getenv("EMOTION_TORCH_THREADS", "0")) or None
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
+# Journal embeddings are tagged with this, so vectors from a different
+# checkpoint are never compared (see app/journal_embeddings.py)
+EMBEDDING_MODEL_ID = f"{MODEL_NAME}@{MODEL_REVISION}"
 
+# The backend (and torch/transformers with it) is loaded on first use
+backend = None
+_load_lock = threading.Lock()
 
 LABELS = [
     "sadness",
@@ -23,6 +39,151 @@ LABELS = [
 ]
 
 
+# ---------------------------------------------------------
+# Micro-batching config
+# ---------------------------------------------------------
+EMOTION_BATCHING_ENABLED = os.getenv("EMOTION_BATCHING_ENABLED", "1") != "0"
+EMOTION_BATCH_MAX_SIZE = int(os.getenv("EMOTION_BATCH_MAX_SIZE", "16"))
+EMOTION_BATCH_MAX_WAIT_MS = float(os.getenv("EMOTION_BATCH_MAX_WAIT_MS", "5"))
+# Texts per forward pass for bulk scoring (POST /emotion/batch)
+EMOTION_BULK_CHUNK_SIZE = int(os.getenv("EMOTION_BULK_CHUNK_SIZE", "32"))
+
+# ---------------------------------------------------------
+# Worker process pool config (0 = run inference in this process)
+# ---------------------------------------------------------
+EMOTION_WORKERS = int(os.getenv("EMOTION_WORKERS", "0"))
+EMOTION_WORKER_THREADS = int(os.getenv("EMOTION_WORKER_THREADS", "0")) or None
+EMOTION_WORKER_TIMEOUT_S = float(os.getenv("EMOTION_WORKER_TIMEOUT_S", "30"))
+
+# ---------------------------------------------------------
+# Prediction cache config
+# ---------------------------------------------------------
+EMOTION_CACHE_ENABLED = os.getenv("EMOTION_CACHE_ENABLED", "1") != "0"
+EMOTION_CACHE_SIZE = int(os.getenv("EMOTION_CACHE_SIZE", "2048"))
+# Empty path keeps the cache in memory only
+EMOTION_CACHE_PATH = os.getenv("EMOTION_CACHE_PATH", "emotion_cache.db")
+
+
+# ---------------------------------------------------------
+# Lazy model loading
+# ---------------------------------------------------------
+def load_model():
+    """Builds the configured inference backend once."""
+    global backend
+
+    if backend is not None:
+        return backend
+
+    with _load_lock:
+        if backend is None:
+            with track_load("emotion_model"):
+                from .emotion_backends import create_backend
+
+                backend = create_backend(
+                    EMOTION_BACKEND,
+                    MODEL_NAME,
+                    MODEL_REVISION,
+                    EMOTION_TORCH_THREADS,
+                    onnx_path=EMOTION_ONNX_PATH,
+                )
+
+    return backend
+
+
+worker_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """Starts the out-of-process worker pool once (EMOTION_WORKERS > 0)."""
+    global worker_pool
+
+    if worker_pool is not None:
+        return worker_pool
+
+    with _pool_lock:
+        if worker_pool is None:
+            with track_load("emotion_workers"):
+                from .emotion_workers import EmotionWorkerPool
+
+                pool = EmotionWorkerPool(
+                    EMOTION_WORKERS,
+                    torch_threads=EMOTION_WORKER_THREADS,
+                    timeout=EMOTION_WORKER_TIMEOUT_S,
+                )
+                worker_pool = pool.start()
+                metrics.register("emotion_workers", worker_pool.stats)
+
+    return worker_pool
+
+
+def warm_up():
+    """Loads whatever serves inference: the worker pool or the local model."""
+    if EMOTION_WORKERS > 0:
+        return get_worker_pool()
+    return load_model()
+
+
+def shutdown():
+    if worker_pool is not None:
+        worker_pool.shutdown()
+
+
+# ---------------------------------------------------------
+# Batched forward pass
+# ---------------------------------------------------------
+def predict_emotions(texts: List[str], with_embeddings: bool = False) -> List[dict]:
+    """
+    Runs one forward pass over a list of texts.
+    Inputs are padded to the longest text in the batch, not to the
+    model maximum, so short batches stay cheap.
+    With EMOTION_WORKERS > 0 the batch is sent to the worker pool.
+    With `with_embeddings`, each result also carries "embedding": the
+    text's float16 sentence vector from the same pass.
+    """
+    if EMOTION_WORKERS > 0:
+        return get_worker_pool().predict(texts, with_embeddings)
+
+    from .emotion_backends import softmax
+
+    embeddings = None
+    if with_embeddings:
+        logits, embeddings = load_model().predict_with_embeddings(texts)
+    else:
+        logits = load_model().predict_logits(texts)
+
+    probs = softmax(logits)
+    indices = probs.argmax(axis=1)
+    scores = probs.max(axis=1)
+
+    results = [
+        {"label": LABELS[index], "score": round(float(score), 4)}
+        for score, index in zip(scores.tolist(), indices.tolist())
+    ]
+    if embeddings is not None:
+        for result, embedding in zip(results, embeddings.astype("float16")):
+            result["embedding"] = embedding
+    return results
+
+
+batcher = EmotionBatcher(
+    predict_emotions,
+    max_batch_size=EMOTION_BATCH_MAX_SIZE,
+    max_wait_ms=EMOTION_BATCH_MAX_WAIT_MS,
+)
+
+metrics.register("emotion_batching", batcher.stats)
+
+cache = EmotionCache(
+    # Quantized/ONNX scores differ slightly, so each backend gets its own entries
+    model_id=f"{MODEL_NAME}@{MODEL_REVISION}#{EMOTION_BACKEND}",
+    max_entries=EMOTION_CACHE_SIZE,
+    path=EMOTION_CACHE_PATH or None,
+)
+
+metrics.register("emotion_cache", cache.stats)
+
+
 # ---------------------------------------------------------
 # Function used by journal + mood
 # ---------------------------------------------------------
@@ -35,19 +196,20 @@ def analyze_emotion_text(text: str):
     }
     """
     try:
-        inputs = tokenizer(text, return_tensors="pt", truncation=True)
-        outputs = model(**inputs)
-        probs = F.softmax(outputs.logits, dim=1)
+        if EMOTION_CACHE_ENABLED:
+            cached = cache.get(text)
+            if cached is not None:
+                return cached
 
-        score, index = torch.max(probs, dim=1)
+        if EMOTION_BATCHING_ENABLED:
+            result = batcher.predict(text)
+        else:
+            result = predict_emotions([text])[0]
 
-        emotion_label = LABELS[index.item()]
-        emotion_score = round(score.item(), 4)
+        if EMOTION_CACHE_ENABLED:
+            cache.put(text, result)
 
-        return {
-            "label": emotion_label,
-            "score": emotion_score
-        }
+        return result
 
     except Exception as e:
         print("Emotion model error:", e)
@@ -55,3 +217,75 @@ def analyze_emotion_text(text: str):
             "label": None,
             "score": None
         }
+
+
+# ---------------------------------------------------------
+# Bulk scoring (already batched — skips the micro-batcher)
+# ---------------------------------------------------------
+def analyze_emotion_batch(texts: List[str]) -> List[dict]:
+    """
+    Scores a list of texts, returning results in the same order.
+    Cached texts are answered from the cache; the rest go through the
+    model in one forward pass per EMOTION_BULK_CHUNK_SIZE texts.
+    """
+    results: List[dict] = [None] * len(texts)
+    missing: List[int] = []
+
+    for i, text in enumerate(texts):
+        cached = cache.get(text) if EMOTION_CACHE_ENABLED else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            missing.append(i)
+
+    for start in range(0, len(missing), max(1, EMOTION_BULK_CHUNK_SIZE)):
+        chunk = missing[start:start + EMOTION_BULK_CHUNK_SIZE]
+        try:
+            predictions = predict_emotions([texts[i] for i in chunk])
+        except Exception as e:
+            print("Emotion model error (batch):", e)
+            predictions = [{"label": None, "score": None}] * len(chunk)
+        else:
+            if EMOTION_CACHE_ENABLED:
+                for i, prediction in zip(chunk, predictions):
+                    cache.put(texts[i], prediction)
+
+        for i, prediction in zip(chunk, predictions):
+            results[i] = prediction
+
+    return results
+
+
+# ---------------------------------------------------------
+# Embeddings (journal similarity search)
+# ---------------------------------------------------------
+def analyze_emotion_with_embedding(text: str) -> Tuple[dict, Optional[object]]:
+    """
+    Label + score and the text's float16 embedding, from one forward
+    pass. Skips the micro-batcher (background use only); the label still
+    fills the prediction cache. If the embedding pass fails (e.g. an
+    ONNX model exported without the embeddings output), the label comes
+    from the plain path and the embedding is None.
+    """
+    try:
+        result = predict_emotions([text], with_embeddings=True)[0]
+    except Exception as e:
+        print("Emotion embedding error, falling back to label only:", e)
+        return analyze_emotion_text(text), None
+
+    embedding = result.pop("embedding")
+    if EMOTION_CACHE_ENABLED:
+        cache.put(text, result)
+    return result, embedding
+
+
+def embed_texts(texts: List[str]):
+    """(len(texts), hidden) float16 embeddings, EMOTION_BULK_CHUNK_SIZE texts per pass."""
+    import numpy as np
+
+    chunk_size = max(1, EMOTION_BULK_CHUNK_SIZE)
+    vectors = []
+    for start in range(0, len(texts), chunk_size):
+        results = predict_emotions(texts[start:start + chunk_size], with_embeddings=True)
+        vectors.extend(result["embedding"] for result in results)
+    return np.stack(vectors)
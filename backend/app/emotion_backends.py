@@ -0,0 +1,367 @@
+import argparse
+import statistics
+import sys
+import time
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+# ---------------------------------------------------------
+# Inference backends for the emotion classifier
+# ---------------------------------------------------------
+# Every backend serves the same DistilBERT checkpoint and returns raw
+# logits as a (batch, num_labels) float32 array — and, from the same
+# forward pass, sentence embeddings: the last hidden layer mean-pooled
+# over real (non-padding) tokens and L2-normalized, (batch, hidden):
+#
+#   torch       eager PyTorch (reference)
+#   torch-int8  PyTorch with Linear layers dynamically quantized to int8
+#   onnx        ONNX Runtime over a graph exported with `export`
+#
+# CLI:
+#   python -m app.emotion_backends export [--output PATH]
+#   python -m app.emotion_backends parity --backend onnx
+#   python -m app.emotion_backends bench [--backends torch,torch-int8,onnx]
+
+BACKEND_NAMES = ["torch", "torch-int8", "onnx"]
+
+
+class EmotionBackend(ABC):
+    name = "base"
+
+    def __init__(self, model_name: str, revision: str = "main", num_threads: Optional[int] = None):
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.revision = revision
+        self.num_threads = num_threads
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, revision=revision)
+
+    def tokenize(self, texts: List[str], return_tensors: str):
+        # Dynamic padding: pad to the longest text in the batch
+        return self.tokenizer(
+            texts, return_tensors=return_tensors, truncation=True, padding=True
+        )
+
+    @abstractmethod
+    def predict_logits(self, texts: List[str]) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def predict_with_embeddings(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(logits, embeddings) from one forward pass."""
+
+
+def mean_pool(hidden, attention_mask):
+    """Mean of the token vectors, padding excluded, L2-normalized (torch tensors)."""
+    import torch
+
+    mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+    pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+    return torch.nn.functional.normalize(pooled, p=2, dim=1)
+
+
+class TorchBackend(EmotionBackend):
+    name = "torch"
+
+    def __init__(self, model_name: str, revision: str = "main", num_threads: Optional[int] = None):
+        super().__init__(model_name, revision, num_threads)
+
+        import torch
+        from transformers import AutoModelForSequenceClassification
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        self.model = AutoModelForSequenceClassification.from_pretrained(
+            model_name, revision=revision
+        )
+        self.model.eval()
+
+    def predict_logits(self, texts: List[str]) -> np.ndarray:
+        import torch
+
+        inputs = self.tokenize(texts, "pt")
+        with torch.inference_mode():
+            logits = self.model(**inputs).logits
+        return logits.float().numpy()
+
+    def predict_with_embeddings(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        import torch
+
+        inputs = self.tokenize(texts, "pt")
+        with torch.inference_mode():
+            outputs = self.model(**inputs, output_hidden_states=True)
+            embeddings = mean_pool(outputs.hidden_states[-1], inputs["attention_mask"])
+        return outputs.logits.float().numpy(), embeddings.float().numpy()
+
+
+class QuantizedTorchBackend(TorchBackend):
+    name = "torch-int8"
+
+    def __init__(self, model_name: str, revision: str = "main", num_threads: Optional[int] = None):
+        super().__init__(model_name, revision, num_threads)
+
+        import torch
+
+        self.model = torch.ao.quantization.quantize_dynamic(
+            self.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        self.model.eval()
+
+
+class OnnxBackend(EmotionBackend):
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_name: str,
+        revision: str = "main",
+        num_threads: Optional[int] = None,
+        onnx_path: str = "models/emotion.onnx",
+    ):
+        super().__init__(model_name, revision, num_threads)
+
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError(
+                "EMOTION_BACKEND=onnx requires the optional 'onnxruntime' package"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        try:
+            self.session = ort.InferenceSession(
+                onnx_path, options, providers=["CPUExecutionProvider"]
+            )
+        except Exception as e:
+            raise RuntimeError(
+                f"Could not open ONNX model at {onnx_path} "
+                f"(run `python -m app.emotion_backends export`): {e}"
+            )
+
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.output_names = {o.name for o in self.session.get_outputs()}
+        self.onnx_path = onnx_path
+
+    def _feed(self, texts: List[str]) -> dict:
+        inputs = self.tokenize(texts, "np")
+        return {
+            name: np.asarray(value, dtype=np.int64)
+            for name, value in inputs.items()
+            if name in self.input_names
+        }
+
+    def predict_logits(self, texts: List[str]) -> np.ndarray:
+        logits = self.session.run(["logits"], self._feed(texts))[0]
+        return np.asarray(logits, dtype=np.float32)
+
+    def predict_with_embeddings(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        if "embeddings" not in self.output_names:
+            raise RuntimeError(
+                f"ONNX model at {self.onnx_path} has no embeddings output "
+                "(re-run `python -m app.emotion_backends export`)"
+            )
+        logits, embeddings = self.session.run(["logits", "embeddings"], self._feed(texts))
+        return np.asarray(logits, dtype=np.float32), np.asarray(embeddings, dtype=np.float32)
+
+
+def create_backend(
+    name: str,
+    model_name: str,
+    revision: str = "main",
+    num_threads: Optional[int] = None,
+    onnx_path: str = "models/emotion.onnx",
+) -> EmotionBackend:
+    if name == "torch":
+        return TorchBackend(model_name, revision, num_threads)
+    if name == "torch-int8":
+        return QuantizedTorchBackend(model_name, revision, num_threads)
+    if name == "onnx":
+        return OnnxBackend(model_name, revision, num_threads, onnx_path=onnx_path)
+    raise ValueError(f"Unknown emotion backend {name!r} (expected one of {BACKEND_NAMES})")
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+# ---------------------------------------------------------
+# Export
+# ---------------------------------------------------------
+def export_onnx(model_name: str, revision: str, output_path: str, opset: int = 14) -> str:
+    """
+    Exports the eager model to ONNX with dynamic batch/sequence axes and
+    two outputs: logits and (mean-pooled) embeddings.
+    """
+    import os
+
+    import torch
+
+    class WithEmbeddings(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            outputs = self.model(
+                input_ids=input_ids, attention_mask=attention_mask, output_hidden_states=True
+            )
+            return outputs.logits, mean_pool(outputs.hidden_states[-1], attention_mask)
+
+    reference = TorchBackend(model_name, revision)
+    sample = reference.tokenize(["exporting the emotion model"], "pt")
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    dynamic = {0: "batch", 1: "sequence"}
+    torch.onnx.export(
+        WithEmbeddings(reference.model).eval(),
+        (sample["input_ids"], sample["attention_mask"]),
+        output_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits", "embeddings"],
+        dynamic_axes={
+            "input_ids": dynamic,
+            "attention_mask": dynamic,
+            "logits": {0: "batch"},
+            "embeddings": {0: "batch"},
+        },
+        opset_version=opset,
+    )
+    return output_path
+
+
+# ---------------------------------------------------------
+# Parity check + benchmark
+# ---------------------------------------------------------
+SAMPLE_TEXTS = [
+    "I finally finished my assignment and I feel great!",
+    "I'm so stressed about the exam tomorrow, I can't focus.",
+    "Nothing special happened today.",
+    "I miss my family so much since moving for university.",
+    "Why does my group never do their part? This is so annoying.",
+    "I can't believe I got the scholarship!",
+    "I'm scared I will fail this semester.",
+    "Studying with friends made the evening really fun.",
+    "I feel lonely in the library late at night.",
+    "My professor's feedback was kind and encouraging.",
+    "I woke up late and missed the lecture again.",
+    "I love how calm the campus is in the morning.",
+]
+
+
+def parity_check(candidate: EmotionBackend, reference: EmotionBackend, texts: List[str]) -> dict:
+    ref_logits, ref_embeddings = reference.predict_with_embeddings(texts)
+    cand_logits, cand_embeddings = candidate.predict_with_embeddings(texts)
+    ref_probs = softmax(ref_logits)
+    cand_probs = softmax(cand_logits)
+
+    ref_labels = ref_probs.argmax(axis=1)
+    cand_labels = cand_probs.argmax(axis=1)
+    ref_scores = ref_probs.max(axis=1)
+    cand_scores = cand_probs[np.arange(len(texts)), ref_labels]
+
+    return {
+        "backend": candidate.name,
+        "texts": len(texts),
+        "label_agreement": float((ref_labels == cand_labels).mean()),
+        "max_score_diff": float(np.abs(ref_scores - cand_scores).max()),
+        "mean_score_diff": float(np.abs(ref_scores - cand_scores).mean()),
+        # Both are unit vectors, so the row-wise dot product is the cosine
+        "min_embedding_cosine": float((ref_embeddings * cand_embeddings).sum(axis=1).min()),
+    }
+
+
+def benchmark(backend: EmotionBackend, texts: List[str], batch_size: int, iterations: int) -> dict:
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    backend.predict_logits(batches[0])  # warm-up
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for batch in batches:
+            t0 = time.perf_counter()
+            backend.predict_logits(batch)
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "backend": backend.name,
+        "batch_size": batch_size,
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        "throughput_texts_per_s": round(len(texts) * iterations / elapsed, 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from . import emotion
+
+    parser = argparse.ArgumentParser(prog="python -m app.emotion_backends")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = sub.add_parser("export", help="export the model to ONNX")
+    export_cmd.add_argument("--output", default=emotion.EMOTION_ONNX_PATH)
+    export_cmd.add_argument("--opset", type=int, default=14)
+
+    parity_cmd = sub.add_parser("parity", help="compare a backend with eager torch")
+    parity_cmd.add_argument("--backend", choices=BACKEND_NAMES, default="onnx")
+    parity_cmd.add_argument("--min-agreement", type=float, default=1.0)
+    parity_cmd.add_argument("--max-score-diff", type=float, default=0.02)
+    parity_cmd.add_argument("--min-embedding-cosine", type=float, default=0.99)
+
+    bench_cmd = sub.add_parser("bench", help="latency/throughput per backend")
+    bench_cmd.add_argument("--backends", default=",".join(BACKEND_NAMES))
+    bench_cmd.add_argument("--batch-size", type=int, default=emotion.EMOTION_BATCH_MAX_SIZE)
+    bench_cmd.add_argument("--iterations", type=int, default=20)
+
+    args = parser.parse_args(argv)
+
+    def build(name: str) -> EmotionBackend:
+        return create_backend(
+            name,
+            emotion.MODEL_NAME,
+            emotion.MODEL_REVISION,
+            emotion.EMOTION_TORCH_THREADS,
+            onnx_path=emotion.EMOTION_ONNX_PATH,
+        )
+
+    if args.command == "export":
+        path = export_onnx(emotion.MODEL_NAME, emotion.MODEL_REVISION, args.output, args.opset)
+        print("✔ Exported ONNX model to", path)
+        return 0
+
+    if args.command == "parity":
+        result = parity_check(build(args.backend), build("torch"), SAMPLE_TEXTS)
+        print(result)
+        ok = (
+            result["label_agreement"] >= args.min_agreement
+            and result["max_score_diff"] <= args.max_score_diff
+            and result["min_embedding_cosine"] >= args.min_embedding_cosine
+        )
+        print("✔ Parity OK" if ok else "✘ Parity check failed")
+        return 0 if ok else 1
+
+    texts = SAMPLE_TEXTS * max(1, args.batch_size // len(SAMPLE_TEXTS) + 1)
+    for name in args.backends.split(","):
+        try:
+            print(benchmark(build(name.strip()), texts, args.batch_size, args.iterations))
+        except Exception as e:
+            print(f"{name}: skipped ({e})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
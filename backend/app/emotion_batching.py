@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+
+# ---------------------------------------------------------
+# Dynamic micro-batching for the emotion classifier
+# ---------------------------------------------------------
+# Concurrent callers submit single texts. A worker thread waits up to
+# `max_wait_ms` after the first queued text for more to arrive, then runs
+# them through `run_batch` in one forward pass and hands each caller its
+# own result.
+
+class EmotionBatcher:
+    def __init__(
+        self,
+        run_batch: Callable[[List[str]], List[dict]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._queue: Deque[Tuple[str, Future, float]] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+        # Metrics (guarded by self._cond)
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._max_queue_depth = 0
+        self._largest_batch = 0
+        self._batch_sizes: Dict[int, int] = {}
+        self._queue_wait_total = 0.0
+        self._batch_time_total = 0.0
+
+    # -----------------------------
+    # Public API
+    # -----------------------------
+    def submit(self, text: str) -> Future:
+        """Queues one text and returns a Future resolving to its result."""
+        future: Future = Future()
+
+        with self._cond:
+            self._ensure_worker()
+            self._queue.append((text, future, time.perf_counter()))
+            self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+            self._cond.notify()
+
+        return future
+
+    def predict(self, text: str, timeout: Optional[float] = None) -> dict:
+        """Blocking helper: submit a text and wait for its result."""
+        return self.submit(text).result(timeout=timeout)
+
+    def stats(self) -> dict:
+        with self._cond:
+            batches = self._batches
+            items = self._items
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self._max_queue_depth,
+                "batches": batches,
+                "items": items,
+                "errors": self._errors,
+                "avg_batch_size": round(items / batches, 2) if batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "avg_queue_wait_ms": round(self._queue_wait_total / items * 1000.0, 3) if items else 0.0,
+                "avg_batch_time_ms": round(self._batch_time_total / batches * 1000.0, 3) if batches else 0.0,
+            }
+
+    # -----------------------------
+    # Worker
+    # -----------------------------
+    def _ensure_worker(self) -> None:
+        # Called with self._cond held
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._worker_loop, name="emotion-batcher", daemon=True
+            )
+            self._thread.start()
+
+    def _next_batch(self) -> List[Tuple[str, Future, float]]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+
+            # Give other callers until max_wait after the oldest item
+            deadline = self._queue[0][2] + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            size = min(len(self._queue), self.max_batch_size)
+            return [self._queue.popleft() for _ in range(size)]
+
+    def _worker_loop(self) -> None:
+        while True:
+            batch = self._next_batch()
+            texts = [text for text, _, _ in batch]
+            started = time.perf_counter()
+
+            try:
+                results = self.run_batch(texts)
+            except Exception as e:
+                with self._cond:
+                    self._errors += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            with self._cond:
+                self._batches += 1
+                self._items += len(batch)
+                self._largest_batch = max(self._largest_batch, len(batch))
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+                self._queue_wait_total += sum(started - queued for _, _, queued in batch)
+                self._batch_time_total += finished - started
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+
+# ---------------------------------------------------------
+# Two-tier, content-addressed cache for emotion predictions
+# ---------------------------------------------------------
+# Tier 1: bounded in-memory LRU.
+# Tier 2: SQLite table that survives restarts.
+#
+# Keys are sha256(normalized text + model id), so edits that only change
+# whitespace or case hit the same entry (the model is uncased anyway).
+# The stored model id is checked on open; a different model/revision
+# wipes the persistent tier.
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "")
+    return " ".join(text.split()).lower()
+
+
+class EmotionCache:
+    def __init__(self, model_id: str, max_entries: int = 1024, path: Optional[str] = None):
+        self.model_id = model_id
+        self.max_entries = max(1, max_entries)
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, dict]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        if path:
+            self._open_store(path)
+
+    # -----------------------------
+    # Persistent tier
+    # -----------------------------
+    def _open_store(self, path: str) -> None:
+        try:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS emotion_cache ("
+                " key TEXT PRIMARY KEY,"
+                " result TEXT NOT NULL,"
+                " created_at TEXT DEFAULT CURRENT_TIMESTAMP)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_meta ("
+                " name TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL)"
+            )
+
+            row = conn.execute(
+                "SELECT value FROM cache_meta WHERE name = 'model_id'"
+            ).fetchone()
+            if row is None or row[0] != self.model_id:
+                # Model changed — old predictions are no longer valid
+                conn.execute("DELETE FROM emotion_cache")
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_meta (name, value) VALUES ('model_id', ?)",
+                    (self.model_id,),
+                )
+            conn.commit()
+            self._conn = conn
+
+        except sqlite3.Error as e:
+            print("Emotion cache disabled persistent tier:", e)
+            self._conn = None
+
+    # -----------------------------
+    # Public API
+    # -----------------------------
+    def make_key(self, text: str) -> str:
+        payload = f"{self.model_id}\x00{normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[dict]:
+        key = self.make_key(text)
+
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return dict(cached)
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT result FROM emotion_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    result = json.loads(row[0])
+                    self._remember(key, result)
+                    self.disk_hits += 1
+                    return dict(result)
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, result: dict) -> None:
+        key = self.make_key(text)
+
+        with self._lock:
+            self._remember(key, dict(result))
+            self.writes += 1
+
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO emotion_cache (key, result) VALUES (?, ?)",
+                        (key, json.dumps(result)),
+                    )
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    print("Emotion cache write error:", e)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM emotion_cache")
+                self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "model_id": self.model_id,
+                "persistent": self._conn is not None,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+    # -----------------------------
+    # Helpers
+    # -----------------------------
+    def _remember(self, key: str, result: dict) -> None:
+        # Called with self._lock held
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
@@ -0,0 +1,226 @@
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+
+# ---------------------------------------------------------
+# Out-of-process emotion inference
+# ---------------------------------------------------------
+# With EMOTION_WORKERS > 0, forward passes run in dedicated spawned
+# processes instead of the API process, so inference never holds the
+# API's GIL. Each worker loads the model once with its own torch thread
+# count and serves batches from its own request queue; results come back
+# over one shared queue. A monitor thread restarts crashed workers and
+# re-dispatches their in-flight batches once.
+
+_MAX_ATTEMPTS = 2
+
+
+def _worker_main(index: int, requests, results, torch_threads: int) -> None:
+    # Configure threading before torch is imported in this process
+    os.environ["EMOTION_WORKERS"] = "0"
+    os.environ["EMOTION_TORCH_THREADS"] = str(torch_threads)
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+
+    from . import emotion
+
+    emotion.load_model()
+    results.put(("ready", index, os.getpid(), None))
+
+    while True:
+        job = requests.get()
+        if job is None:
+            break
+
+        job_id, texts, with_embeddings = job
+        try:
+            results.put(("result", job_id, emotion.predict_emotions(texts, with_embeddings), None))
+        except Exception as e:
+            results.put(("result", job_id, None, repr(e)))
+
+
+class _Worker:
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.requests = None
+        self.ready = False
+        self.restarts = 0
+
+
+class _Job:
+    def __init__(self, texts: List[str], future: Future, with_embeddings: bool = False):
+        self.texts = texts
+        self.future = future
+        self.with_embeddings = with_embeddings
+        self.worker_index: Optional[int] = None
+        self.attempts = 0
+
+
+class EmotionWorkerPool:
+    def __init__(self, num_workers: int, torch_threads: Optional[int] = None, timeout: float = 30.0):
+        self.num_workers = max(1, num_workers)
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.num_workers)
+        self.timeout = timeout
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._results = self._ctx.Queue()
+        self._workers = [_Worker(i) for i in range(self.num_workers)]
+        self._jobs: Dict[int, _Job] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+
+        self.batches = 0
+        self.failures = 0
+        self.redispatched = 0
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def start(self) -> "EmotionWorkerPool":
+        with self._lock:
+            if self._started:
+                return self
+            for worker in self._workers:
+                self._spawn(worker)
+            self._started = True
+
+        threading.Thread(target=self._collect_loop, name="emotion-pool-collector", daemon=True).start()
+        threading.Thread(target=self._monitor_loop, name="emotion-pool-monitor", daemon=True).start()
+        return self
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+
+        for worker in workers:
+            try:
+                worker.requests.put(None)
+            except Exception:
+                pass
+        for worker in workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+    def _spawn(self, worker: _Worker) -> None:
+        # Called with self._lock held. A fresh request queue is used so a
+        # worker that died mid-read cannot leave it in a broken state.
+        worker.requests = self._ctx.Queue()
+        worker.ready = False
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.index, worker.requests, self._results, self.torch_threads),
+            name=f"emotion-worker-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+
+    # -----------------------------
+    # Dispatch
+    # -----------------------------
+    def predict(self, texts: List[str], with_embeddings: bool = False) -> List[dict]:
+        """Runs one batch on the least busy worker and waits for it."""
+        if not self._started:
+            self.start()
+
+        future: Future = Future()
+        with self._lock:
+            job_id = next(self._ids)
+            job = _Job(texts, future, with_embeddings)
+            self._jobs[job_id] = job
+            self._dispatch(job_id, job)
+
+        try:
+            return future.result(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self._jobs.pop(job_id, None)
+
+    def _dispatch(self, job_id: int, job: _Job) -> None:
+        # Called with self._lock held
+        load = {worker.index: 0 for worker in self._workers}
+        for other in self._jobs.values():
+            if other.worker_index is not None and not other.future.done():
+                load[other.worker_index] += 1
+
+        worker = min(self._workers, key=lambda w: (not w.ready, load[w.index]))
+        job.worker_index = worker.index
+        job.attempts += 1
+        worker.requests.put((job_id, job.texts, job.with_embeddings))
+
+    def _collect_loop(self) -> None:
+        while True:
+            try:
+                kind, key, payload, error = self._results.get()
+            except (EOFError, OSError):
+                return
+
+            with self._lock:
+                if kind == "ready":
+                    self._workers[key].ready = True
+                    continue
+
+                job = self._jobs.get(key)
+                if job is None or job.future.done():
+                    continue
+                self.batches += 1
+                if error is not None:
+                    self.failures += 1
+
+            if error is None:
+                job.future.set_result(payload)
+            else:
+                job.future.set_exception(RuntimeError(f"Emotion worker error: {error}"))
+
+    def _monitor_loop(self) -> None:
+        while True:
+            time.sleep(1.0)
+            with self._lock:
+                if self._closed:
+                    return
+
+                for worker in self._workers:
+                    if worker.process.is_alive():
+                        continue
+
+                    print(
+                        f"Emotion worker {worker.index} exited "
+                        f"(code {worker.process.exitcode}) — restarting"
+                    )
+                    worker.restarts += 1
+                    self._spawn(worker)
+
+                    for job_id, job in self._jobs.items():
+                        if job.worker_index != worker.index or job.future.done():
+                            continue
+                        if job.attempts < _MAX_ATTEMPTS:
+                            self.redispatched += 1
+                            self._dispatch(job_id, job)
+                        else:
+                            self.failures += 1
+                            job.future.set_exception(RuntimeError("Emotion worker crashed"))
+
+    # -----------------------------
+    # Metrics
+    # -----------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.num_workers,
+                "ready_workers": sum(1 for w in self._workers if w.ready),
+                "torch_threads_per_worker": self.torch_threads,
+                "in_flight": sum(1 for j in self._jobs.values() if not j.future.done()),
+                "batches": self.batches,
+                "failures": self.failures,
+                "redispatched": self.redispatched,
+                "restarts": {w.index: w.restarts for w in self._workers},
+            }
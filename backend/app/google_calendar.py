@@ -1,15 +1,24 @@
 import os
-from typing import Dict, Optional
+import threading
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import RedirectResponse
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 
+from jose import JWTError, jwt
+from sqlmodel import Session
+
+from . import calendar_client, calendar_sync, calendar_tokens
+from .calendar_tokens import StoredTokens
+from .database import engine
+from .models import CalendarSyncRequest, CalendarSyncResult, User
+from .security import ALGORITHM, SECRET_KEY, get_current_user
+from .readiness import track_load
+
 load_dotenv()
 
 router = APIRouter(prefix="/google-calendar", tags=["google-calendar"])
@@ -20,33 +29,59 @@ GOOGLE_REDIRECT_URI = os.getenv(
     "GOOGLE_REDIRECT_URI", "http://localhost:8000/google-calendar/callback"
 )
 FRONTEND_BASE_URL = os.getenv("FRONTEND_BASE_URL", "http://localhost:5173")
+# Overridable so token refreshes can go to the test stand-in too (tests/calendar_standin.py)
+GOOGLE_TOKEN_URI = os.getenv("GOOGLE_TOKEN_URI", "https://oauth2.googleapis.com/token")
 
 SCOPES = ["https://www.googleapis.com/auth/calendar.events"]
 
-# In-memory tokens
-CALENDAR_TOKENS: Dict[str, Optional[str]] = {
-    "access_token": None,
-    "refresh_token": None,
-    "token_uri": None,
-    "client_id": None,
-    "client_secret": None,
-    "scopes": None,
-    "expiry": None,
-}
+# Tokens are stored per user (see app/calendar_tokens.py). The OAuth
+# callback has no bearer token, so the user id travels in a signed,
+# short-lived `state` parameter instead.
+OAUTH_STATE_TTL_MIN = 10
+
+
+# -----------------------------
+# Lazy Google client libraries
+# -----------------------------
+_google_libs = None
+_google_libs_lock = threading.Lock()
+
+
+def load_google_libs():
+    """
+    Imports google-auth, google-auth-oauthlib and googleapiclient once.
+    Returns (Credentials, Flow, build_from_document).
+    """
+    global _google_libs
+
+    if _google_libs is not None:
+        return _google_libs
+
+    with _google_libs_lock:
+        if _google_libs is None:
+            with track_load("google_calendar"):
+                from google.oauth2.credentials import Credentials
+                from google_auth_oauthlib.flow import Flow
+                from googleapiclient.discovery import build_from_document
+
+                calendar_client.load_discovery()
+                _google_libs = (Credentials, Flow, build_from_document)
 
-OAUTH_STATE: Optional[str] = None
+    return _google_libs
 
 
 # -----------------------------
 # OAuth Flow
 # -----------------------------
-def create_flow(state: Optional[str] = None) -> Flow:
+def create_flow(state: Optional[str] = None):
+    _, Flow, _ = load_google_libs()
+
     client_config = {
         "web": {
             "client_id": GOOGLE_CLIENT_ID,
             "client_secret": GOOGLE_CLIENT_SECRET,
             "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-            "token_uri": "https://oauth2.googleapis.com/token",
+            "token_uri": GOOGLE_TOKEN_URI,
         }
     }
     kwargs = {"redirect_uri": GOOGLE_REDIRECT_URI}
@@ -56,8 +91,27 @@ def create_flow(state: Optional[str] = None) -> Flow:
     return Flow.from_client_config(client_config, scopes=SCOPES, **kwargs)
 
 
-def tokens_available() -> bool:
-    return bool(CALENDAR_TOKENS.get("access_token"))
+def sign_oauth_state(user_id: int) -> str:
+    expire = datetime.utcnow() + timedelta(minutes=OAUTH_STATE_TTL_MIN)
+    return jwt.encode(
+        {"sub": str(user_id), "purpose": "google_calendar", "exp": expire},
+        SECRET_KEY,
+        algorithm=ALGORITHM,
+    )
+
+
+def verify_oauth_state(state: str) -> int:
+    try:
+        payload = jwt.decode(state, SECRET_KEY, algorithms=[ALGORITHM])
+        if payload.get("purpose") != "google_calendar":
+            raise ValueError("wrong purpose")
+        return int(payload["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid OAuth state")
+
+
+def tokens_available(user_id: int) -> bool:
+    return calendar_tokens.load_tokens(user_id) is not None
 
 
 # -----------------------------
@@ -79,72 +133,100 @@ def build_datetime_rfc3339(date: str, time: str) -> str:
     return f"{date}T{time}:00+05:30"
 
 
-def get_calendar_service():
-    if not tokens_available():
+def make_credentials(tokens: StoredTokens):
+    Credentials, _, _ = load_google_libs()
+
+    return Credentials(
+        token=tokens.access_token,
+        refresh_token=tokens.refresh_token,
+        token_uri=GOOGLE_TOKEN_URI,
+        client_id=GOOGLE_CLIENT_ID,
+        client_secret=GOOGLE_CLIENT_SECRET,
+        scopes=SCOPES,
+        expiry=tokens.expiry,
+    )
+
+
+def get_calendar_service(user_id: int):
+    """Returns (service, credentials) for the user's connected calendar."""
+    tokens = calendar_tokens.load_tokens(user_id)
+    if tokens is None:
         raise HTTPException(
             status_code=400,
             detail="Google Calendar not connected. Please connect in Settings.",
         )
 
-    creds = Credentials(
-        token=CALENDAR_TOKENS["access_token"],
-        refresh_token=CALENDAR_TOKENS["refresh_token"],
-        token_uri=CALENDAR_TOKENS["token_uri"],
-        client_id=CALENDAR_TOKENS["client_id"],
-        client_secret=CALENDAR_TOKENS["client_secret"],
-        scopes=CALENDAR_TOKENS["scopes"].split()
-        if CALENDAR_TOKENS.get("scopes")
-        else SCOPES,
+    # Reused until the stored tokens change (see app/calendar_client.py)
+    return calendar_client.service_cache.get(
+        user_id, (tokens.access_token, tokens.refresh_token), lambda: make_credentials(tokens)
     )
 
-    return build("calendar", "v3", credentials=creds)
+
+# -----------------------------
+# Free/busy (study planner)
+# -----------------------------
+def _local_naive(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed.astimezone(ZoneInfo(calendar_sync.CALENDAR_TIMEZONE)).replace(tzinfo=None)
+
+
+def busy_intervals(user_id: int, time_min: datetime, time_max: datetime) -> Optional[List[Tuple[datetime, datetime]]]:
+    """
+    Busy (start, end) pairs on the user's primary calendar between two
+    naive local times (CALENDAR_TIMEZONE), or None if the calendar is not
+    connected. Cached per window (see calendar_client.FreeBusyCache).
+    """
+    if not tokens_available(user_id):
+        return None
+
+    def fetch():
+        service, credentials = get_calendar_service(user_id)
+        zone = ZoneInfo(calendar_sync.CALENDAR_TIMEZONE)
+        body = {
+            "timeMin": time_min.replace(tzinfo=zone).isoformat(),
+            "timeMax": time_max.replace(tzinfo=zone).isoformat(),
+            "timeZone": calendar_sync.CALENDAR_TIMEZONE,
+            "items": [{"id": "primary"}],
+        }
+        response = calendar_client.execute(service.freebusy().query(body=body), credentials)
+        calendar_tokens.persist_if_refreshed(user_id, credentials)
+
+        busy = response.get("calendars", {}).get("primary", {}).get("busy", [])
+        return [(_local_naive(b["start"]), _local_naive(b["end"])) for b in busy]
+
+    return calendar_client.freebusy_cache.get(user_id, (time_min, time_max), fetch)
 
 
 # -----------------------------
 # Status + OAuth URLs
 # -----------------------------
 @router.get("/status")
-def google_calendar_status():
-    return {"connected": tokens_available()}
+def google_calendar_status(current_user: User = Depends(get_current_user)):
+    return {"connected": tokens_available(current_user.id)}
 
 
 @router.get("/auth-url")
-def google_calendar_auth_url():
-    global OAUTH_STATE
-
-    flow = create_flow()
-    auth_url, state = flow.authorization_url(
+def google_calendar_auth_url(current_user: User = Depends(get_current_user)):
+    flow = create_flow(state=sign_oauth_state(current_user.id))
+    auth_url, _ = flow.authorization_url(
         access_type="offline",
         include_granted_scopes="true",
         prompt="consent",
     )
 
-    OAUTH_STATE = state
     return {"auth_url": auth_url}
 
 
 @router.get("/callback")
 def google_calendar_callback(state: str = Query(...), code: str = Query(...)):
-    global CALENDAR_TOKENS, OAUTH_STATE
-
-    if OAUTH_STATE and state != OAUTH_STATE:
-        raise HTTPException(status_code=400, detail="Invalid OAuth state")
+    user_id = verify_oauth_state(state)
 
     flow = create_flow(state=state)
     flow.fetch_token(code=code)
     credentials = flow.credentials
 
-    CALENDAR_TOKENS = {
-        "access_token": credentials.token,
-        "refresh_token": credentials.refresh_token,
-        "token_uri": credentials.token_uri,
-        "client_id": credentials.client_id,
-        "client_secret": credentials.client_secret,
-        "scopes": " ".join(credentials.scopes or []),
-        "expiry": credentials.expiry.isoformat() if credentials.expiry else None,
-    }
-
-    OAUTH_STATE = None
+    if calendar_tokens.save_tokens(user_id, credentials.token, credentials.refresh_token, credentials.expiry) is None:
+        raise HTTPException(status_code=400, detail="User not found")
 
     return RedirectResponse(url=f"{FRONTEND_BASE_URL}/settings")
 
@@ -153,13 +235,13 @@ def google_calendar_callback(state: str = Query(...), code: str = Query(...)):
 # CREATE EVENT — FIXED VERSION
 # -----------------------------
 @router.post("/events")
-def create_calendar_event(event: CalendarEventCreate):
+def create_calendar_event(event: CalendarEventCreate, current_user: User = Depends(get_current_user)):
     """
     Create a Google Calendar event with correct DATE + TIME + TIMEZONE.
     This prevents Google from placing it on today's date.
     """
 
-    service = get_calendar_service()
+    service, credentials = get_calendar_service(current_user.id)
 
     # Build start datetime
     start_dt_str = build_datetime_rfc3339(event.date, event.start_time)
@@ -185,7 +267,11 @@ def create_calendar_event(event: CalendarEventCreate):
         },
     }
 
-    created = service.events().insert(calendarId="primary", body=event_body).execute()
+    created = calendar_client.execute(
+        service.events().insert(calendarId="primary", body=event_body), credentials
+    )
+    calendar_tokens.persist_if_refreshed(current_user.id, credentials)
+    calendar_client.freebusy_cache.invalidate(current_user.id)
 
     return {
         "status": "success",
@@ -194,19 +280,40 @@ def create_calendar_event(event: CalendarEventCreate):
         "start": start_dt_str,
         "end": end_dt_str,
     }
+
+
+# -----------------------------
+# SYNC TASKS -> CALENDAR (batched)
+# -----------------------------
+@router.post("/sync", response_model=CalendarSyncResult)
+def sync_tasks_to_calendar(
+    payload: Optional[CalendarSyncRequest] = None,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Creates, updates and deletes calendar events so they match tasks with
+    a due date. Only tasks changed since their last sync are sent (pass
+    "full": true to re-send all), in batches of up to 50 calls.
+    """
+    service, credentials = get_calendar_service(current_user.id)
+
+    with Session(engine, expire_on_commit=False) as session:
+        try:
+            result = calendar_sync.sync_tasks(
+                session, service, credentials, current_user.id, payload or CalendarSyncRequest()
+            )
+        except calendar_sync.SyncInProgressError:
+            raise HTTPException(status_code=409, detail="A calendar sync is already running")
+
+    calendar_tokens.persist_if_refreshed(current_user.id, credentials)
+    calendar_client.freebusy_cache.invalidate(current_user.id)
+    return result
+
+
 @router.post("/disconnect")
-def google_calendar_disconnect():
-    global CALENDAR_TOKENS
-
-    # Clear tokens
-    CALENDAR_TOKENS = {
-        "access_token": None,
-        "refresh_token": None,
-        "token_uri": None,
-        "client_id": None,
-        "client_secret": None,
-        "scopes": None,
-        "expiry": None,
-    }
+def google_calendar_disconnect(current_user: User = Depends(get_current_user)):
+    calendar_tokens.clear_tokens(current_user.id)
+    calendar_client.service_cache.invalidate(current_user.id)
+    calendar_client.freebusy_cache.invalidate(current_user.id)
 
     return {"success": True, "message": "Google Calendar disconnected"}
@@ -0,0 +1,344 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, or_
+from sqlmodel import Session, select
+
+from . import metrics
+from .database import engine
+from .emotion import EMBEDDING_MODEL_ID
+from .models import JournalEmbedding, JournalEntry
+from .readiness import track_load
+
+
+# ---------------------------------------------------------
+# "Similar entries" search over journal embeddings
+# ---------------------------------------------------------
+# The enrichment job stores each entry's sentence embedding (from the
+# emotion model's forward pass, see app/emotion_backends.py) as float16
+# bytes in `journalembedding`. That table is the source of truth.
+#
+# Each process keeps an EmbeddingIndex: the vectors in one float16
+# np.memmap matrix (backed by an anonymous temp file, so it lives in the
+# page cache rather than on the Python heap) plus a row -> entry id
+# array. Vectors are unit length, so cosine similarity against every
+# entry is one matrix-vector product, followed by argpartition for the
+# top k.
+#
+# Updates are incremental: adds append a row, deletes move the last row
+# into the freed slot. Writes made in this process apply immediately;
+# other workers' writes are picked up by comparing (count, newest
+# created_at) with the table at most every JOURNAL_EMBEDDING_SYNC_S.
+#
+#   python -m app.journal_embeddings backfill   embed entries with no vector for the current model
+#   python -m app.journal_embeddings bench      search latency on synthetic vectors
+
+JOURNAL_EMBEDDINGS_ENABLED = os.getenv("JOURNAL_EMBEDDINGS_ENABLED", "1") != "0"
+JOURNAL_EMBEDDING_DIR = os.getenv("JOURNAL_EMBEDDING_DIR") or None
+JOURNAL_EMBEDDING_SYNC_S = float(os.getenv("JOURNAL_EMBEDDING_SYNC_S", "5"))
+# Rows converted to float32 per matmul; bounds the temporary buffer
+JOURNAL_EMBEDDING_SEARCH_CHUNK = int(os.getenv("JOURNAL_EMBEDDING_SEARCH_CHUNK", "65536"))
+JOURNAL_SIMILAR_MAX_K = int(os.getenv("JOURNAL_SIMILAR_MAX_K", "50"))
+
+_INITIAL_CAPACITY = 1024
+
+
+def to_row(entry_id: int, vector: np.ndarray) -> JournalEmbedding:
+    vector = np.asarray(vector, dtype=np.float16)
+    return JournalEmbedding(
+        entry_id=entry_id,
+        model_id=EMBEDDING_MODEL_ID,
+        dim=int(vector.shape[0]),
+        vector=vector.tobytes(),
+    )
+
+
+def from_blob(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=np.float16)
+
+
+def is_current(row: Optional[JournalEmbedding]) -> bool:
+    """True if the stored vector came from the current embedding model."""
+    return row is not None and row.model_id == EMBEDDING_MODEL_ID
+
+
+class EmbeddingIndex:
+    def __init__(self, model_id: str, directory: Optional[str] = None):
+        self.model_id = model_id
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._file = None
+        self._matrix: Optional[np.memmap] = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._rows: Dict[int, int] = {}
+        self.size = 0
+        self.dim: Optional[int] = None
+        self.loaded = False
+        self._checked_at = 0.0
+        self._table_state: Optional[tuple] = None
+        self.searches = 0
+        self.syncs = 0
+
+    # -----------------------------
+    # Storage
+    # -----------------------------
+    def _reserve(self, rows: int) -> None:
+        # Called with self._lock held
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if rows <= capacity:
+            return
+
+        capacity = max(_INITIAL_CAPACITY, rows, 2 * capacity)
+        handle = tempfile.TemporaryFile(dir=self.directory)
+        matrix = np.memmap(handle, dtype=np.float16, mode="w+", shape=(capacity, self.dim))
+        ids = np.empty(capacity, dtype=np.int64)
+        if self._matrix is not None:
+            matrix[:self.size] = self._matrix[:self.size]
+            ids[:self.size] = self._ids[:self.size]
+            self._release()
+
+        self._file, self._matrix, self._ids = handle, matrix, ids
+
+    def _release(self) -> None:
+        # The mapping keeps its own reference; it is unmapped once the
+        # old matrix is garbage-collected
+        if self._file is not None:
+            self._file.close()
+        self._file, self._matrix = None, None
+
+    def _append(self, entry_ids: Sequence[int], vectors: np.ndarray) -> None:
+        # Called with self._lock held; replaces vectors of known ids
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+
+        fresh = []
+        for entry_id, vector in zip(entry_ids, vectors):
+            row = self._rows.get(entry_id)
+            if row is None:
+                fresh.append((entry_id, vector))
+            else:
+                self._matrix[row] = vector
+
+        self._reserve(self.size + len(fresh))
+        for entry_id, vector in fresh:
+            self._matrix[self.size] = vector
+            self._ids[self.size] = entry_id
+            self._rows[entry_id] = self.size
+            self.size += 1
+
+    def _remove(self, entry_ids: Iterable[int]) -> None:
+        # Called with self._lock held
+        for entry_id in entry_ids:
+            row = self._rows.pop(entry_id, None)
+            if row is None:
+                continue
+            last = self.size - 1
+            if row != last:
+                moved = int(self._ids[last])
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+            self.size -= 1
+
+    # -----------------------------
+    # Sync with the table
+    # -----------------------------
+    def _state(self, session: Session) -> tuple:
+        return tuple(session.exec(
+            select(func.count(), func.max(JournalEmbedding.created_at))
+            .where(JournalEmbedding.model_id == self.model_id)
+        ).one())
+
+    def _load_vectors(self, session: Session, entry_ids: Sequence[int]) -> None:
+        for start in range(0, len(entry_ids), 1000):
+            rows = session.exec(
+                select(JournalEmbedding.entry_id, JournalEmbedding.vector)
+                .where(JournalEmbedding.entry_id.in_(entry_ids[start:start + 1000]))
+                .where(JournalEmbedding.model_id == self.model_id)
+            ).all()
+            if rows:
+                vectors = np.stack([from_blob(blob) for _, blob in rows])
+                self._append([entry_id for entry_id, _ in rows], vectors)
+
+    def sync(self, force: bool = False) -> None:
+        """Loads on first use, then applies rows added/removed by other workers."""
+        with self._lock:
+            if self.loaded and not force and time.monotonic() - self._checked_at < JOURNAL_EMBEDDING_SYNC_S:
+                return
+
+            with Session(engine) as session:
+                state = self._state(session)
+                if self.loaded and state == self._table_state:
+                    self._checked_at = time.monotonic()
+                    return
+
+                stored = set(session.exec(
+                    select(JournalEmbedding.entry_id).where(JournalEmbedding.model_id == self.model_id)
+                ).all())
+                self._remove([entry_id for entry_id in self._rows if entry_id not in stored])
+                self._load_vectors(session, [entry_id for entry_id in stored if entry_id not in self._rows])
+
+            self.loaded = True
+            self.syncs += 1
+            self._table_state = state
+            self._checked_at = time.monotonic()
+
+    # -----------------------------
+    # Incremental updates (this process)
+    # -----------------------------
+    def add(self, entry_id: int, vector: np.ndarray) -> None:
+        with self._lock:
+            if self.loaded:
+                self._append([entry_id], np.asarray(vector, dtype=np.float16)[None, :])
+
+    def remove(self, entry_ids: Iterable[int]) -> None:
+        with self._lock:
+            if self.loaded:
+                self._remove(entry_ids)
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+    def vector_for(self, entry_id: int) -> Optional[np.ndarray]:
+        self.sync()
+        with self._lock:
+            row = self._rows.get(entry_id)
+            return None if row is None else np.array(self._matrix[row])
+
+    def search(self, vector: np.ndarray, k: int, exclude_id: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Top-k (entry id, cosine similarity), best first."""
+        self.sync()
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-9)
+
+        with self._lock:
+            self.searches += 1
+            size = self.size
+            if size == 0:
+                return []
+
+            scores = np.empty(size, dtype=np.float32)
+            for start in range(0, size, JOURNAL_EMBEDDING_SEARCH_CHUNK):
+                end = min(size, start + JOURNAL_EMBEDDING_SEARCH_CHUNK)
+                scores[start:end] = self._matrix[start:end].astype(np.float32) @ query
+
+            excluded = self._rows.get(exclude_id) if exclude_id is not None else None
+            if excluded is not None:
+                scores[excluded] = -np.inf
+
+            k = min(k, size - (excluded is not None))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(self._ids[row]), round(float(scores[row]), 4)) for row in top]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": JOURNAL_EMBEDDINGS_ENABLED,
+                "model_id": self.model_id,
+                "loaded": self.loaded,
+                "entries": self.size,
+                "dim": self.dim,
+                "capacity": 0 if self._matrix is None else int(self._matrix.shape[0]),
+                "searches": self.searches,
+                "syncs": self.syncs,
+            }
+
+
+index = EmbeddingIndex(EMBEDDING_MODEL_ID, JOURNAL_EMBEDDING_DIR)
+
+metrics.register("journal_embeddings", index.stats)
+
+
+def warm_up() -> None:
+    """Loads the index at startup (background warm-up)."""
+    with track_load("journal_embeddings"):
+        if JOURNAL_EMBEDDINGS_ENABLED:
+            index.sync()
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def backfill(chunk_size: int) -> int:
+    """Embeds entries that have content but no vector for the current model."""
+    from .emotion import predict_emotions
+
+    done = 0
+    while True:
+        with Session(engine) as session:
+            entries = session.exec(
+                select(JournalEntry.id, JournalEntry.content)
+                .outerjoin(JournalEmbedding, JournalEmbedding.entry_id == JournalEntry.id)
+                .where(or_(
+                    JournalEmbedding.entry_id.is_(None),
+                    JournalEmbedding.model_id != EMBEDDING_MODEL_ID,
+                ))
+                .where(JournalEntry.content != "")
+                .order_by(JournalEntry.id)
+                .limit(chunk_size)
+            ).all()
+            if not entries:
+                return done
+
+            results = predict_emotions([content for _, content in entries], with_embeddings=True)
+            for (entry_id, _), result in zip(entries, results):
+                # merge: entry_id is the key, so stale rows are overwritten
+                session.merge(to_row(entry_id, result["embedding"]))
+            session.commit()
+
+        done += len(entries)
+        print(f"… embedded {done} entries")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.journal_embeddings")
+    parser.add_argument("command", choices=["backfill", "bench"])
+    parser.add_argument("--chunk", type=int, default=32)
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    if args.command == "backfill":
+        from .database import create_db_and_tables
+
+        create_db_and_tables()
+        print(f"✔ Backfilled {backfill(args.chunk)} journal embedding(s)")
+        return 0
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.entries, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    bench = EmbeddingIndex("bench", JOURNAL_EMBEDDING_DIR)
+    with bench._lock:
+        bench._append(list(range(args.entries)), vectors.astype(np.float16))
+    bench.loaded = True
+    bench._checked_at = float("inf")  # never sync against the database
+
+    timings = []
+    for i in range(args.repeat):
+        started = time.perf_counter()
+        bench.search(vectors[i % args.entries], args.k, exclude_id=i % args.entries)
+        timings.append(1000 * (time.perf_counter() - started))
+
+    timings.sort()
+    print(
+        f"{args.entries} x {args.dim} float16 ({bench.size * args.dim * 2 / 2**20:.1f} MiB), k={args.k}: "
+        f"median {timings[len(timings) // 2]:.2f} ms, max {timings[-1]:.2f} ms"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
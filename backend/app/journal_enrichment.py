@@ -0,0 +1,280 @@
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlmodel import Session, select, update
+
+from . import analytics, journal_embeddings, metrics
+from .database import engine
+from .models import JournalEmbedding, JournalEntry, JournalEnrichmentJob
+
+
+# ---------------------------------------------------------
+# Background enrichment for journal entries
+# ---------------------------------------------------------
+# POST /journal/ saves the entry plus a `JournalEnrichmentJob` row and
+# returns immediately. Jobs run here with bounded concurrency: emotion
+# label first (persisted as soon as it is known), then the Gemini
+# reflection. The emotion pass also yields the entry's embedding for
+# similarity search (app/journal_embeddings.py), stored alongside the
+# label. Failures retry with exponential backoff. Job rows live in
+# the database, so pending work is picked up again after a restart, and
+# jobs left "running" by a dead process are re-queued by a periodic
+# sweep (see app/scheduler.py).
+
+ENRICHMENT_CONCURRENCY = int(os.getenv("JOURNAL_ENRICHMENT_CONCURRENCY", "2"))
+ENRICHMENT_MAX_ATTEMPTS = int(os.getenv("JOURNAL_ENRICHMENT_MAX_ATTEMPTS", "3"))
+ENRICHMENT_RETRY_BASE_S = float(os.getenv("JOURNAL_ENRICHMENT_RETRY_BASE_S", "5"))
+# A "running" job older than this is assumed to belong to a dead process;
+# the scheduler looks for such jobs every ENRICHMENT_SWEEP_INTERVAL_S
+ENRICHMENT_STALE_AFTER_S = float(os.getenv("JOURNAL_ENRICHMENT_STALE_AFTER_S", "600"))
+ENRICHMENT_SWEEP_INTERVAL_S = float(os.getenv("JOURNAL_ENRICHMENT_SWEEP_INTERVAL_S", "300"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=max(1, ENRICHMENT_CONCURRENCY), thread_name_prefix="journal-enrich"
+)
+
+_lock = threading.Lock()
+_waiters: Dict[int, List[asyncio.Future]] = {}
+# Recently finished entry ids, so a waiter registering just after
+# completion does not sleep for the whole timeout
+_finished: "OrderedDict[int, str]" = OrderedDict()
+_FINISHED_KEEP = 1024
+_stats = {"queued": 0, "succeeded": 0, "failed": 0, "retried": 0, "running": 0}
+
+
+# -----------------------------
+# Queueing
+# -----------------------------
+def enqueue(entry_id: int, delay: float = 0.0) -> None:
+    """Schedules an enrichment job (the job row must already exist)."""
+    with _lock:
+        _stats["queued"] += 1
+
+    if delay > 0:
+        timer = threading.Timer(delay, _executor.submit, args=(_run_job, entry_id))
+        timer.daemon = True
+        timer.start()
+    else:
+        _executor.submit(_run_job, entry_id)
+
+
+def _reset_stale_jobs(session: Session) -> List[int]:
+    """Marks "running" jobs not updated for ENRICHMENT_STALE_AFTER_S as pending again."""
+    stale_before = datetime.utcnow() - timedelta(seconds=ENRICHMENT_STALE_AFTER_S)
+    stale = session.exec(
+        select(JournalEnrichmentJob.entry_id)
+        .where(JournalEnrichmentJob.status == "running")
+        .where(JournalEnrichmentJob.updated_at < stale_before)
+    ).all()
+    if stale:
+        session.exec(
+            update(JournalEnrichmentJob)
+            .where(JournalEnrichmentJob.entry_id.in_(stale))
+            .where(JournalEnrichmentJob.status == "running")
+            .values(status="pending", next_attempt_at=datetime.utcnow())
+        )
+        session.commit()
+    return list(stale)
+
+
+def recover_pending_jobs() -> int:
+    """
+    Re-queues jobs left pending by a previous process, plus "running"
+    jobs whose process died mid-way. Called at startup.
+    """
+    with Session(engine) as session:
+        _reset_stale_jobs(session)
+        jobs = session.exec(
+            select(JournalEnrichmentJob).where(JournalEnrichmentJob.status == "pending")
+        ).all()
+
+    now = datetime.utcnow()
+    for job in jobs:
+        enqueue(job.entry_id, delay=max(0.0, (job.next_attempt_at - now).total_seconds()))
+
+    if jobs:
+        print(f"✔ Re-queued {len(jobs)} pending journal enrichment job(s)")
+    return len(jobs)
+
+
+def sweep_stale_jobs() -> int:
+    """
+    Re-queues "running" jobs whose process died. Run periodically by the
+    scheduler: jobs interrupted by a restart are younger than
+    ENRICHMENT_STALE_AFTER_S at startup, so recover_pending_jobs skips them.
+    """
+    with Session(engine) as session:
+        stale = _reset_stale_jobs(session)
+
+    for entry_id in stale:
+        enqueue(entry_id)
+    return len(stale)
+
+
+# -----------------------------
+# Worker
+# -----------------------------
+def _claim(session: Session, entry_id: int) -> bool:
+    # Atomic pending -> running, so two processes never run the same job
+    result = session.exec(
+        update(JournalEnrichmentJob)
+        .where(JournalEnrichmentJob.entry_id == entry_id)
+        .where(JournalEnrichmentJob.status == "pending")
+        .values(
+            status="running",
+            attempts=JournalEnrichmentJob.attempts + 1,
+            updated_at=datetime.utcnow(),
+        )
+    )
+    session.commit()
+    return result.rowcount == 1
+
+
+def _run_job(entry_id: int) -> None:
+    from .chat_ai import request_reflection_text
+    from .emotion import analyze_emotion_text, analyze_emotion_with_embedding
+
+    with Session(engine) as session:
+        if not _claim(session, entry_id):
+            return
+
+        job = session.get(JournalEnrichmentJob, entry_id)
+        entry = session.get(JournalEntry, entry_id)
+        if entry is None:
+            session.delete(job)
+            session.commit()
+            return
+
+        with _lock:
+            _stats["running"] += 1
+
+        try:
+            needs_label = entry.emotion_label is None and bool(entry.content)
+            needs_vector = (
+                journal_embeddings.JOURNAL_EMBEDDINGS_ENABLED
+                and bool(entry.content)
+                and not journal_embeddings.is_current(session.get(JournalEmbedding, entry_id))
+            )
+            vector = None
+            if needs_vector:
+                emotion, vector = analyze_emotion_with_embedding(entry.content)
+            elif needs_label:
+                emotion = analyze_emotion_text(entry.content)
+
+            if needs_label and emotion["label"] is None:
+                # Model unavailable (analyze_emotion_text swallows the error):
+                # fail this attempt so it is retried, rather than storing no label
+                raise RuntimeError("emotion model returned no label")
+            if needs_label:
+                entry.emotion_label = emotion["label"]
+                entry.emotion_score = emotion["score"]
+                session.add(entry)
+                analytics.record(session, [analytics.journal_delta(entry, +1)])
+            if vector is not None:
+                # merge: replaces a vector left by an older model
+                session.merge(journal_embeddings.to_row(entry_id, vector))
+            if needs_label or vector is not None:
+                session.commit()
+            if vector is not None:
+                journal_embeddings.index.add(entry_id, vector)
+
+            entry.ai_reflection = request_reflection_text(entry.content, entry.emotion_label)
+            job.status = "done"
+            job.last_error = None
+
+        except Exception as e:
+            print(f"Journal enrichment error (entry {entry_id}, attempt {job.attempts}):", e)
+            job.last_error = str(e)[:500]
+
+            if job.attempts < ENRICHMENT_MAX_ATTEMPTS:
+                delay = ENRICHMENT_RETRY_BASE_S * (2 ** (job.attempts - 1))
+                job.status = "pending"
+                job.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            else:
+                job.status = "failed"
+
+        finally:
+            with _lock:
+                _stats["running"] -= 1
+
+        job.updated_at = datetime.utcnow()
+        session.add(entry)
+        session.add(job)
+        session.commit()
+        status = job.status
+
+    if status == "pending":
+        with _lock:
+            _stats["retried"] += 1
+        enqueue(entry_id, delay=delay)
+        return
+
+    with _lock:
+        _stats["succeeded" if status == "done" else "failed"] += 1
+    _notify(entry_id, status)
+
+
+# -----------------------------
+# Notification (long-poll)
+# -----------------------------
+async def wait_for_completion(entry_id: int, timeout: float) -> None:
+    """Waits (without holding a thread) until the job finishes or times out."""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    with _lock:
+        if entry_id in _finished:
+            return
+        _waiters.setdefault(entry_id, []).append(future)
+
+    try:
+        await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        with _lock:
+            waiters = _waiters.get(entry_id, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                _waiters.pop(entry_id, None)
+
+
+def _notify(entry_id: int, status: str) -> None:
+    with _lock:
+        waiters = _waiters.pop(entry_id, [])
+        _finished[entry_id] = status
+        while len(_finished) > _FINISHED_KEEP:
+            _finished.popitem(last=False)
+
+    for future in waiters:
+        future.get_loop().call_soon_threadsafe(_resolve, future, status)
+
+
+def _resolve(future: asyncio.Future, status: str) -> None:
+    if not future.done():
+        future.set_result(status)
+
+
+async def get_status(session, entry_id: int) -> Optional[str]:
+    """Job status for an entry, read through a route's async session."""
+    job = await session.get(JournalEnrichmentJob, entry_id)
+    return job.status if job else None
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "concurrency": ENRICHMENT_CONCURRENCY,
+            "max_attempts": ENRICHMENT_MAX_ATTEMPTS,
+            "waiters": sum(len(w) for w in _waiters.values()),
+            **_stats,
+        }
+
+
+metrics.register("journal_enrichment", stats)
@@ -0,0 +1,309 @@
+import argparse
+import html
+import os
+import re
+import sys
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Float, column, or_, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlmodel import select
+
+from .database import IS_SQLITE
+from .models import JournalEntry
+from .pagination import (
+    PageParams,
+    count_statement,
+    decode_cursor,
+    encode_cursor,
+    finish_page,
+    page_statement,
+)
+
+
+# ---------------------------------------------------------
+# Full-text search over journal entries
+# ---------------------------------------------------------
+# On SQLite, `journal_fts` is an FTS5 index over journalentry.content and
+# .ai_reflection. It is an external-content table: it stores only the
+# inverted index, reads the text from journalentry, and is kept in step
+# by the triggers below (insert, delete, and updates of either column,
+# which covers the background enrichment writing ai_reflection).
+#
+# Snippets are HTML-escaped text with matches wrapped in <mark>.
+#
+# Hits are ranked by bm25 (content weighs more than the reflection) and
+# paged with a keyset cursor on (rank, id), like the list endpoints.
+# Other databases, or a SQLite build without FTS5, fall back to a LIKE
+# scan ordered newest first.
+#
+#   python -m app.journal_search rebuild    (re)create + repopulate the index
+#   python -m app.journal_search check      FTS5 integrity check
+
+FTS_TABLE = "journal_fts"
+JOURNAL_SEARCH_CONTENT_WEIGHT = float(os.getenv("JOURNAL_SEARCH_CONTENT_WEIGHT", "1.0"))
+JOURNAL_SEARCH_REFLECTION_WEIGHT = float(os.getenv("JOURNAL_SEARCH_REFLECTION_WEIGHT", "0.5"))
+JOURNAL_SEARCH_SNIPPET_TOKENS = int(os.getenv("JOURNAL_SEARCH_SNIPPET_TOKENS", "16"))
+MARK_OPEN, MARK_CLOSE = "<mark>", "</mark>"
+ELLIPSIS = "…"
+# snippet() marks matches with these control characters; the text is
+# HTML-escaped before they become <mark> tags (entries and Gemini
+# reflections are untrusted)
+_RAW_OPEN, _RAW_CLOSE = "\x02", "\x03"
+
+_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    " content, ai_reflection,"
+    " content='journalentry', content_rowid='id',"
+    " tokenize='porter unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS journal_fts_insert AFTER INSERT ON journalentry BEGIN"
+    f" INSERT INTO {FTS_TABLE}(rowid, content, ai_reflection)"
+    f" VALUES (new.id, new.content, new.ai_reflection);"
+    f" END",
+    f"CREATE TRIGGER IF NOT EXISTS journal_fts_delete AFTER DELETE ON journalentry BEGIN"
+    f" INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, ai_reflection)"
+    f" VALUES ('delete', old.id, old.content, old.ai_reflection);"
+    f" END",
+    f"CREATE TRIGGER IF NOT EXISTS journal_fts_update AFTER UPDATE OF content, ai_reflection ON journalentry BEGIN"
+    f" INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, ai_reflection)"
+    f" VALUES ('delete', old.id, old.content, old.ai_reflection);"
+    f" INSERT INTO {FTS_TABLE}(rowid, content, ai_reflection)"
+    f" VALUES (new.id, new.content, new.ai_reflection);"
+    f" END",
+]
+
+# Cursor columns for ranked pages: (rank, id), ascending
+_RANK_ORDER = (column("rank", Float), JournalEntry.id)
+_LIST_ORDER = (JournalEntry.created_at, JournalEntry.id)
+
+_fts_ready: Optional[bool] = None
+
+
+# -----------------------------
+# Index management (SQLite)
+# -----------------------------
+def create_index(conn: Connection) -> bool:
+    """Creates the FTS table + triggers. Returns False if FTS5 is unavailable."""
+    if conn.dialect.name != "sqlite":
+        return False
+    try:
+        for statement in _DDL:
+            conn.execute(text(statement))
+    except OperationalError as e:
+        # SQLite compiled without FTS5: search falls back to LIKE
+        print("✘ Journal full-text index not created:", e)
+        return False
+    return True
+
+
+def rebuild_index(conn: Connection) -> bool:
+    """Repopulates the index from journalentry (after imports or restores)."""
+    if not create_index(conn):
+        return False
+    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+    return True
+
+
+async def fts_available(session) -> bool:
+    global _fts_ready
+
+    if _fts_ready is None:
+        if not IS_SQLITE:
+            _fts_ready = False
+        else:
+            found = (await session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE},
+            )).first()
+            _fts_ready = found is not None
+    return _fts_ready
+
+
+# -----------------------------
+# Queries
+# -----------------------------
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def search_terms(query: str) -> List[str]:
+    return _TERM.findall(query)
+
+
+def match_query(terms: List[str]) -> str:
+    """
+    Builds a safe FTS5 query: every term quoted (no operator injection),
+    all terms required, the last one as a prefix for search-as-you-type.
+    """
+    quoted = ['"' + term.replace('"', '""') + '"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _filters(date_from: Optional[date], date_to: Optional[date], emotion_label: Optional[str]) -> Tuple[str, dict]:
+    clauses, params = [], {}
+    if date_from:
+        clauses.append("j.date >= :date_from")
+        params["date_from"] = date_from.isoformat()
+    if date_to:
+        clauses.append("j.date <= :date_to")
+        params["date_to"] = date_to.isoformat()
+    if emotion_label:
+        clauses.append("j.emotion_label = :emotion_label")
+        params["emotion_label"] = emotion_label
+    return "".join(f" AND {clause}" for clause in clauses), params
+
+
+async def search_fts(session, terms: List[str], page: PageParams, date_from: Optional[date] = None,
+                     date_to: Optional[date] = None, emotion_label: Optional[str] = None
+                     ) -> Tuple[List[dict], Optional[str], Optional[int]]:
+    """Ranked hits. Returns (hits, next cursor, total if requested)."""
+    rank = f"bm25({FTS_TABLE}, :content_weight, :reflection_weight)"
+    where, params = _filters(date_from, date_to, emotion_label)
+    params.update(
+        query=match_query(terms),
+        content_weight=JOURNAL_SEARCH_CONTENT_WEIGHT,
+        reflection_weight=JOURNAL_SEARCH_REFLECTION_WEIGHT,
+    )
+    base = (
+        f" FROM {FTS_TABLE} JOIN journalentry AS j ON j.id = {FTS_TABLE}.rowid"
+        f" WHERE {FTS_TABLE} MATCH :query{where}"
+    )
+
+    total = None
+    if page.include_total:
+        total = (await session.execute(text("SELECT COUNT(*)" + base), params)).scalar()
+
+    if page.cursor:
+        after_rank, after_id = decode_cursor(page.cursor, _RANK_ORDER)
+        base += f" AND ({rank}, j.id) > (:after_rank, :after_id)"
+        params.update(after_rank=after_rank, after_id=after_id)
+
+    rows = (await session.execute(
+        text(
+            "SELECT j.id, j.date, j.created_at, j.emotion_label, j.emotion_score, j.is_favorite,"
+            f" {rank} AS hit_rank,"
+            f" snippet({FTS_TABLE}, -1, :mark_open, :mark_close, :ellipsis, :tokens) AS snippet"
+            + base
+            + " ORDER BY hit_rank, j.id LIMIT :limit"
+        ),
+        {
+            **params,
+            "mark_open": _RAW_OPEN,
+            "mark_close": _RAW_CLOSE,
+            "ellipsis": ELLIPSIS,
+            "tokens": JOURNAL_SEARCH_SNIPPET_TOKENS,
+            "limit": page.limit + 1,
+        },
+    )).mappings().all()
+
+    # (hit_rank: the FTS5 table has a hidden `rank` column of its own)
+    hits = [
+        {**row, "rank": row["hit_rank"], "snippet": _render(row["snippet"])}
+        for row in rows[:page.limit]
+    ]
+    next_cursor = None
+    if len(rows) > page.limit and hits:
+        next_cursor = encode_cursor([hits[-1]["rank"], hits[-1]["id"]])
+    return hits, next_cursor, total
+
+
+def _render(raw: Optional[str]) -> str:
+    """Escapes snippet text, then turns the raw match markers into <mark> tags."""
+    escaped = html.escape(raw or "")
+    return escaped.replace(_RAW_OPEN, MARK_OPEN).replace(_RAW_CLOSE, MARK_CLOSE)
+
+
+def _snippet(entry: JournalEntry, terms: List[str]) -> str:
+    """Text around the first matching term, marked like FTS5's snippet()."""
+    lowered_terms = [term.lower() for term in terms]
+    for field in (entry.content, entry.ai_reflection):
+        if not field:
+            continue
+        words = field.replace(_RAW_OPEN, "").replace(_RAW_CLOSE, "").split()
+        for index, word in enumerate(words):
+            if any(term in word.lower() for term in lowered_terms):
+                start = max(0, index - JOURNAL_SEARCH_SNIPPET_TOKENS // 2)
+                window = words[start:start + JOURNAL_SEARCH_SNIPPET_TOKENS]
+                window[index - start] = _RAW_OPEN + window[index - start] + _RAW_CLOSE
+                prefix = ELLIPSIS if start > 0 else ""
+                suffix = ELLIPSIS if start + JOURNAL_SEARCH_SNIPPET_TOKENS < len(words) else ""
+                return _render(prefix + " ".join(window) + suffix)
+    return _render(" ".join(entry.content.split()[:JOURNAL_SEARCH_SNIPPET_TOKENS]))
+
+
+async def search_like(session, terms: List[str], page: PageParams, date_from: Optional[date] = None,
+                      date_to: Optional[date] = None, emotion_label: Optional[str] = None
+                      ) -> Tuple[List[dict], Optional[str], Optional[int]]:
+    """Fallback without an index: every term must appear; newest first, unranked."""
+    statement = select(JournalEntry)
+    for term in terms:
+        pattern = f"%{term}%"
+        statement = statement.where(or_(
+            JournalEntry.content.ilike(pattern),
+            JournalEntry.ai_reflection.ilike(pattern),
+        ))
+    if date_from:
+        statement = statement.where(JournalEntry.date >= date_from)
+    if date_to:
+        statement = statement.where(JournalEntry.date <= date_to)
+    if emotion_label:
+        statement = statement.where(JournalEntry.emotion_label == emotion_label)
+
+    total = (await session.exec(count_statement(statement))).one() if page.include_total else None
+    rows = (await session.exec(page_statement(statement, _LIST_ORDER, page))).all()
+    entries, next_cursor = finish_page(rows, _LIST_ORDER, page)
+
+    hits = [
+        {
+            "id": entry.id,
+            "date": entry.date,
+            "created_at": entry.created_at,
+            "emotion_label": entry.emotion_label,
+            "emotion_score": entry.emotion_score,
+            "is_favorite": entry.is_favorite,
+            "rank": None,
+            "snippet": _snippet(entry, terms),
+        }
+        for entry in entries
+    ]
+    return hits, next_cursor, total
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main(argv: Optional[List[str]] = None) -> int:
+    from .database import create_db_and_tables, engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.journal_search")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args(argv)
+
+    if engine.dialect.name != "sqlite":
+        print("✘ Full-text index is SQLite-only; search uses the LIKE fallback here")
+        return 1
+
+    create_db_and_tables()
+    with engine.begin() as conn:
+        if args.command == "rebuild":
+            if not rebuild_index(conn):
+                return 1
+            count = conn.execute(text("SELECT COUNT(*) FROM journalentry")).scalar()
+            print(f"✔ Rebuilt journal search index over {count} entries")
+            return 0
+
+        try:
+            # rank = 1: also compare against the journalentry rows
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('integrity-check', 1)"))
+        except Exception as e:
+            print("✘ Journal search index is out of step:", e)
+            return 1
+    print("✔ Journal search index is consistent")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,20 @@
+import os
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .database import create_db_and_tables
-from .routes import health, emotion_routes, moods, tasks, journal, chat, auth
+from .database import create_db_and_tables, dispose_async_engine, log_database_settings
+from .routes import health, emotion_routes, moods, tasks, journal, chat, auth, analytics, plan
 from . import google_calendar  # ← ONLY correct import
+from . import chat_ai, emotion, journal_embeddings, journal_enrichment
+from .readiness import start_background_warmup, track_load
 
 from .scheduler import start_scheduler
 
+# Load the emotion model / Gemini SDK / Google libs in the background
+# after startup instead of on the first request that needs them.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") != "0"
+
 app = FastAPI(
     title="Mood Study Planner API",
     version="1.2.0",
@@ -20,7 +28,25 @@ app = FastAPI(
 @app.on_event("startup")
 def startup_event():
     start_scheduler()
-    create_db_and_tables()
+    with track_load("database"):
+        create_db_and_tables()
+    log_database_settings()
+    journal_enrichment.recover_pending_jobs()
+
+    if WARMUP_ON_STARTUP:
+        emotion_subsystem = "emotion_workers" if emotion.EMOTION_WORKERS > 0 else "emotion_model"
+        start_background_warmup({
+            emotion_subsystem: emotion.warm_up,
+            "gemini": chat_ai.get_model,
+            "google_calendar": google_calendar.load_google_libs,
+            "journal_embeddings": journal_embeddings.warm_up,
+        })
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    emotion.shutdown()
+    await dispose_async_engine()
 
 
 # CORS
@@ -32,6 +58,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 
@@ -43,6 +70,8 @@ app.include_router(tasks.router)
 app.include_router(journal.router)
 app.include_router(chat.router)
 app.include_router(auth.router)
+app.include_router(analytics.router)
+app.include_router(plan.router)
 
 # ✔ Only one router for Google Calendar
 app.include_router(google_calendar.router)
@@ -0,0 +1,26 @@
+from typing import Callable, Dict
+
+
+# ---------------------------------------------------------
+# Lightweight in-process metrics registry
+# ---------------------------------------------------------
+# Subsystems register a function returning a dict of their current
+# counters; GET /metrics collects them into one JSON document.
+
+_providers: Dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, provider: Callable[[], dict]) -> None:
+    """Register (or replace) the stats provider for a subsystem."""
+    _providers[name] = provider
+
+
+def snapshot() -> dict:
+    """Returns the current stats of every registered subsystem."""
+    result = {}
+    for name, provider in list(_providers.items()):
+        try:
+            result[name] = provider()
+        except Exception as e:
+            result[name] = {"error": str(e)}
+    return result
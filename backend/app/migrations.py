@@ -0,0 +1,275 @@
+import argparse
+import sys
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+
+# ---------------------------------------------------------
+# Versioned, forward-only schema migrations
+# ---------------------------------------------------------
+# `SQLModel.metadata.create_all` only creates missing tables; it never
+# changes an existing one. Everything else (indexes, new columns on old
+# tables) goes here as a numbered migration. Applied versions are
+# recorded in `schema_migrations`, and each migration runs once, in its
+# own transaction, in version order. Migrations are never edited or
+# removed after release — add a new one instead.
+#
+# CLI:
+#   python -m app.migrations upgrade      create tables + apply pending
+#   python -m app.migrations status       list applied / pending versions
+#   python -m app.migrations check-plans  fail if a hot query scans a table
+#                                         (also run by tests/test_migrations.py)
+
+Migration = Tuple[int, str, Callable[[Connection], None]]
+
+
+def _create_index(conn: Connection, name: str, table: str, columns: str, unique: bool = False) -> None:
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    conn.execute(text(f'CREATE {kind} IF NOT EXISTS {name} ON "{table}" ({columns})'))
+
+
+class MigrationError(RuntimeError):
+    """A migration cannot run on the current data; the message says what to fix."""
+
+
+# -----------------------------
+# Migrations
+# -----------------------------
+def _check_unique(conn: Connection, table: str, column: str) -> None:
+    """Fails with the offending values before a unique index is created."""
+    duplicates = conn.execute(text(
+        f'SELECT {column}, COUNT(*) FROM "{table}" GROUP BY {column} HAVING COUNT(*) > 1 ORDER BY {column}'
+    )).all()
+    if duplicates:
+        listed = ", ".join(f"{value!r} ({count} rows)" for value, count in duplicates[:20])
+        more = f" and {len(duplicates) - 20} more" if len(duplicates) > 20 else ""
+        raise MigrationError(
+            f"cannot add a unique index on {table}.{column}: duplicate values {listed}{more}. "
+            f"Merge or delete the duplicate rows, then restart."
+        )
+
+
+def _m001_hot_query_indexes(conn: Connection) -> None:
+    # latest mood (chat context): ORDER BY date DESC, created_at DESC
+    # reset_daily_mood: WHERE date = :today
+    _create_index(conn, "ix_mood_date_created_at", "mood", "date, created_at")
+    # GET /mood/ keyset pages: ORDER BY date DESC, id DESC
+    _create_index(conn, "ix_mood_date_id", "mood", "date, id")
+    # GET /journal/ keyset pages
+    _create_index(conn, "ix_journalentry_created_at_id", "journalentry", "created_at, id")
+    # GET /tasks/ keyset pages + due-date range filters
+    _create_index(conn, "ix_task_created_at_id", "task", "created_at, id")
+    _create_index(conn, "ix_task_due_datetime", "task", "due_datetime")
+    # Every signup + login looks users up by email
+    _check_unique(conn, "user", "email")
+    _create_index(conn, "ux_user_email", "user", "email", unique=True)
+
+
+def _m002_enrichment_job_status_index(conn: Connection) -> None:
+    # recover_pending_jobs() at startup: WHERE status = 'pending'
+    _create_index(conn, "ix_journalenrichmentjob_status", "journalenrichmentjob", "status")
+
+
+def _m003_backfill_analytics_rollups(conn: Connection) -> None:
+    # New table (created by create_all); seed it from existing history.
+    # From here on routes keep it current incrementally.
+    from .analytics import rebuild_rollups
+
+    rebuild_rollups(conn)
+
+
+def _m004_user_google_token_expiry_index(conn: Connection) -> None:
+    # refresh_expiring_tokens(): WHERE google_token_expiry < :cutoff
+    _create_index(conn, "ix_user_google_token_expiry", "user", "google_token_expiry")
+
+
+def _m005_journal_full_text_index(conn: Connection) -> None:
+    # GET /journal/search: FTS5 index + sync triggers, filled from the
+    # existing entries. No-op on other databases (LIKE fallback).
+    from .journal_search import rebuild_index
+
+    rebuild_index(conn)
+
+
+def _m006_calendar_links_per_user(conn: Connection) -> None:
+    # taskcalendarlink gains user_id in its primary key: tasks sync to
+    # each connected user's own calendar. The primary key cannot be
+    # altered in place, so the (small) table is recreated. Old links came
+    # from the single shared account; they are kept only if exactly one
+    # user is connected now, otherwise that user's next sync would patch
+    # events on another calendar.
+    columns = {column["name"] for column in inspect(conn).get_columns("taskcalendarlink")}
+    if "user_id" in columns:
+        return  # created with the new schema by create_all
+
+    rows = conn.execute(text(
+        "SELECT task_id, calendar_id, event_id, synced_task_updated_at, synced_at FROM taskcalendarlink"
+    )).mappings().all()
+    owners = conn.execute(text(
+        'SELECT id FROM "user" WHERE google_refresh_token IS NOT NULL'
+    )).scalars().all()
+
+    conn.execute(text("DROP TABLE taskcalendarlink"))
+    conn.execute(text(
+        "CREATE TABLE taskcalendarlink ("
+        ' user_id INTEGER NOT NULL REFERENCES "user" (id),'
+        " task_id INTEGER NOT NULL,"
+        " calendar_id VARCHAR NOT NULL,"
+        " event_id VARCHAR NOT NULL,"
+        " synced_task_updated_at TIMESTAMP NOT NULL,"
+        " synced_at TIMESTAMP NOT NULL,"
+        " PRIMARY KEY (user_id, task_id))"
+    ))
+
+    if rows and len(owners) == 1:
+        conn.execute(
+            text(
+                "INSERT INTO taskcalendarlink"
+                " (user_id, task_id, calendar_id, event_id, synced_task_updated_at, synced_at)"
+                " VALUES (:user_id, :task_id, :calendar_id, :event_id, :synced_task_updated_at, :synced_at)"
+            ),
+            [{**row, "user_id": owners[0]} for row in rows],
+        )
+    elif rows:
+        print(f"… Dropped {len(rows)} calendar link(s): no single connected owner; the next sync recreates them")
+
+
+MIGRATIONS: List[Migration] = [
+    (1, "indexes for hot queries (+ unique user email)", _m001_hot_query_indexes),
+    (2, "journal enrichment job status index", _m002_enrichment_job_status_index),
+    (3, "backfill analytics daily rollups", _m003_backfill_analytics_rollups),
+    (4, "user google token expiry index", _m004_user_google_token_expiry_index),
+    (5, "journal full-text search index", _m005_journal_full_text_index),
+    (6, "calendar task links keyed per user", _m006_calendar_links_per_user),
+]
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+def _ensure_version_table(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " version INTEGER PRIMARY KEY,"
+            " name VARCHAR NOT NULL,"
+            " applied_at TIMESTAMP NOT NULL)"
+        ))
+
+
+def applied_versions(engine: Engine) -> List[int]:
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))
+        return [row[0] for row in rows]
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Applies every pending migration in order. Returns the versions applied."""
+    done = set(applied_versions(engine))
+    applied = []
+
+    for version, name, migrate in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in done:
+            continue
+
+        try:
+            with engine.begin() as conn:
+                migrate(conn)
+                conn.execute(
+                    text(
+                        "INSERT INTO schema_migrations (version, name, applied_at) "
+                        "VALUES (:version, :name, :applied_at)"
+                    ),
+                    {"version": version, "name": name, "applied_at": datetime.utcnow()},
+                )
+        except Exception as e:
+            # Another worker may have applied it concurrently
+            if version in applied_versions(engine):
+                continue
+            print(f"✘ Migration {version} ({name}) failed:", e)
+            raise
+
+        print(f"✔ Applied migration {version}: {name}")
+        applied.append(version)
+
+    return applied
+
+
+# -----------------------------
+# Query-plan check (SQLite)
+# -----------------------------
+HOT_QUERIES = {
+    "mood summary rebuild (latest mood)":
+        "SELECT * FROM mood ORDER BY date DESC, created_at DESC LIMIT 1",
+    "reset_daily_mood":
+        "SELECT id FROM mood WHERE date = '2024-01-01'",
+    "login / signup email lookup":
+        "SELECT * FROM \"user\" WHERE email = 'someone@example.com'",
+    "GET /mood/ page":
+        "SELECT * FROM mood WHERE (date, id) < ('2024-01-01', 100) "
+        "ORDER BY date DESC, id DESC LIMIT 101",
+    "GET /journal/ page":
+        "SELECT * FROM journalentry WHERE (created_at, id) < ('2024-01-01 00:00:00', 100) "
+        "ORDER BY created_at DESC, id DESC LIMIT 101",
+    "GET /tasks/ page":
+        "SELECT * FROM task WHERE (created_at, id) < ('2024-01-01 00:00:00', 100) "
+        "ORDER BY created_at DESC, id DESC LIMIT 101",
+    "enrichment recovery":
+        "SELECT * FROM journalenrichmentjob WHERE status = 'pending'",
+    "analytics summary (rollup range)":
+        "SELECT day, mood, emotion_label, entries, score_sum, scored FROM analyticsdailyrollup "
+        "WHERE source = 'mood' AND day >= '2024-01-01' AND day <= '2024-12-31' AND entries > 0",
+}
+
+
+def check_query_plans(engine: Engine) -> List[str]:
+    """
+    Runs EXPLAIN QUERY PLAN for each hot query. Returns a list of
+    problems: full table scans or temp B-trees for ORDER BY.
+    """
+    if engine.dialect.name != "sqlite":
+        return []
+
+    problems = []
+    with engine.connect() as conn:
+        for label, sql in HOT_QUERIES.items():
+            plan = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+            for step in plan:
+                scans_table = step.startswith("SCAN") and "USING" not in step
+                if scans_table or "USE TEMP B-TREE" in step:
+                    problems.append(f"{label}: {step}")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .database import create_db_and_tables, engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.migrations")
+    parser.add_argument("command", choices=["upgrade", "status", "check-plans"])
+    args = parser.parse_args(argv)
+
+    if args.command == "upgrade":
+        create_db_and_tables()
+        return 0
+
+    if args.command == "status":
+        done = set(applied_versions(engine))
+        for version, name, _ in MIGRATIONS:
+            print(f"{'applied' if version in done else 'pending'}  {version:03d}  {name}")
+        return 0
+
+    create_db_and_tables()
+    problems = check_query_plans(engine)
+    for problem in problems:
+        print("✘", problem)
+    if not problems:
+        print("✔ All hot queries use an index")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,12 @@
 from datetime import datetime, date
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 from sqlmodel import SQLModel, Field, Relationship
 
 
+# Secondary indexes are added by app/migrations.py, not here, so that
+# existing databases get them too.
+
 # ======================================================
 #                     MOOD MODELS
 # ======================================================
@@ -34,6 +37,80 @@ class MoodRead(MoodBase):
     created_at: datetime
 
 
+class MoodArchive(MoodBase, table=True):
+    """
+    Moods removed by the daily reset job with SCHEDULER_ARCHIVE_MOODS=1.
+    `mood_id` is the original mood id (SQLite reuses ids of deleted rows,
+    so it is not unique here). analytics.rebuild_rollups counts these
+    alongside `mood`, so archived history survives a rollup rebuild.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    mood_id: int
+    created_at: datetime
+    archived_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class AnalyticsDailyRollup(SQLModel, table=True):
+    """
+    Per-day counts for the analytics API, kept current on every mood /
+    journal write by app/analytics.py. `source` is "mood" or "journal";
+    `mood` / `emotion_label` are "" when not set.
+    """
+    source: str = Field(primary_key=True)
+    day: date = Field(primary_key=True)
+    mood: str = Field(default="", primary_key=True)
+    emotion_label: str = Field(default="", primary_key=True)
+    entries: int = Field(default=0)
+    score_sum: float = Field(default=0.0)
+    scored: int = Field(default=0)
+
+
+class AnalyticsSummary(SQLModel):
+    source: str
+    granularity: str
+    date_from: date
+    date_to: date
+    periods: List[date]
+    entries: List[int]
+    by_mood: Dict[str, List[int]]
+    by_emotion: Dict[str, List[int]]
+    mean_emotion_score: List[Optional[float]]
+    rolling_window: int
+    rolling_entries: List[float]
+    rolling_mean_emotion_score: List[Optional[float]]
+    current_streak_days: int
+    longest_streak_days: int
+
+
+class SchedulerJobRun(SQLModel, table=True):
+    """
+    One row per scheduled job: the lease that keeps it to one worker,
+    plus its last run. Maintained by app/scheduler.py.
+    """
+    name: str = Field(primary_key=True)
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    last_started_at: Optional[datetime] = None
+    last_finished_at: Optional[datetime] = None
+    last_success_at: Optional[datetime] = None
+    last_duration_ms: Optional[float] = None
+    last_rows: Optional[int] = None
+    last_error: Optional[str] = None
+    runs: int = Field(default=0)
+    failures: int = Field(default=0)
+
+
+class MoodSummary(SQLModel, table=True):
+    """
+    Single row (id=1) holding the latest mood and the chat context text
+    built from it. Maintained by app/mood_summary.py on every mood write.
+    """
+    id: int = Field(default=1, primary_key=True)
+    latest_mood_id: Optional[int] = None
+    mood_context: Optional[str] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 
 # ======================================================
 #                     TASK MODELS
@@ -71,6 +148,103 @@ class TaskUpdate(SQLModel):
     mood_tag: Optional[str] = None
 
 
+class TaskCalendarLink(SQLModel, table=True):
+    """
+    Task -> Google Calendar event mapping used by the calendar sync, per
+    user: each connected user's calendar gets its own copy of the event.
+    No foreign key to task on purpose: the link must outlive a deleted
+    task so the next sync can delete its event.
+    """
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    task_id: int = Field(primary_key=True)
+    calendar_id: str = Field(default="primary")
+    event_id: str
+    # Task.updated_at as of the last successful sync of this task
+    synced_task_updated_at: datetime
+    synced_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class CalendarSyncLease(SQLModel, table=True):
+    """
+    Keeps one calendar sync per user running at a time, across workers.
+    Taken and released by app/calendar_sync.py; expires on its own if a
+    worker dies mid-sync.
+    """
+    user_id: int = Field(primary_key=True)
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+
+
+class CalendarSyncRequest(SQLModel):
+    task_ids: Optional[List[int]] = None
+    due_from: Optional[datetime] = None
+    due_to: Optional[datetime] = None
+    include_completed: bool = True
+    # Re-send every linked task, not just the ones changed since last sync
+    full: bool = False
+
+
+class CalendarSyncResult(SQLModel):
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    failed: int = 0
+    batches: int = 0
+    errors: List[str] = []
+
+
+class PlanRequest(SQLModel):
+    # Defaults to now; the plan covers `days` whole days from its date.
+    # Naive times are CALENDAR_TIMEZONE; aware ones are converted to it
+    start: Optional[datetime] = None
+    days: int = Field(default=7, ge=1, le=31)
+    task_ids: Optional[List[int]] = None
+    # Minutes of work left per task id (default depends on mood_tag)
+    estimates: Dict[int, int] = {}
+    # Per-day energy override: "low" | "medium" | "high"
+    energy: Dict[date, str] = {}
+    day_start_hour: Optional[int] = Field(default=None, ge=0, le=23)
+    day_end_hour: Optional[int] = Field(default=None, ge=1, le=24)
+    use_calendar: bool = True
+
+
+class PlanDay(SQLModel):
+    date: date
+    energy: str
+    free_minutes: int
+    planned_minutes: int
+
+
+class PlanBlock(SQLModel):
+    task_id: int
+    title: str
+    start: datetime
+    end: datetime
+    energy: str
+    late: bool = False
+
+
+class PlanUnscheduled(SQLModel):
+    task_id: int
+    title: str
+    remaining_minutes: int
+    reason: str
+
+
+class PlanResult(SQLModel):
+    start: datetime
+    end: datetime
+    mood: Optional[str] = None
+    calendar_connected: bool = False
+    # Set when free/busy could not be fetched and the plan ignores the calendar
+    calendar_error: Optional[str] = None
+    busy_intervals: int = 0
+    days: List[PlanDay]
+    blocks: List[PlanBlock]
+    unscheduled: List[PlanUnscheduled]
+    compute_ms: float
+
+
 
 # ======================================================
 #                    JOURNAL MODELS
@@ -108,6 +282,66 @@ class JournalRead(JournalBase):
     created_at: datetime
     is_favorite: bool
     ai_reflection: Optional[str]
+    enrichment_status: Optional[str] = None
+
+
+class JournalSearchHit(SQLModel):
+    id: int
+    date: date
+    created_at: datetime
+    emotion_label: Optional[str] = None
+    emotion_score: Optional[float] = None
+    is_favorite: bool
+    # bm25 score, lower is better; None from the LIKE fallback
+    rank: Optional[float] = None
+    snippet: str
+
+
+class JournalSimilarHit(SQLModel):
+    id: int
+    date: date
+    created_at: datetime
+    emotion_label: Optional[str] = None
+    # Cosine similarity, -1..1
+    similarity: float
+    preview: str
+
+
+class JournalEmbedding(SQLModel, table=True):
+    """
+    Sentence embedding of an entry's content: float16 bytes, `dim`
+    values, L2-normalized. Written by the enrichment job; searched via
+    app/journal_embeddings.py.
+    """
+    entry_id: int = Field(foreign_key="journalentry.id", primary_key=True)
+    model_id: str
+    dim: int
+    vector: bytes
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class JournalEnrichmentJob(SQLModel, table=True):
+    """
+    Durable background job: emotion label + AI reflection for one entry.
+    status: pending | running | done | failed
+    """
+    entry_id: int = Field(foreign_key="journalentry.id", primary_key=True)
+    status: str = Field(default="pending")
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = None
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class JournalEnrichmentRead(SQLModel):
+    entry_id: int
+    status: str
+    attempts: int
+    last_error: Optional[str] = None
+    emotion_label: Optional[str] = None
+    emotion_score: Optional[float] = None
+    ai_reflection: Optional[str] = None
 
 
 
@@ -122,6 +356,10 @@ class EmotionRequest(SQLModel):
 class EmotionResponse(SQLModel):
     label: str
     score: float
+
+
+class EmotionBatchRequest(SQLModel):
+    texts: List[str]
 # ======================================================
 #                     USER / AUTH MODELS
 # ======================================================
@@ -157,6 +395,11 @@ class LoginRequest(SQLModel):
   password: str
 
 
+class PasswordChangeRequest(SQLModel):
+  current_password: str
+  new_password: str
+
+
 class Token(SQLModel):
   access_token: str
   token_type: str = "bearer"
@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+
+from . import metrics
+from .chat_ai import build_mood_context_text
+from .database import IS_SQLITE
+from .models import Mood, MoodSummary
+
+
+# ---------------------------------------------------------
+# Materialized "latest mood" for chat context
+# ---------------------------------------------------------
+# /chat/ needs the newest mood (by date, then created_at) and the context
+# string built from it on every message. Instead of querying the mood
+# table per request, the result lives in a one-row `moodsummary` table
+# plus an in-process copy:
+#
+#   read   -> in-process copy, else the summary row by primary key
+#   write  -> every mood create/delete (and the midnight reset job)
+#             recomputes the row with one indexed LIMIT 1 lookup and
+#             upserts it
+#
+# The in-process copy expires after MOOD_SUMMARY_TTL_S so that other
+# workers' writes are picked up; writes in this process update it
+# immediately.
+
+MOOD_SUMMARY_TTL_S = float(os.getenv("MOOD_SUMMARY_TTL_S", "5"))
+SUMMARY_ID = 1
+
+_lock = threading.Lock()
+# (expires_at, mood context) — context may itself be None (no moods yet)
+_cached: Optional[Tuple[float, Optional[str]]] = None
+_stats = {"hits": 0, "loads": 0, "rebuilds": 0}
+
+
+def _latest_mood_statement():
+    # Served by ix_mood_date_created_at (see app/migrations.py)
+    return select(Mood).order_by(Mood.date.desc(), Mood.created_at.desc()).limit(1)
+
+
+def _context_for(mood: Optional[Mood]) -> Optional[str]:
+    if mood is None:
+        return None
+
+    return build_mood_context_text(
+        mood_label=mood.mood,
+        mood_note=mood.note,
+        emotion_label=mood.emotion_label,
+        emotion_score=mood.emotion_score,
+    )
+
+
+def _upsert_statement(mood: Optional[Mood]):
+    # INSERT ... ON CONFLICT(id) DO UPDATE: two first rebuilds racing
+    # (two workers, or create_mood on a database without the row) both
+    # succeed instead of one failing on the primary key
+    insert = sqlite_insert if IS_SQLITE else postgresql_insert
+    values = {
+        "latest_mood_id": mood.id if mood else None,
+        "mood_context": _context_for(mood),
+        "updated_at": datetime.utcnow(),
+    }
+    statement = insert(MoodSummary).values(id=SUMMARY_ID, **values)
+    return statement.on_conflict_do_update(
+        index_elements=[MoodSummary.id],
+        set_={name: statement.excluded[name] for name in values},
+    ), values["mood_context"]
+
+
+# -----------------------------
+# In-process copy
+# -----------------------------
+def _remember(context: Optional[str], counter: str) -> None:
+    global _cached
+    with _lock:
+        _cached = (time.monotonic() + MOOD_SUMMARY_TTL_S, context)
+        _stats[counter] += 1
+
+
+def _lookup() -> Optional[Tuple[float, Optional[str]]]:
+    with _lock:
+        if _cached is not None and _cached[0] > time.monotonic():
+            _stats["hits"] += 1
+            return _cached
+        return None
+
+
+def invalidate() -> None:
+    global _cached
+    with _lock:
+        _cached = None
+
+
+# -----------------------------
+# Rebuild (after mood writes)
+# -----------------------------
+def rebuild(session: Session) -> Optional[str]:
+    """Sync variant for background jobs (scheduler). Commits."""
+    mood = session.exec(_latest_mood_statement()).first()
+    statement, context = _upsert_statement(mood)
+    session.execute(statement)
+    session.commit()
+
+    _remember(context, "rebuilds")
+    return context
+
+
+async def arebuild(session) -> Optional[str]:
+    """Async variant for routes (takes the session from get_async_session). Commits."""
+    mood = (await session.exec(_latest_mood_statement())).first()
+    statement, context = _upsert_statement(mood)
+    await session.execute(statement)
+    await session.commit()
+
+    _remember(context, "rebuilds")
+    return context
+
+
+# -----------------------------
+# Read (chat)
+# -----------------------------
+async def get_latest_mood_context(session) -> Optional[str]:
+    """The chat context for the latest mood, or None if no mood exists."""
+    cached = _lookup()
+    if cached is not None:
+        return cached[1]
+
+    summary = await session.get(MoodSummary, SUMMARY_ID, populate_existing=True)
+    if summary is None:
+        # First run on an existing database
+        return await arebuild(session)
+
+    _remember(summary.mood_context, "loads")
+    return summary.mood_context
+
+
+async def get_latest_mood(session) -> Optional[Mood]:
+    """The latest Mood row, found through the summary row's latest_mood_id."""
+    summary = await session.get(MoodSummary, SUMMARY_ID, populate_existing=True)
+    if summary is None:
+        await arebuild(session)
+        summary = await session.get(MoodSummary, SUMMARY_ID)
+    if summary is None or summary.latest_mood_id is None:
+        return None
+    return await session.get(Mood, summary.latest_mood_id)
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "ttl_s": MOOD_SUMMARY_TTL_S,
+            "cached": _cached is not None and _cached[0] > time.monotonic(),
+            **_stats,
+        }
+
+
+metrics.register("mood_summary", stats)
@@ -0,0 +1,117 @@
+import base64
+import json
+import os
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import func, tuple_
+from sqlmodel import select
+
+
+# ---------------------------------------------------------
+# Keyset (cursor) pagination for list endpoints
+# ---------------------------------------------------------
+# Lists are ordered newest first on a sort key plus `id` as a tiebreak,
+# e.g. (created_at DESC, id DESC). The cursor is the sort key of the
+# last row on the page, so the next page is
+#   WHERE (created_at, id) < (:last_created_at, :last_id)
+# which is an index seek, not an OFFSET scan — page 500 costs the same
+# as page 1.
+#
+# The body stays a plain JSON list; paging info goes in headers:
+#   X-Next-Cursor  — pass back as ?cursor= (absent on the last page)
+#   X-Total-Count  — only with ?include_total=true
+
+DEFAULT_PAGE_SIZE = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+MAX_PAGE_SIZE = int(os.getenv("PAGE_SIZE_MAX", "500"))
+
+
+class PageParams:
+    """Query parameters shared by paginated list endpoints."""
+
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        include_total: bool = Query(False, description="Also return X-Total-Count"),
+    ):
+        self.cursor = cursor
+        self.limit = limit
+        self.include_total = include_total
+
+
+# -----------------------------
+# Cursor encoding
+# -----------------------------
+def _to_json(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_to_json(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("wrong cursor shape")
+
+        decoded = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+            decoded.append(value)
+        return decoded
+
+    except (ValueError, TypeError, NotImplementedError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# -----------------------------
+# Statement helpers
+# -----------------------------
+def page_statement(statement, order_columns: Sequence[Any], params: PageParams):
+    """
+    Adds keyset ordering, the cursor condition and LIMIT (+1 row to
+    detect whether another page exists) to a filtered SELECT.
+    """
+    if params.cursor:
+        values = decode_cursor(params.cursor, order_columns)
+        statement = statement.where(tuple_(*order_columns) < tuple_(*values))
+
+    return (
+        statement
+        .order_by(*[column.desc() for column in order_columns])
+        .limit(params.limit + 1)
+    )
+
+
+def count_statement(statement):
+    """COUNT(*) over a filtered SELECT (before paging is applied)."""
+    return select(func.count()).select_from(statement.order_by(None).subquery())
+
+
+def finish_page(rows: Sequence[Any], order_columns: Sequence[Any], params: PageParams) -> Tuple[List[Any], Optional[str]]:
+    """Splits off the look-ahead row and builds the next cursor."""
+    items = list(rows[:params.limit])
+    if len(rows) <= params.limit or not items:
+        return items, None
+
+    last = items[-1]
+    return items, encode_cursor([getattr(last, column.key) for column in order_columns])
+
+
+def set_page_headers(response: Response, next_cursor: Optional[str], total: Optional[int] = None) -> None:
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
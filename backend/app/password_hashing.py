@@ -0,0 +1,139 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from . import metrics
+
+
+# ---------------------------------------------------------
+# Argon2 password hashing off the request threadpool
+# ---------------------------------------------------------
+# Argon2 is slow on purpose. Running it in FastAPI's shared threadpool
+# means a burst of logins starves every other sync route, so hashes run
+# on a small dedicated executor instead. At most PASSWORD_HASH_WORKERS
+# hashes run at once; up to PASSWORD_HASH_MAX_QUEUE more may wait, and
+# anything beyond that gets a 503 straight away rather than an
+# unbounded wait.
+#
+# Argon2 cost parameters come from the environment. passlib marks hashes
+# made with other parameters as needing an update, and login rehashes
+# them transparently (see verify_and_update).
+
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST_KIB = int(os.getenv("ARGON2_MEMORY_COST_KIB", "65536"))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__time_cost=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST_KIB,
+    argon2__parallelism=ARGON2_PARALLELISM,
+)
+
+T = TypeVar("T")
+
+
+class HashExecutor:
+    """Bounded executor for password hashing, with queueing metrics."""
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.total_run_s = 0.0
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        with self._lock:
+            # Everything submitted but not finished: running + waiting
+            if self.queued + self.running >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Too many sign-ins right now, please retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self.queued += 1
+
+        future = self._executor.submit(self._timed, time.perf_counter(), fn, args)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Client went away before the hash started: free its queue slot
+            if future.cancel():
+                with self._lock:
+                    self.queued -= 1
+            raise
+
+    def _timed(self, submitted_at: float, fn: Callable[..., T], args: tuple) -> T:
+        started_at = time.perf_counter()
+        wait = started_at - submitted_at
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.total_wait_s += wait
+            self.max_wait_s = max(self.max_wait_s, wait)
+
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.total_run_s += time.perf_counter() - started_at
+
+    def stats(self) -> dict:
+        with self._lock:
+            done = self.completed or 1
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(1000 * self.total_wait_s / done, 2),
+                "max_wait_ms": round(1000 * self.max_wait_s, 2),
+                "avg_hash_ms": round(1000 * self.total_run_s / done, 2),
+                "argon2": {
+                    "time_cost": ARGON2_TIME_COST,
+                    "memory_cost_kib": ARGON2_MEMORY_COST_KIB,
+                    "parallelism": ARGON2_PARALLELISM,
+                },
+            }
+
+
+hash_executor = HashExecutor(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+metrics.register("password_hashing", hash_executor.stats)
+
+
+# -----------------------------
+# Async helpers (routes)
+# -----------------------------
+async def hash_password(password: str) -> str:
+    return await hash_executor.run(pwd_context.hash, password)
+
+
+async def verify_and_update(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifies a password. On success, also returns a fresh hash if the
+    stored one was made with different Argon2 parameters (else None).
+    """
+    return await hash_executor.run(pwd_context.verify_and_update, plain, hashed)
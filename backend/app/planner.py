@@ -0,0 +1,408 @@
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from . import metrics
+
+
+# ---------------------------------------------------------
+# Study plan generator
+# ---------------------------------------------------------
+# Packs open tasks into the free time of the next few days:
+#
+#   1. free slots   = each day's study window (PLAN_DAY_START_HOUR ..
+#                     PLAN_DAY_END_HOUR) minus the merged calendar busy
+#                     intervals, in one sorted sweep;
+#   2. day energy   = the latest mood (and its emotion label) for the
+#                     mood's day and PLAN_MOOD_CARRY_DAYS after it,
+#                     "medium" otherwise, unless the request overrides it;
+#   3. packing      = a chronological sweep over the slots with one
+#                     earliest-deadline-first heap per task energy
+#                     (low_energy / medium_focus / high_focus).
+#
+# At each point in a slot the packer takes, in order: a task that is
+# urgent (less than PLAN_URGENT_SLACK_H of slack before its due time),
+# a task matching the day's energy, an easier one, and, except on
+# low-energy days, a harder one. Low days are left free otherwise.
+# Work is split into blocks of at most PLAN_MAX_BLOCK_MIN minutes with
+# PLAN_BREAK_MIN minutes between them.
+#
+# Times are integer minutes from midnight of the first day, so a week of
+# hundreds of tasks and busy intervals is O((slots + blocks) log tasks).
+#
+#   python -m app.planner bench --tasks 500 --busy 200
+
+PLAN_DEFAULT_DAYS = int(os.getenv("PLAN_DEFAULT_DAYS", "7"))
+PLAN_MAX_DAYS = int(os.getenv("PLAN_MAX_DAYS", "31"))
+PLAN_MAX_TASKS = int(os.getenv("PLAN_MAX_TASKS", "2000"))
+PLAN_DAY_START_HOUR = int(os.getenv("PLAN_DAY_START_HOUR", "9"))
+PLAN_DAY_END_HOUR = int(os.getenv("PLAN_DAY_END_HOUR", "21"))
+PLAN_MAX_BLOCK_MIN = int(os.getenv("PLAN_MAX_BLOCK_MIN", "90"))
+PLAN_MIN_BLOCK_MIN = int(os.getenv("PLAN_MIN_BLOCK_MIN", "20"))
+PLAN_BREAK_MIN = int(os.getenv("PLAN_BREAK_MIN", "10"))
+PLAN_URGENT_SLACK_H = float(os.getenv("PLAN_URGENT_SLACK_H", "24"))
+PLAN_MOOD_CARRY_DAYS = int(os.getenv("PLAN_MOOD_CARRY_DAYS", "1"))
+PLAN_EMOTION_MIN_SCORE = float(os.getenv("PLAN_EMOTION_MIN_SCORE", "0.6"))
+
+LOW, MEDIUM, HIGH = 0, 1, 2
+ENERGY_NAMES = ("low", "medium", "high")
+
+# Task.mood_tag -> energy the task needs (untagged tasks count as medium)
+TASK_ENERGY = {"low_energy": LOW, "medium_focus": MEDIUM, "high_focus": HIGH}
+TASK_DEFAULT_MINUTES = {LOW: 30, MEDIUM: 60, HIGH: 90}
+
+MOOD_ENERGY = {
+    "happy": HIGH, "great": HIGH, "excited": HIGH,
+    "okay": MEDIUM, "calm": MEDIUM,
+    "tired": LOW, "sad": LOW, "stressed": LOW, "anxious": LOW,
+}
+EMOTION_ENERGY = {"joy": HIGH, "love": HIGH, "surprise": MEDIUM, "sadness": LOW, "fear": LOW, "anger": LOW}
+
+_stats = {"plans": 0, "last_ms": 0.0, "max_ms": 0.0}
+
+
+class PlanTask(NamedTuple):
+    id: int
+    title: str
+    due: Optional[int]  # minutes from the plan origin; negative = overdue
+    minutes: int
+    energy: int
+
+
+class Block(NamedTuple):
+    task_index: int
+    start: int
+    end: int
+    late: bool  # task was already overdue when the plan was made
+
+
+# -----------------------------
+# Energy
+# -----------------------------
+def energy_for_mood(mood: Optional[str], emotion_label: Optional[str] = None,
+                    emotion_score: Optional[float] = None) -> int:
+    """Energy level for a logged mood; a confident emotion label pulls it toward its own."""
+    energy = MOOD_ENERGY.get((mood or "").strip().lower())
+    emotion = EMOTION_ENERGY.get((emotion_label or "").lower())
+
+    if energy is None:
+        return emotion if emotion is not None else MEDIUM
+    if emotion is not None and (emotion_score or 0) >= PLAN_EMOTION_MIN_SCORE:
+        # Round down: when they disagree, plan the lighter day
+        return (energy + emotion) // 2
+    return energy
+
+
+def task_energy(mood_tag: Optional[str]) -> int:
+    return TASK_ENERGY.get(mood_tag or "", MEDIUM)
+
+
+def day_energies(first_day: date, days: int, mood_day: Optional[date], mood_energy: Optional[int],
+                 overrides: Optional[Dict[date, int]] = None) -> List[int]:
+    energies = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        energy = MEDIUM
+        if mood_day is not None and mood_energy is not None and 0 <= (day - mood_day).days <= PLAN_MOOD_CARRY_DAYS:
+            energy = mood_energy
+        if overrides and day in overrides:
+            energy = overrides[day]
+        energies.append(energy)
+    return energies
+
+
+# -----------------------------
+# Free time
+# -----------------------------
+def merge_intervals(intervals: Sequence[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_slots(days: int, day_start_min: int, day_end_min: int, busy: Sequence[Tuple[int, int]],
+               not_before: int = 0) -> List[Tuple[int, int, int]]:
+    """(start, end, day index) free slots in time order, in minutes from the origin."""
+    busy = merge_intervals(busy)
+    slots: List[Tuple[int, int, int]] = []
+    first = 0
+
+    for day in range(days):
+        lo = max(day * 1440 + day_start_min, not_before)
+        hi = day * 1440 + day_end_min
+        if lo >= hi:
+            continue
+
+        # Merged intervals have increasing ends, so skipped ones stay skipped
+        while first < len(busy) and busy[first][1] <= lo:
+            first += 1
+
+        cursor = lo
+        index = first
+        while index < len(busy) and busy[index][0] < hi:
+            if busy[index][0] > cursor:
+                slots.append((cursor, busy[index][0], day))
+            cursor = max(cursor, busy[index][1])
+            index += 1
+        if cursor < hi:
+            slots.append((cursor, hi, day))
+
+    return slots
+
+
+# -----------------------------
+# Packing
+# -----------------------------
+def _pick(heaps: List[list], now: int, energy: int, remaining: List[int], dated: List[bool],
+          slack: int, expired: List[int]) -> Optional[int]:
+    """The energy level whose heap top should run next, or None to leave the slot free."""
+    for heap in heaps:
+        # Drop tasks whose due time has passed (overdue-at-start ones stay)
+        while heap and 0 <= heap[0][0] <= now:
+            expired.append(heapq.heappop(heap)[1])
+
+    # Undated tasks sort by the horizon end but are never urgent
+    urgent = [
+        (heap[0][0], level) for level, heap in enumerate(heaps)
+        if heap and dated[heap[0][1]] and heap[0][0] - now - remaining[heap[0][1]] < slack
+    ]
+    if urgent:
+        return min(urgent)[1]
+
+    if heaps[energy]:
+        return energy
+    for level in range(energy - 1, -1, -1):
+        if heaps[level]:
+            return level
+    if energy > LOW:
+        for level in range(energy + 1, len(heaps)):
+            if heaps[level]:
+                return level
+    return None
+
+
+def pack(tasks: Sequence[PlanTask], slots: Sequence[Tuple[int, int, int]], energies: Sequence[int],
+         horizon_end: int) -> Tuple[List[Block], List[int], List[int]]:
+    """
+    Returns (blocks, remaining minutes per task, indexes of tasks that hit
+    their due time before they were done).
+    """
+    heaps: List[list] = [[], [], []]
+    remaining = [task.minutes for task in tasks]
+    dated = [task.due is not None for task in tasks]
+    for index, task in enumerate(tasks):
+        deadline = task.due if task.due is not None else horizon_end
+        heaps[task.energy].append((deadline, index))
+    for heap in heaps:
+        heapq.heapify(heap)
+
+    slack = int(PLAN_URGENT_SLACK_H * 60)
+    blocks: List[Block] = []
+    expired: List[int] = []
+
+    for start, end, day in slots:
+        now = start
+        while now < end:
+            level = _pick(heaps, now, energies[day], remaining, dated, slack, expired)
+            if level is None:
+                break
+
+            deadline, index = heaps[level][0]
+            late = deadline < 0
+            limit = end if late or deadline >= end else deadline
+            length = min(remaining[index], PLAN_MAX_BLOCK_MIN, limit - now)
+
+            if length < min(remaining[index], PLAN_MIN_BLOCK_MIN):
+                if limit == end:
+                    break  # too little of this slot left
+                expired.append(heapq.heappop(heaps[level])[1])  # not enough time before due
+                continue
+
+            heapq.heappop(heaps[level])
+            blocks.append(Block(index, now, now + length, late))
+            remaining[index] -= length
+            if remaining[index] > 0:
+                heapq.heappush(heaps[level], (deadline, index))
+            now += length + PLAN_BREAK_MIN
+
+    return blocks, remaining, expired
+
+
+def record_timing(elapsed_ms: float) -> None:
+    _stats["plans"] += 1
+    _stats["last_ms"] = round(elapsed_ms, 3)
+    _stats["max_ms"] = max(_stats["max_ms"], _stats["last_ms"])
+
+
+def stats() -> dict:
+    return dict(_stats)
+
+
+metrics.register("planner", stats)
+
+
+# -----------------------------
+# Plan (route helper)
+# -----------------------------
+def build_plan(tasks: Sequence, start: datetime, days: int, busy: Sequence[Tuple[datetime, datetime]],
+               mood=None, estimates: Optional[Dict[int, int]] = None,
+               energy_overrides: Optional[Dict[date, str]] = None,
+               day_start_hour: int = PLAN_DAY_START_HOUR, day_end_hour: int = PLAN_DAY_END_HOUR) -> dict:
+    """
+    Plans `tasks` (Task rows) from `start` over `days` days. `busy` are
+    naive local datetimes; `mood` is the latest Mood row, if any.
+    Returns a dict matching models.PlanResult.
+    """
+    started = time.perf_counter()
+    origin = datetime.combine(start.date(), datetime.min.time())
+    horizon_end = days * 1440
+    estimates = estimates or {}
+
+    def minutes(value: datetime) -> int:
+        return int((value - origin).total_seconds() // 60)
+
+    plan_tasks = []
+    for task in tasks:
+        energy = task_energy(task.mood_tag)
+        plan_tasks.append(PlanTask(
+            id=task.id,
+            title=task.title,
+            due=minutes(task.due_datetime) if task.due_datetime else None,
+            minutes=max(1, estimates.get(task.id, TASK_DEFAULT_MINUTES[energy])),
+            energy=energy,
+        ))
+
+    mood_energy = energy_for_mood(mood.mood, mood.emotion_label, mood.emotion_score) if mood else None
+    overrides = {day: ENERGY_NAMES.index(name) for day, name in (energy_overrides or {}).items()}
+    energies = day_energies(origin.date(), days, mood.date if mood else None, mood_energy, overrides)
+
+    busy_minutes = [(minutes(b_start), minutes(b_end)) for b_start, b_end in busy]
+    slots = free_slots(days, day_start_hour * 60, day_end_hour * 60, busy_minutes, not_before=minutes(start))
+    blocks, remaining, expired = pack(plan_tasks, slots, energies, horizon_end)
+
+    planned = [0] * days
+    for block in blocks:
+        planned[block.start // 1440] += block.end - block.start
+    free = [0] * days
+    for slot_start, slot_end, day in slots:
+        free[day] += slot_end - slot_start
+
+    expired_set = set(expired)
+    unscheduled = []
+    for index, task in enumerate(plan_tasks):
+        if remaining[index] <= 0:
+            continue
+        if index in expired_set:
+            reason = "not enough free time before due"
+        elif task.energy > LOW and all(energy == LOW for energy in energies):
+            reason = "only low-energy days in the plan window"
+        else:
+            reason = "no free time left in the plan window"
+        unscheduled.append({
+            "task_id": task.id,
+            "title": task.title,
+            "remaining_minutes": remaining[index],
+            "reason": reason,
+        })
+
+    elapsed_ms = 1000 * (time.perf_counter() - started)
+    record_timing(elapsed_ms)
+
+    return {
+        "start": start,
+        "end": origin + timedelta(minutes=horizon_end),
+        "mood": mood.mood if mood else None,
+        "days": [
+            {
+                "date": origin.date() + timedelta(days=offset),
+                "energy": ENERGY_NAMES[energies[offset]],
+                "free_minutes": free[offset],
+                "planned_minutes": planned[offset],
+            }
+            for offset in range(days)
+        ],
+        "blocks": [
+            {
+                "task_id": plan_tasks[block.task_index].id,
+                "title": plan_tasks[block.task_index].title,
+                "start": origin + timedelta(minutes=block.start),
+                "end": origin + timedelta(minutes=block.end),
+                "energy": ENERGY_NAMES[plan_tasks[block.task_index].energy],
+                "late": block.late,
+            }
+            for block in blocks
+        ],
+        "unscheduled": unscheduled,
+        "busy_intervals": len(busy_minutes),
+        "compute_ms": round(elapsed_ms, 3),
+    }
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _synthetic(task_count: int, busy_count: int, days: int, seed: int = 0):
+    rng = random.Random(seed)
+    tasks = [
+        PlanTask(
+            id=index,
+            title=f"task {index}",
+            due=rng.randrange(-600, days * 1440 + 2880) if rng.random() < 0.9 else None,
+            minutes=rng.choice((15, 30, 45, 60, 90, 120, 180)),
+            energy=rng.choice((LOW, MEDIUM, MEDIUM, HIGH)),
+        )
+        for index in range(task_count)
+    ]
+    busy = []
+    for _ in range(busy_count):
+        # Inside the study window, where they actually cost free time
+        day = rng.randrange(days)
+        start = day * 1440 + rng.randrange(PLAN_DAY_START_HOUR * 60, PLAN_DAY_END_HOUR * 60)
+        busy.append((start, start + rng.choice((15, 30, 45, 60, 90))))
+    energies = [rng.choice((LOW, MEDIUM, HIGH)) for _ in range(days)]
+    return tasks, busy, energies
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.planner")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--busy", type=int, default=200)
+    parser.add_argument("--days", type=int, default=PLAN_DEFAULT_DAYS)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    tasks, busy, energies = _synthetic(args.tasks, args.busy, args.days)
+    horizon_end = args.days * 1440
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        slots = free_slots(args.days, PLAN_DAY_START_HOUR * 60, PLAN_DAY_END_HOUR * 60, busy)
+        blocks, remaining, _ = pack(tasks, slots, energies, horizon_end)
+        timings.append(1000 * (time.perf_counter() - started))
+
+    timings.sort()
+    scheduled = sum(1 for index, task in enumerate(tasks) if remaining[index] < task.minutes)
+    print(
+        f"{args.tasks} tasks, {args.busy} busy intervals, {args.days} days -> "
+        f"{len(slots)} free slots, {len(blocks)} blocks, {scheduled} task(s) scheduled"
+    )
+    print(f"median {timings[len(timings) // 2]:.2f} ms, max {timings[-1]:.2f} ms over {args.repeat} run(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+
+# ---------------------------------------------------------
+# Prompt-level response cache for Gemini calls
+# ---------------------------------------------------------
+# Keyed on the fully built prompt (system prompt + mood context + user
+# text), normalized for whitespace and case. Entries expire after a TTL
+# and the least recently used are evicted past `max_entries`. Identical
+# prompts already in flight are coalesced: followers wait for the
+# leader's upstream call instead of making their own. Only successful
+# replies are stored — errors propagate and are never cached.
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split()).casefold()
+
+
+class PromptCache:
+    def __init__(self, name: str, enabled: bool = True, max_entries: int = 512, ttl_s: float = 600.0):
+        self.name = name
+        self.enabled = enabled
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._async_inflight: Dict[str, asyncio.Future] = {}
+        self._sync_inflight: Dict[str, Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expired = 0
+
+    # -----------------------------
+    # Storage
+    # -----------------------------
+    def make_key(self, prompt: str) -> str:
+        return hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        return self._lookup(self.make_key(prompt))
+
+    def put(self, prompt: str, text: str) -> None:
+        if self.enabled:
+            self._store(self.make_key(prompt), text)
+
+    def _lookup(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                expires_at, text = item
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return text
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+            return None
+
+    def _store(self, key: str, text: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # -----------------------------
+    # Get-or-generate with coalescing
+    # -----------------------------
+    async def aget_or_generate(self, prompt: str, producer: Callable[[], Awaitable[str]]) -> str:
+        if not self.enabled:
+            return await producer()
+
+        key = self.make_key(prompt)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        leader = self._async_inflight.get(key)
+        if leader is not None:
+            self._count_coalesced()
+            try:
+                return await asyncio.shield(leader)
+            except asyncio.CancelledError:
+                if not leader.cancelled():
+                    raise
+                # The leading request went away — do the call ourselves
+                return await producer()
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_inflight[key] = future
+        try:
+            text = await producer()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # mark retrieved when nobody is waiting
+            raise
+        else:
+            self._store(key, text)
+            future.set_result(text)
+            return text
+        finally:
+            self._async_inflight.pop(key, None)
+
+    def get_or_generate(self, prompt: str, producer: Callable[[], str]) -> str:
+        if not self.enabled:
+            return producer()
+
+        key = self.make_key(prompt)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            leader = self._sync_inflight.get(key)
+            if leader is None:
+                future: Future = Future()
+                self._sync_inflight[key] = future
+            else:
+                self.coalesced += 1
+
+        if leader is not None:
+            return leader.result()
+
+        try:
+            text = producer()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self._store(key, text)
+            future.set_result(text)
+            return text
+        finally:
+            with self._lock:
+                self._sync_inflight.pop(key, None)
+
+    def _count_coalesced(self) -> None:
+        with self._lock:
+            self.coalesced += 1
+
+    # -----------------------------
+    # Metrics
+    # -----------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "coalesced": self.coalesced,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "in_flight": len(self._async_inflight) + len(self._sync_inflight),
+            }
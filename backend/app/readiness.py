@@ -0,0 +1,88 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+
+# ---------------------------------------------------------
+# Subsystem load tracking (used by GET /ready)
+# ---------------------------------------------------------
+# Heavy subsystems (torch model, Gemini SDK, Google client libs) are
+# loaded on first use. Each loader wraps itself in `track_load(name)` so
+# we know what is loaded and how long it took.
+
+_lock = threading.Lock()
+_subsystems: Dict[str, dict] = {}
+_required: List[str] = []
+
+
+def _entry(name: str) -> dict:
+    # Called with _lock held
+    return _subsystems.setdefault(
+        name,
+        {"loaded": False, "loading": False, "load_seconds": None, "error": None},
+    )
+
+
+@contextmanager
+def track_load(name: str):
+    """Times a subsystem load and records success or failure."""
+    with _lock:
+        _entry(name)["loading"] = True
+
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        with _lock:
+            entry = _entry(name)
+            entry.update(loading=False, error=str(e))
+        raise
+
+    elapsed = time.perf_counter() - started
+    with _lock:
+        _entry(name).update(
+            loaded=True, loading=False, error=None, load_seconds=round(elapsed, 4)
+        )
+    print(f"✔ Loaded {name} in {elapsed:.2f}s")
+
+
+def status() -> dict:
+    with _lock:
+        subsystems = {name: dict(entry) for name, entry in _subsystems.items()}
+        required = list(_required)
+
+    ready = all(subsystems.get(name, {}).get("loaded") for name in required)
+    return {"ready": ready, "required": required, "subsystems": subsystems}
+
+
+# ---------------------------------------------------------
+# Background warm-up
+# ---------------------------------------------------------
+def start_background_warmup(
+    loaders: Dict[str, Callable[[], object]]
+) -> Optional[threading.Thread]:
+    """
+    Loads the given subsystems in a daemon thread so the first real
+    request does not pay for them. Until they finish, /ready reports
+    not ready.
+    """
+    if not loaders:
+        return None
+
+    with _lock:
+        for name in loaders:
+            if name not in _required:
+                _required.append(name)
+            _entry(name)
+
+    def run():
+        for name, loader in loaders.items():
+            try:
+                loader()
+            except Exception as e:
+                print(f"Warm-up of {name} failed:", e)
+
+    thread = threading.Thread(target=run, name="warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,35 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .. import analytics
+from ..database import get_async_session
+from ..models import AnalyticsSummary
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+
+@router.get("/summary", response_model=AnalyticsSummary)
+async def get_summary(
+    source: str = Query("mood", pattern="^(mood|journal)$"),
+    granularity: str = Query("day", pattern="^(day|week|month)$"),
+    date_from: Optional[date] = Query(None, description="Defaults to a year before date_to"),
+    date_to: Optional[date] = Query(None, description="Defaults to today"),
+    window: int = Query(analytics.ANALYTICS_DEFAULT_WINDOW, ge=1, le=366, description="Rolling window, in periods"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Counts per mood and emotion label, mean emotion score, rolling
+    averages and logging streaks, read from the daily rollups (see
+    app/analytics.py).
+    """
+    date_from, date_to = analytics.default_range(date_from, date_to)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from is after date_to")
+    if (date_to - date_from).days >= analytics.ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail="Date range too large")
+
+    rows = (await session.exec(analytics.rollup_statement(source, date_from, date_to))).all()
+    return analytics.summarize(rows, source, date_from, date_to, granularity, window)
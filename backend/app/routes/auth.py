@@ -1,24 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from sqlalchemy import delete
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.database import get_session
-from app.models import User, UserCreate, UserRead, LoginRequest, Token
+from app.database import get_async_session
+from app.models import CalendarSyncLease, TaskCalendarLink, User, UserCreate, UserRead, LoginRequest, PasswordChangeRequest, Token
+from app.password_hashing import hash_password, verify_and_update
 from app.security import (
-    get_password_hash,
-    verify_password,
     create_access_token,
     get_current_user,
+    get_current_user_claims,
+    user_cache,
+    user_claims,
 )
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/signup", response_model=UserRead)
-def signup(payload: UserCreate, session: Session = Depends(get_session)):
+async def signup(payload: UserCreate, session: AsyncSession = Depends(get_async_session)):
     # check if email already exists
-    existing = session.exec(
+    existing = (await session.exec(
         select(User).where(User.email == payload.email)
-    ).first()
+    )).first()
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -27,30 +31,78 @@ def signup(payload: UserCreate, session: Session = Depends(get_session)):
 
     user = User(
         email=payload.email,
-        hashed_password=get_password_hash(payload.password),
+        hashed_password=await hash_password(payload.password),
     )
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
     return user
 
 
 @router.post("/login", response_model=Token)
-def login(payload: LoginRequest, session: Session = Depends(get_session)):
-    user = session.exec(
+async def login(payload: LoginRequest, session: AsyncSession = Depends(get_async_session)):
+    user = (await session.exec(
         select(User).where(User.email == payload.email)
-    ).first()
+    )).first()
 
-    if not user or not verify_password(payload.password, user.hashed_password):
+    verified, new_hash = (False, None)
+    if user:
+        verified, new_hash = await verify_and_update(payload.password, user.hashed_password)
+
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
         )
 
-    access_token = create_access_token({"sub": user.id})
+    # Stored hash used older Argon2 parameters: upgrade it now
+    if new_hash:
+        user.hashed_password = new_hash
+        session.add(user)
+        await session.commit()
+
+    access_token = create_access_token(user_claims(user))
     return Token(access_token=access_token)
 
 
 @router.get("/me", response_model=UserRead)
-def read_me(current_user: User = Depends(get_current_user)):
+async def read_me(current_user: UserRead = Depends(get_current_user_claims)):
     return current_user
+
+
+@router.post("/change-password", status_code=status.HTTP_204_NO_CONTENT)
+async def change_password(
+    payload: PasswordChangeRequest,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    user = await session.get(User, current_user.id)
+    verified = user is not None and (await verify_and_update(payload.current_password, user.hashed_password))[0]
+    if not verified:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect password",
+        )
+
+    user.hashed_password = await hash_password(payload.new_password)
+    session.add(user)
+    await session.commit()
+
+    user_cache.invalidate_user(user.id)
+
+
+@router.delete("/me", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_me(
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    user = await session.get(User, current_user.id)
+    if user:
+        # Calendar rows go in the same transaction: SQLite does not enforce
+        # the foreign keys, so a reused user id would inherit them
+        await session.exec(delete(TaskCalendarLink).where(TaskCalendarLink.user_id == user.id))
+        await session.exec(delete(CalendarSyncLease).where(CalendarSyncLease.user_id == user.id))
+        await session.delete(user)
+        await session.commit()
+
+    user_cache.invalidate_user(current_user.id)
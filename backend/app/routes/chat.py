@@ -1,12 +1,19 @@
-from typing import Optional
+import json
+from typing import AsyncIterator, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..database import get_session
-from ..models import Mood
-from ..chat_ai import generate_study_wellness_reply, build_mood_context_text
+from ..database import get_async_session
+from ..mood_summary import get_latest_mood_context
+from ..chat_ai import (
+    CHAT_FALLBACK_ERROR,
+    StreamInterruptedError,
+    agenerate_study_wellness_reply,
+    astream_study_wellness_reply,
+)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -25,33 +32,21 @@ class ChatResponse(BaseModel):
 # -------- CHAT ROUTE -------- #
 
 @router.post("/", response_model=ChatResponse)
-def chat_with_ai(
+async def chat_with_ai(
     payload: ChatRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """
     GPT/Gemini-powered chat with mood awareness.
     Always returns a valid ChatResponse.
+    The Gemini call is awaited, so no threadpool thread is held while
+    the model generates.
     """
-
-    # Get most recent mood entry
-    latest_mood: Optional[Mood] = session.exec(
-        select(Mood).order_by(Mood.date.desc(), Mood.created_at.desc())
-    ).first()
-
-    # Build mood context if available
-    mood_context = None
-    if latest_mood:
-        mood_context = build_mood_context_text(
-            mood_label=latest_mood.mood,
-            mood_note=latest_mood.note,
-            emotion_label=latest_mood.emotion_label,
-            emotion_score=latest_mood.emotion_score,
-        )
+    mood_context = await get_latest_mood_context(session)
 
     # Always generate a reply — even if no mood exists
     try:
-        reply_text = generate_study_wellness_reply(
+        reply_text = await agenerate_study_wellness_reply(
             user_message=payload.message,
             mood_context=mood_context,
         )
@@ -63,3 +58,46 @@ def chat_with_ai(
         reply=reply_text,
         mood_context=mood_context,
     )
+
+
+# -------- STREAMING CHAT (Server-Sent Events) -------- #
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def chat_with_ai_stream(
+    payload: ChatRequest,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Same as POST /chat/, but streams the reply as Server-Sent Events:
+
+    - `context`: {"mood_context": ...} — sent first
+    - `delta`:   {"text": ...} — one per chunk from Gemini
+    - `done`:    {"reply": ..., "mood_context": ...} — the full reply
+    - `error`:   {"detail": ..., "partial": ...} — instead of `done` when
+                 Gemini fails after some deltas were sent
+    """
+    mood_context = await get_latest_mood_context(session)
+
+    async def events() -> AsyncIterator[str]:
+        yield _sse("context", {"mood_context": mood_context})
+
+        parts = []
+        try:
+            async for text in astream_study_wellness_reply(payload.message, mood_context):
+                parts.append(text)
+                yield _sse("delta", {"text": text})
+        except StreamInterruptedError:
+            yield _sse("error", {"detail": CHAT_FALLBACK_ERROR, "partial": "".join(parts).strip()})
+            return
+
+        yield _sse("done", {"reply": "".join(parts).strip(), "mood_context": mood_context})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
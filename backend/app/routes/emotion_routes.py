@@ -1,9 +1,22 @@
-from fastapi import APIRouter
-from ..emotion import analyze_emotion_text
-from ..models import EmotionRequest, EmotionResponse
+import json
+from tempfile import SpooledTemporaryFile
+from typing import IO, Iterator, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+
+from ..emotion import analyze_emotion_text, analyze_emotion_batch, EMOTION_BULK_CHUNK_SIZE
+from ..models import EmotionRequest, EmotionResponse, EmotionBatchRequest
 
 router = APIRouter(prefix="/emotion", tags=["emotion"])
 
+# Uploads larger than this are spooled to a temp file instead of memory
+NDJSON_SPOOL_MAX_BYTES = 1024 * 1024
+
+# (client id, text, parse error) for one input record
+Record = Tuple[object, Optional[str], Optional[str]]
+
 
 @router.post("/", response_model=EmotionResponse)
 def analyze_emotion(payload: EmotionRequest):
@@ -16,3 +29,95 @@ def analyze_emotion(payload: EmotionRequest):
         label=result["label"],
         score=result["score"]
     )
+
+
+# ---------------------------------------------------------
+# BATCH ANALYSIS (streams NDJSON results)
+# ---------------------------------------------------------
+@router.post("/batch")
+async def analyze_emotion_batch_route(request: Request):
+    """
+    Score many texts in one request.
+
+    Body is either JSON `{"texts": ["...", ...]}` or, with
+    `Content-Type: application/x-ndjson`, one record per line — a JSON
+    string or an object with a `text` field (and optional `id`, echoed
+    back). Results stream back as NDJSON in input order, one chunk of
+    model-sized batches at a time.
+    """
+    content_type = request.headers.get("content-type", "")
+
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        spool = SpooledTemporaryFile(max_size=NDJSON_SPOOL_MAX_BYTES, mode="w+b")
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        records = _read_ndjson_records(spool)
+    else:
+        try:
+            payload = EmotionBatchRequest.model_validate(await request.json())
+        except (ValueError, ValidationError) as e:
+            raise HTTPException(status_code=422, detail=f"Invalid batch payload: {e}")
+        records = ((None, text, None) for text in payload.texts)
+
+    return StreamingResponse(
+        _stream_results(records), media_type="application/x-ndjson"
+    )
+
+
+def _read_ndjson_records(spool: IO[bytes]) -> Iterator[Record]:
+    """Yields (id, text, error) per non-empty line, then closes the spool."""
+    try:
+        for raw in spool:
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield None, None, "invalid JSON line"
+                continue
+
+            if isinstance(record, str):
+                yield None, record, None
+            elif isinstance(record, dict) and isinstance(record.get("text"), str):
+                yield record.get("id"), record["text"], None
+            else:
+                yield None, None, "expected a string or an object with a 'text' field"
+    finally:
+        spool.close()
+
+
+def _stream_results(records: Iterator[Record]) -> Iterator[bytes]:
+    # Sync generator: Starlette iterates it in the threadpool, so the
+    # forward passes never block the event loop.
+    index = 0
+    chunk: List[Tuple[int, object, Optional[str], Optional[str]]] = []
+
+    for record_id, text, error in records:
+        chunk.append((index, record_id, text, error))
+        index += 1
+        if len(chunk) >= EMOTION_BULK_CHUNK_SIZE:
+            yield _score_chunk(chunk)
+            chunk = []
+
+    if chunk:
+        yield _score_chunk(chunk)
+
+
+def _score_chunk(chunk: List[Tuple[int, object, Optional[str], Optional[str]]]) -> bytes:
+    valid = [item for item in chunk if item[3] is None]
+    scored = iter(analyze_emotion_batch([text for _, _, text, _ in valid]))
+
+    lines = []
+    for index, record_id, _, error in chunk:
+        line = {"index": index}
+        if record_id is not None:
+            line["id"] = record_id
+        if error is None:
+            line.update(next(scored))
+        else:
+            line["error"] = error
+        lines.append(json.dumps(line))
+
+    return ("\n".join(lines) + "\n").encode("utf-8")
@@ -1,4 +1,7 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from .. import metrics, readiness
 
 router = APIRouter(tags=["health"])
 
@@ -6,3 +9,19 @@ router = APIRouter(tags=["health"])
 @router.get("/health")
 def health_check():
     return {"status": "ok"}
+
+
+@router.get("/ready")
+def readiness_check():
+    """
+    Reports which heavy subsystems are loaded and how long each took.
+    Returns 503 until everything queued for warm-up has loaded.
+    """
+    result = readiness.status()
+    return JSONResponse(result, status_code=200 if result["ready"] else 503)
+
+
+@router.get("/metrics")
+def get_metrics():
+    """In-process counters for batching, caches and other subsystems."""
+    return metrics.snapshot()
@@ -1,14 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from datetime import date
+from typing import Optional
 
-from app.database import get_session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import get_async_session
 from app.models import (
     JournalEntry,
     JournalCreate,
     JournalRead,
+    JournalEnrichmentJob,
+    JournalEmbedding,
+    JournalEnrichmentRead,
+    JournalSearchHit,
+    JournalSimilarHit,
 )
-from app.emotion import analyze_emotion_text
-from app.chat_ai import generate_reflection_text
+from app import analytics, emotion, journal_embeddings, journal_enrichment, journal_search
+from app.chat_ai import agenerate_reflection_text
+from app.pagination import PageParams, count_statement, finish_page, page_statement, set_page_headers
 
 
 router = APIRouter(prefix="/journal", tags=["journal"])
@@ -17,45 +28,262 @@ router = APIRouter(prefix="/journal", tags=["journal"])
 # ---------------------------------------------------------
 # GET ALL JOURNAL ENTRIES
 # ---------------------------------------------------------
+JOURNAL_ORDER = (JournalEntry.created_at, JournalEntry.id)
+
+
 @router.get("/", response_model=list[JournalRead])
-def get_all_entries(session: Session = Depends(get_session)):
-    entries = session.exec(
-        select(JournalEntry).order_by(JournalEntry.created_at.desc())
-    ).all()
-    return entries
+async def get_all_entries(
+    response: Response,
+    page: PageParams = Depends(),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    emotion_label: Optional[str] = Query(None),
+    is_favorite: Optional[bool] = Query(None),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Newest first, keyset-paginated (see app/pagination.py)."""
+    statement = select(JournalEntry)
+    if date_from:
+        statement = statement.where(JournalEntry.date >= date_from)
+    if date_to:
+        statement = statement.where(JournalEntry.date <= date_to)
+    if emotion_label:
+        statement = statement.where(JournalEntry.emotion_label == emotion_label)
+    if is_favorite is not None:
+        statement = statement.where(JournalEntry.is_favorite == is_favorite)
+
+    total = (await session.exec(count_statement(statement))).one() if page.include_total else None
+
+    rows = (await session.exec(page_statement(statement, JOURNAL_ORDER, page))).all()
+    entries, next_cursor = finish_page(rows, JOURNAL_ORDER, page)
+    set_page_headers(response, next_cursor, total)
+
+    # Attach enrichment status for entries whose job has not finished
+    unfinished = {}
+    if entries:
+        unfinished = dict((await session.exec(
+            select(JournalEnrichmentJob.entry_id, JournalEnrichmentJob.status)
+            .where(JournalEnrichmentJob.entry_id.in_([entry.id for entry in entries]))
+            .where(JournalEnrichmentJob.status != "done")
+        )).all())
+
+    return [
+        JournalRead.model_validate(
+            entry, update={"enrichment_status": unfinished.get(entry.id, "done")}
+        )
+        for entry in entries
+    ]
 
 
 # ---------------------------------------------------------
-# CREATE NEW JOURNAL ENTRY
+# FULL-TEXT SEARCH (declared before /{entry_id})
 # ---------------------------------------------------------
-@router.post("/", response_model=JournalRead)
-def create_entry(payload: JournalCreate, session: Session = Depends(get_session)):
+@router.get("/search", response_model=list[JournalSearchHit])
+async def search_entries(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    page: PageParams = Depends(),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    emotion_label: Optional[str] = Query(None),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Searches entry text and AI reflections. Best matches first, with a
+    marked-up snippet; paged like the list (X-Next-Cursor). See
+    app/journal_search.py.
+    """
+    terms = journal_search.search_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query has no words")
+
+    if await journal_search.fts_available(session):
+        search = journal_search.search_fts
+    else:
+        search = journal_search.search_like
+    hits, next_cursor, total = await search(session, terms, page, date_from, date_to, emotion_label)
+
+    set_page_headers(response, next_cursor, total)
+    return hits
+
+
+# ---------------------------------------------------------
+# SIMILAR ENTRIES (embeddings; see app/journal_embeddings.py)
+# ---------------------------------------------------------
+PREVIEW_CHARS = 160
+
 
-    # Run ML emotion model
-    emotion = None
-    if payload.content:
-        emotion = analyze_emotion_text(payload.content)
+def _require_embeddings() -> None:
+    if not journal_embeddings.JOURNAL_EMBEDDINGS_ENABLED:
+        raise HTTPException(status_code=503, detail="Similarity search is disabled")
 
-    emotion_label = emotion["label"] if emotion else None
-    emotion_score = emotion["score"] if emotion else None
 
-    # Generate AI reflection (Gemini)
-    reflection = generate_reflection_text(payload.content, emotion_label)
+async def _similar_hits(session: AsyncSession, ranked: list) -> list[JournalSimilarHit]:
+    if not ranked:
+        return []
 
+    entries = {
+        entry.id: entry
+        for entry in (await session.exec(
+            select(JournalEntry).where(JournalEntry.id.in_([entry_id for entry_id, _ in ranked]))
+        )).all()
+    }
+    # Entries deleted since the index last synced are skipped
+    return [
+        JournalSimilarHit(
+            id=entry_id,
+            date=entries[entry_id].date,
+            created_at=entries[entry_id].created_at,
+            emotion_label=entries[entry_id].emotion_label,
+            similarity=similarity,
+            preview=entries[entry_id].content[:PREVIEW_CHARS],
+        )
+        for entry_id, similarity in ranked
+        if entry_id in entries
+    ]
+
+
+@router.get("/similar", response_model=list[JournalSimilarHit])
+async def similar_to_text(
+    q: str = Query(..., min_length=1, max_length=2000),
+    k: int = Query(5, ge=1, le=journal_embeddings.JOURNAL_SIMILAR_MAX_K),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Entries closest in meaning to free text (cosine similarity)."""
+    _require_embeddings()
+    try:
+        vector = (await run_in_threadpool(emotion.embed_texts, [q]))[0]
+    except Exception as e:
+        print("Emotion model error (embedding):", e)
+        raise HTTPException(status_code=503, detail="Embedding model unavailable")
+
+    ranked = await run_in_threadpool(journal_embeddings.index.search, vector, k)
+    return await _similar_hits(session, ranked)
+
+
+# ---------------------------------------------------------
+# CREATE NEW JOURNAL ENTRY
+# ---------------------------------------------------------
+@router.post("/", response_model=JournalRead)
+async def create_entry(payload: JournalCreate, session: AsyncSession = Depends(get_async_session)):
+    """
+    Saves the entry immediately. Emotion labelling and the Gemini
+    reflection run in the background (see app/journal_enrichment.py);
+    poll GET /journal/{id}/enrichment for the result.
+    """
     entry = JournalEntry(
         date=payload.date,
         content=payload.content,
         mood_id=payload.mood_id,
-        emotion_label=emotion_label,
-        emotion_score=emotion_score,
-        ai_reflection=reflection,
         is_favorite=False
     )
 
     session.add(entry)
-    session.commit()
-    session.refresh(entry)
+    await session.flush()
+    session.add(JournalEnrichmentJob(entry_id=entry.id))
+    await session.commit()
+    await session.refresh(entry)
+
+    journal_enrichment.enqueue(entry.id)
+
+    return JournalRead.model_validate(entry, update={"enrichment_status": "pending"})
+
 
+# ---------------------------------------------------------
+# GET ONE ENTRY
+# ---------------------------------------------------------
+@router.get("/{entry_id}", response_model=JournalRead)
+async def get_entry(entry_id: int, session: AsyncSession = Depends(get_async_session)):
+
+    entry = await session.get(JournalEntry, entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Entry not found")
+
+    status = await journal_enrichment.get_status(session, entry_id) or "done"
+    return JournalRead.model_validate(entry, update={"enrichment_status": status})
+
+
+# ---------------------------------------------------------
+# ENRICHMENT STATUS (poll, or long-poll with ?wait=)
+# ---------------------------------------------------------
+@router.get("/{entry_id}/enrichment", response_model=JournalEnrichmentRead)
+async def get_enrichment(
+    entry_id: int,
+    wait: float = Query(0, ge=0, le=30, description="Seconds to wait for completion"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Returns the enrichment state of an entry. With `wait`, the request
+    is held open until the job finishes (or the wait expires).
+    """
+    result = await _read_enrichment(session, entry_id)
+
+    if wait and result.status in ("pending", "running"):
+        await journal_enrichment.wait_for_completion(entry_id, wait)
+        # The job committed from another session; drop our cached copies
+        session.expire_all()
+        result = await _read_enrichment(session, entry_id)
+
+    return result
+
+
+async def _read_enrichment(session: AsyncSession, entry_id: int) -> JournalEnrichmentRead:
+    entry = await _get_entry_or_404(session, entry_id)
+
+    job = await session.get(JournalEnrichmentJob, entry_id)
+    return JournalEnrichmentRead(
+        entry_id=entry_id,
+        status=job.status if job else "done",
+        attempts=job.attempts if job else 0,
+        last_error=job.last_error if job else None,
+        emotion_label=entry.emotion_label,
+        emotion_score=entry.emotion_score,
+        ai_reflection=entry.ai_reflection,
+    )
+
+
+@router.get("/{entry_id}/similar", response_model=list[JournalSimilarHit])
+async def similar_to_entry(
+    entry_id: int,
+    k: int = Query(5, ge=1, le=journal_embeddings.JOURNAL_SIMILAR_MAX_K),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Entries closest in meaning to this one (itself excluded)."""
+    _require_embeddings()
+    await _get_entry_or_404(session, entry_id)
+
+    vector = await run_in_threadpool(journal_embeddings.index.vector_for, entry_id)
+    if vector is None:
+        raise HTTPException(status_code=409, detail="Entry has no embedding yet (enrichment pending)")
+
+    ranked = await run_in_threadpool(journal_embeddings.index.search, vector, k, entry_id)
+    return await _similar_hits(session, ranked)
+
+
+# ---------------------------------------------------------
+# REGENERATE REFLECTION (on demand)
+# ---------------------------------------------------------
+@router.post("/{entry_id}/reflect")
+async def reflect_on_entry(entry_id: int, session: AsyncSession = Depends(get_async_session)):
+    """
+    Generates a fresh AI reflection for an entry and stores it.
+    Async: the Gemini round trip does not hold a threadpool thread.
+    """
+    entry = await _get_entry_or_404(session, entry_id)
+
+    # fresh: the enrichment job already produced (and cached) one for this text
+    reflection = await agenerate_reflection_text(entry.content, entry.emotion_label, fresh=True)
+
+    entry.ai_reflection = reflection
+    session.add(entry)
+    await session.commit()
+    return {"reflection": reflection}
+
+
+async def _get_entry_or_404(session: AsyncSession, entry_id: int) -> JournalEntry:
+    entry = await session.get(JournalEntry, entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Entry not found")
     return entry
 
 
@@ -63,16 +291,14 @@ def create_entry(payload: JournalCreate, session: Session = Depends(get_session)
 # TOGGLE FAVORITE
 # ---------------------------------------------------------
 @router.patch("/{entry_id}/favorite", response_model=JournalRead)
-def toggle_favorite(entry_id: int, session: Session = Depends(get_session)):
+async def toggle_favorite(entry_id: int, session: AsyncSession = Depends(get_async_session)):
 
-    entry = session.get(JournalEntry, entry_id)
-    if not entry:
-        raise HTTPException(status_code=404, detail="Entry not found")
+    entry = await _get_entry_or_404(session, entry_id)
 
     entry.is_favorite = not entry.is_favorite
     session.add(entry)
-    session.commit()
-    session.refresh(entry)
+    await session.commit()
+    await session.refresh(entry)
 
     return entry
 
@@ -81,13 +307,17 @@ def toggle_favorite(entry_id: int, session: Session = Depends(get_session)):
 # DELETE ENTRY
 # ---------------------------------------------------------
 @router.delete("/{entry_id}")
-def delete_entry(entry_id: int, session: Session = Depends(get_session)):
+async def delete_entry(entry_id: int, session: AsyncSession = Depends(get_async_session)):
 
-    entry = session.get(JournalEntry, entry_id)
-    if not entry:
-        raise HTTPException(status_code=404, detail="Entry not found")
+    entry = await _get_entry_or_404(session, entry_id)
 
-    session.delete(entry)
-    session.commit()
+    for dependent in (JournalEnrichmentJob, JournalEmbedding):
+        row = await session.get(dependent, entry_id)
+        if row:
+            await session.delete(row)
+    await session.delete(entry)
+    await analytics.arecord(session, [analytics.journal_delta(entry, -1)])
+    await session.commit()
+    journal_embeddings.index.remove([entry_id])
 
     return {"status": "deleted"}
@@ -1,44 +1,81 @@
-from typing import List
+from datetime import date
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..database import get_session
+from .. import analytics, mood_summary
+from ..database import get_async_session
 from ..models import Mood, MoodCreate, MoodRead
+from ..pagination import PageParams, count_statement, finish_page, page_statement, set_page_headers
 
 router = APIRouter(prefix="/mood", tags=["mood"])
 
 
+MOOD_ORDER = (Mood.date, Mood.id)
+
+
 @router.get("/", response_model=List[MoodRead])
-def list_moods(session: Session = Depends(get_session)):
-    moods = session.exec(select(Mood).order_by(Mood.date.desc())).all()
+async def list_moods(
+    response: Response,
+    page: PageParams = Depends(),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    mood: Optional[str] = Query(None),
+    emotion_label: Optional[str] = Query(None),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Newest first, keyset-paginated (see app/pagination.py)."""
+    statement = select(Mood)
+    if date_from:
+        statement = statement.where(Mood.date >= date_from)
+    if date_to:
+        statement = statement.where(Mood.date <= date_to)
+    if mood:
+        statement = statement.where(Mood.mood == mood)
+    if emotion_label:
+        statement = statement.where(Mood.emotion_label == emotion_label)
+
+    total = (await session.exec(count_statement(statement))).one() if page.include_total else None
+
+    rows = (await session.exec(page_statement(statement, MOOD_ORDER, page))).all()
+    moods, next_cursor = finish_page(rows, MOOD_ORDER, page)
+
+    set_page_headers(response, next_cursor, total)
     return moods
 
 
 @router.post(
     "/", response_model=MoodRead, status_code=status.HTTP_201_CREATED
 )
-def create_mood(payload: MoodCreate, session: Session = Depends(get_session)):
+async def create_mood(payload: MoodCreate, session: AsyncSession = Depends(get_async_session)):
     mood = Mood.from_orm(payload)
     session.add(mood)
-    session.commit()
-    session.refresh(mood)
+    await analytics.arecord(session, [analytics.mood_delta(mood, +1)])
+    await session.commit()
+    await session.refresh(mood)
+
+    await mood_summary.arebuild(session)
     return mood
 
 
 @router.get("/{mood_id}", response_model=MoodRead)
-def get_mood(mood_id: int, session: Session = Depends(get_session)):
-    mood = session.get(Mood, mood_id)
+async def get_mood(mood_id: int, session: AsyncSession = Depends(get_async_session)):
+    mood = await session.get(Mood, mood_id)
     if not mood:
         raise HTTPException(status_code=404, detail="Mood not found")
     return mood
 
 
 @router.delete("/{mood_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_mood(mood_id: int, session: Session = Depends(get_session)):
-    mood = session.get(Mood, mood_id)
+async def delete_mood(mood_id: int, session: AsyncSession = Depends(get_async_session)):
+    mood = await session.get(Mood, mood_id)
     if not mood:
         raise HTTPException(status_code=404, detail="Mood not found")
-    session.delete(mood)
-    session.commit()
+    await session.delete(mood)
+    await analytics.arecord(session, [analytics.mood_delta(mood, -1)])
+    await session.commit()
+
+    await mood_summary.arebuild(session)
     return {"ok": True}
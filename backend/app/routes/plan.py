@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .. import calendar_sync, google_calendar, mood_summary, planner
+from ..database import get_async_session
+from ..models import PlanRequest, PlanResult, Task, User
+from ..security import get_current_user
+
+router = APIRouter(prefix="/plan", tags=["plan"])
+
+
+@router.post("/", response_model=PlanResult)
+async def create_plan(
+    payload: Optional[PlanRequest] = None,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Packs open tasks into free study time over the next days, using the
+    latest mood and Google Calendar free/busy (see app/planner.py).
+    Nothing is stored; the plan is recomputed on every call.
+    """
+    params = payload or PlanRequest()
+    # Task due times and busy intervals are naive CALENDAR_TIMEZONE times
+    zone = ZoneInfo(calendar_sync.CALENDAR_TIMEZONE)
+    start = params.start or datetime.now(zone)
+    if start.tzinfo is not None:
+        start = start.astimezone(zone).replace(tzinfo=None)
+    start = start.replace(second=0, microsecond=0)
+    day_start = planner.PLAN_DAY_START_HOUR if params.day_start_hour is None else params.day_start_hour
+    day_end = planner.PLAN_DAY_END_HOUR if params.day_end_hour is None else params.day_end_hour
+
+    if day_start >= day_end:
+        raise HTTPException(status_code=400, detail="day_start_hour must be before day_end_hour")
+    if params.days > planner.PLAN_MAX_DAYS:
+        raise HTTPException(status_code=400, detail="Plan window too long")
+    bad_energy = [name for name in params.energy.values() if name not in planner.ENERGY_NAMES]
+    if bad_energy:
+        raise HTTPException(status_code=400, detail=f"Unknown energy level: {bad_energy[0]}")
+
+    statement = select(Task).where(Task.is_completed == False)  # noqa: E712
+    if params.task_ids is not None:
+        statement = statement.where(Task.id.in_(params.task_ids))
+    tasks = (await session.exec(statement.order_by(Task.id).limit(planner.PLAN_MAX_TASKS))).all()
+
+    mood = await mood_summary.get_latest_mood(session)
+
+    # Whole days, so the free/busy cache key stays the same all day
+    window_start = datetime.combine(start.date(), datetime.min.time())
+    window_end = window_start + timedelta(days=params.days)
+    busy = None
+    calendar_error = None
+    if params.use_calendar:
+        try:
+            busy = await run_in_threadpool(google_calendar.busy_intervals, current_user.id, window_start, window_end)
+        except Exception as e:
+            # Plan without calendar data rather than failing the request
+            print("✘ Calendar free/busy failed, planning without it:", repr(e))
+            calendar_error = "Google Calendar free/busy unavailable; busy times not considered"
+
+    plan = planner.build_plan(
+        tasks,
+        start,
+        params.days,
+        busy or [],
+        mood=mood,
+        estimates=params.estimates,
+        energy_overrides=params.energy,
+        day_start_hour=day_start,
+        day_end_hour=day_end,
+    )
+    plan["calendar_connected"] = busy is not None
+    plan["calendar_error"] = calendar_error
+    return plan
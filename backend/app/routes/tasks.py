@@ -1,10 +1,13 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..database import get_session
+from ..database import get_async_session
 from ..models import Task, TaskCreate, TaskRead, TaskUpdate
+from ..pagination import PageParams, count_statement, finish_page, page_statement, set_page_headers
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
@@ -12,11 +15,36 @@ router = APIRouter(prefix="/tasks", tags=["tasks"])
 # ======================================================
 # GET ALL TASKS
 # ======================================================
+TASK_ORDER = (Task.created_at, Task.id)
+
+
 @router.get("/", response_model=List[TaskRead])
-def list_tasks(session: Session = Depends(get_session)):
-    tasks = session.exec(
-        select(Task).order_by(Task.created_at.desc())
-    ).all()
+async def list_tasks(
+    response: Response,
+    page: PageParams = Depends(),
+    is_completed: Optional[bool] = Query(None),
+    mood_tag: Optional[str] = Query(None),
+    due_from: Optional[datetime] = Query(None),
+    due_to: Optional[datetime] = Query(None),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Newest first, keyset-paginated (see app/pagination.py)."""
+    statement = select(Task)
+    if is_completed is not None:
+        statement = statement.where(Task.is_completed == is_completed)
+    if mood_tag:
+        statement = statement.where(Task.mood_tag == mood_tag)
+    if due_from:
+        statement = statement.where(Task.due_datetime >= due_from)
+    if due_to:
+        statement = statement.where(Task.due_datetime <= due_to)
+
+    total = (await session.exec(count_statement(statement))).one() if page.include_total else None
+
+    rows = (await session.exec(page_statement(statement, TASK_ORDER, page))).all()
+    tasks, next_cursor = finish_page(rows, TASK_ORDER, page)
+
+    set_page_headers(response, next_cursor, total)
     return tasks
 
 
@@ -24,12 +52,12 @@ def list_tasks(session: Session = Depends(get_session)):
 # CREATE TASK
 # ======================================================
 @router.post("/", response_model=TaskRead, status_code=status.HTTP_201_CREATED)
-def create_task(payload: TaskCreate, session: Session = Depends(get_session)):
+async def create_task(payload: TaskCreate, session: AsyncSession = Depends(get_async_session)):
 
     task = Task.from_orm(payload)
     session.add(task)
-    session.commit()
-    session.refresh(task)
+    await session.commit()
+    await session.refresh(task)
     return task
 
 
@@ -37,12 +65,12 @@ def create_task(payload: TaskCreate, session: Session = Depends(get_session)):
 # UPDATE TASK
 # ======================================================
 @router.patch("/{task_id}", response_model=TaskRead)
-def update_task(
+async def update_task(
     task_id: int,
     payload: TaskUpdate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
-    task = session.get(Task, task_id)
+    task = await session.get(Task, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
@@ -50,10 +78,12 @@ def update_task(
     update_fields = payload.dict(exclude_unset=True)
     for key, value in update_fields.items():
         setattr(task, key, value)
+    # Calendar sync re-sends only tasks changed since their last sync
+    task.updated_at = datetime.utcnow()
 
     session.add(task)
-    session.commit()
-    session.refresh(task)
+    await session.commit()
+    await session.refresh(task)
     return task
 
 
@@ -61,11 +91,11 @@ def update_task(
 # DELETE TASK
 # ======================================================
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_task(task_id: int, session: Session = Depends(get_session)):
-    task = session.get(Task, task_id)
+async def delete_task(task_id: int, session: AsyncSession = Depends(get_async_session)):
+    task = await session.get(Task, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    session.delete(task)
-    session.commit()
+    await session.delete(task)
+    await session.commit()
     return {"ok": True}
@@ -1,29 +1,224 @@
+import os
+import socket
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional
+
 from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import date
+from sqlalchemy import delete, insert, or_, update
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
+
+from . import analytics, calendar_tokens, journal_enrichment, metrics, mood_summary
 from .database import engine
-from .models import Mood
+from .models import JournalEntry, Mood, MoodArchive, SchedulerJobRun
+
+# ---------------------------------------------------------
+# Scheduled maintenance jobs
+# ---------------------------------------------------------
+# Every uvicorn/gunicorn worker starts this scheduler, so each job first
+# takes a lease row in `schedulerjobrun`; only the worker that wins it
+# runs that firing. Leases are not released on completion — they expire
+# after SCHEDULER_LEASE_S, which also stops the other workers' copies of
+# the same cron firing from running it again.
+#
+# Deletes are set-based (DELETE ... WHERE id IN (...)) in chunks of
+# SCHEDULER_DELETE_CHUNK rows, one transaction each, so the SQLite write
+# lock is only held briefly. With SCHEDULER_ARCHIVE_MOODS=1 deleted
+# moods are copied to `moodarchive` first and keep their counts in the
+# analytics rollups (rebuilds read the archive too, see app/analytics.py).
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") != "0"
+SCHEDULER_LEASE_S = float(os.getenv("SCHEDULER_LEASE_S", "600"))
+SCHEDULER_DELETE_CHUNK = int(os.getenv("SCHEDULER_DELETE_CHUNK", "500"))
+SCHEDULER_ARCHIVE_MOODS = os.getenv("SCHEDULER_ARCHIVE_MOODS", "0") == "1"
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
 
 scheduler = BackgroundScheduler()
 
+
+# -----------------------------
+# Lease + run bookkeeping
+# -----------------------------
+def _acquire_lease(name: str, lease_s: float) -> bool:
+    now = datetime.utcnow()
+
+    with Session(engine) as session:
+        if session.get(SchedulerJobRun, name) is None:
+            session.add(SchedulerJobRun(name=name))
+            try:
+                session.commit()
+            except IntegrityError:
+                # Another worker created it first
+                session.rollback()
+
+        result = session.execute(
+            update(SchedulerJobRun)
+            .where(SchedulerJobRun.name == name)
+            .where(or_(
+                SchedulerJobRun.lease_expires_at.is_(None),
+                SchedulerJobRun.lease_expires_at < now,
+            ))
+            .values(
+                lease_owner=WORKER_ID,
+                lease_expires_at=now + timedelta(seconds=lease_s),
+                last_started_at=now,
+            )
+        )
+        session.commit()
+        return result.rowcount == 1
+
+
+def _record_run(name: str, started: float, rows: Optional[int], error: Optional[str]) -> None:
+    now = datetime.utcnow()
+
+    with Session(engine) as session:
+        run = session.get(SchedulerJobRun, name)
+        run.last_finished_at = now
+        run.last_duration_ms = round(1000 * (time.perf_counter() - started), 2)
+        run.runs += 1
+        if error is None:
+            run.last_success_at = now
+            run.last_rows = rows
+            run.last_error = None
+        else:
+            run.failures += 1
+            run.last_error = error[:500]
+        session.add(run)
+        session.commit()
+
+
+def run_job(name: str, job: Callable[[], int], lease_s: float = SCHEDULER_LEASE_S) -> Optional[int]:
+    """
+    Runs `job` if this worker wins the lease and records the outcome.
+    Returns the rows affected, or None if skipped / failed. Interval
+    jobs pass a lease shorter than their interval.
+    """
+    if not _acquire_lease(name, lease_s):
+        return None
+
+    started = time.perf_counter()
+    try:
+        rows = job()
+    except Exception as e:
+        print(f"✘ Scheduled job {name} failed:", e)
+        _record_run(name, started, None, str(e))
+        return None
+
+    _record_run(name, started, rows, None)
+    return rows
+
+
+# -----------------------------
+# Jobs
+# -----------------------------
+def _delete_moods_for(day: date) -> int:
+    deleted = 0
+
+    while True:
+        with Session(engine) as session:
+            ids = session.exec(
+                select(Mood.id).where(Mood.date == day).order_by(Mood.id).limit(SCHEDULER_DELETE_CHUNK)
+            ).all()
+            if not ids:
+                break
+
+            if SCHEDULER_ARCHIVE_MOODS:
+                session.execute(
+                    insert(MoodArchive).from_select(
+                        ["mood_id", "date", "mood", "note", "emotion_label", "emotion_score", "created_at"],
+                        select(
+                            Mood.id, Mood.date, Mood.mood, Mood.note,
+                            Mood.emotion_label, Mood.emotion_score, Mood.created_at,
+                        ).where(Mood.id.in_(ids)),
+                    )
+                )
+            else:
+                analytics.record(session, analytics.grouped_mood_deltas(session, ids, sign=-1))
+
+            # Same effect as the ORM delete: journal entries lose the link
+            session.execute(update(JournalEntry).where(JournalEntry.mood_id.in_(ids)).values(mood_id=None))
+            session.execute(delete(Mood).where(Mood.id.in_(ids)))
+            session.commit()
+
+        deleted += len(ids)
+        if len(ids) < SCHEDULER_DELETE_CHUNK:
+            break
+
+    if deleted:
+        # Keep the chat's latest-mood summary in step with the deletes
+        with Session(engine) as session:
+            mood_summary.rebuild(session)
+
+    return deleted
+
+
 def reset_daily_mood():
     """Runs every midnight to remove today's mood entry."""
     today = date.today()
 
+    deleted = run_job("reset_daily_mood", lambda: _delete_moods_for(today))
+    if deleted is not None:
+        print(f"✔ Daily mood reset completed: {today} ({deleted} row(s))")
+
+
+def refresh_calendar_tokens():
+    """Refreshes Google Calendar tokens that expire soon."""
+    refreshed = run_job(
+        "refresh_calendar_tokens",
+        calendar_tokens.refresh_expiring_tokens,
+        lease_s=calendar_tokens.CALENDAR_REFRESH_INTERVAL_S / 2,
+    )
+    if refreshed:
+        print(f"✔ Refreshed {refreshed} Google Calendar token(s)")
+
+
+def sweep_journal_enrichment():
+    """Re-queues journal enrichment jobs left running by a dead process."""
+    requeued = run_job(
+        "sweep_journal_enrichment",
+        journal_enrichment.sweep_stale_jobs,
+        lease_s=journal_enrichment.ENRICHMENT_SWEEP_INTERVAL_S / 2,
+    )
+    if requeued:
+        print(f"✔ Re-queued {requeued} stale journal enrichment job(s)")
+
+
+def stats() -> dict:
     with Session(engine) as session:
-        existing = session.exec(
-            select(Mood).where(Mood.date == today)
-        ).all()
+        runs = session.exec(select(SchedulerJobRun)).all()
+
+    return {
+        "enabled": SCHEDULER_ENABLED,
+        "worker": WORKER_ID,
+        "jobs": {
+            run.name: {
+                "lease_owner": run.lease_owner,
+                "last_success_at": run.last_success_at,
+                "last_duration_ms": run.last_duration_ms,
+                "last_rows": run.last_rows,
+                "last_error": run.last_error,
+                "runs": run.runs,
+                "failures": run.failures,
+            }
+            for run in runs
+        },
+    }
 
-        if existing:
-            for mood in existing:
-                session.delete(mood)
-            session.commit()
 
-    print("✔ Daily mood reset completed:", today)
+metrics.register("scheduler", stats)
 
 
 def start_scheduler():
     """Start the background scheduler."""
+    if not SCHEDULER_ENABLED:
+        return
     scheduler.add_job(reset_daily_mood, "cron", hour=0, minute=0)
+    scheduler.add_job(
+        refresh_calendar_tokens, "interval", seconds=calendar_tokens.CALENDAR_REFRESH_INTERVAL_S
+    )
+    scheduler.add_job(
+        sweep_journal_enrichment, "interval", seconds=journal_enrichment.ENRICHMENT_SWEEP_INTERVAL_S
+    )
     scheduler.start()
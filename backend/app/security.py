@@ -1,15 +1,20 @@
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Set, Tuple
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from .database import get_session
-from .models import User
+from . import metrics
+from .database import get_async_session
+from .password_hashing import pwd_context
+from .models import User, UserRead
 
 # -------------------------------
 # Config
@@ -18,17 +23,25 @@ SECRET_KEY = os.getenv("AUTH_SECRET_KEY", "dev-secret-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day
 
-# Use Argon2 instead of bcrypt
-pwd_context = CryptContext(
-    schemes=["argon2"],
-    deprecated="auto"
-)
+# Resolved users are cached per (user id, token) for a short while, so an
+# authenticated request does not cost a DB round trip. The TTL also bounds
+# how long another worker can serve a user this worker has invalidated.
+AUTH_USER_CACHE_ENABLED = os.getenv("AUTH_USER_CACHE_ENABLED", "1") != "0"
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "1024"))
+AUTH_USER_CACHE_TTL_S = float(os.getenv("AUTH_USER_CACHE_TTL_S", "60"))
+
+# Read-only routes using get_current_user_claims answer from the signed
+# token alone (no DB, no cache). Off by default: a deleted account keeps
+# working on those routes until its token expires.
+AUTH_TRUST_CLAIMS = os.getenv("AUTH_TRUST_CLAIMS", "0") == "1"
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
 # -------------------------------
 # Password helpers
 # -------------------------------
+# Argon2 settings live in app/password_hashing.py. These sync helpers are
+# for scripts; routes use its async hash_password / verify_and_update.
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
@@ -44,13 +57,17 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-# -------------------------------
-# Current user dependency
-# -------------------------------
-async def get_current_user(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
-    session: Session = Depends(get_session),
-) -> User:
+
+def user_claims(user: User) -> dict:
+    """Token claims for a user. `sub` must be a string for JWT validation."""
+    return {
+        "sub": str(user.id),
+        "email": user.email,
+        "created_at": user.created_at.isoformat(),
+    }
+
+
+def _decode_token(credentials: Optional[HTTPAuthorizationCredentials]) -> Tuple[str, dict, int]:
     if credentials is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -60,14 +77,145 @@ async def get_current_user(
     token = credentials.credentials
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
+        user_id = int(payload.get("sub") or 0)
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
-    except JWTError:
+    except (JWTError, ValueError, TypeError):
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    user = session.get(User, user_id)
+    return token, payload, user_id
+
+# -------------------------------
+# Resolved-user cache
+# -------------------------------
+class UserCache:
+    """Bounded TTL cache of users keyed by (user id, token hash)."""
+
+    def __init__(self, enabled: bool = True, max_entries: int = 1024, ttl_s: float = 60.0):
+        self.enabled = enabled
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[float, User]]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[Tuple[int, str]]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(user_id: int, token: str) -> Tuple[int, str]:
+        return user_id, hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, user_id: int, token: str) -> Optional[User]:
+        if not self.enabled:
+            return None
+
+        key = self._key(user_id, token)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                # A copy, so a route can never mutate the cached user
+                return User(**item[1].model_dump())
+            if item is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def put(self, user_id: int, token: str, user: User) -> None:
+        if not self.enabled:
+            return
+
+        key = self._key(user_id, token)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, User(**user.model_dump()))
+            self._entries.move_to_end(key)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drops every cached token for a user (password change, deletion)."""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._drop(key)
+            self.invalidations += 1
+
+    def _drop(self, key: Tuple[int, str]) -> None:
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "trust_claims": AUTH_TRUST_CLAIMS,
+            }
+
+
+user_cache = UserCache(
+    enabled=AUTH_USER_CACHE_ENABLED,
+    max_entries=AUTH_USER_CACHE_SIZE,
+    ttl_s=AUTH_USER_CACHE_TTL_S,
+)
+metrics.register("auth_user_cache", user_cache.stats)
+
+# -------------------------------
+# Current user dependency
+# -------------------------------
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    session: AsyncSession = Depends(get_async_session),
+) -> User:
+    token, _, user_id = _decode_token(credentials)
+
+    user = user_cache.get(user_id, token)
+    if user is not None:
+        return user
+
+    user = await session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
 
+    user_cache.put(user_id, token, user)
     return user
+
+
+async def get_current_user_claims(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    session: AsyncSession = Depends(get_async_session),
+) -> UserRead:
+    """
+    For read-only routes that only need id/email. With AUTH_TRUST_CLAIMS=1
+    the signed token is the source of truth; otherwise same as
+    get_current_user.
+    """
+    if AUTH_TRUST_CLAIMS:
+        _, payload, user_id = _decode_token(credentials)
+        try:
+            return UserRead(
+                id=user_id,
+                email=payload["email"],
+                created_at=datetime.fromisoformat(payload["created_at"]),
+            )
+        except (KeyError, TypeError, ValueError):
+            # Token issued before these claims existed
+            pass
+
+    user = await get_current_user(credentials, session)
+    return UserRead.model_validate(user)
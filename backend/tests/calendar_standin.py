@@ -0,0 +1,270 @@
+import argparse
+import json
+import re
+import sys
+import threading
+import uuid
+from datetime import datetime, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+# ---------------------------------------------------------
+# Local stand-in for the Google Calendar API
+# ---------------------------------------------------------
+# Just enough of Calendar v3 for the endpoints this backend calls
+# (events insert/get/list/patch/delete, freeBusy, batch requests and an
+# OAuth token endpoint), held in memory. Authorization headers are accepted as-is.
+# Test support only: tests/test_calendar_sync.py runs calendar_client and
+# calendar_sync against it. It can also back a local server by hand:
+#
+#   python tests/calendar_standin.py --port 8765
+#   GOOGLE_CALENDAR_ROOT_URL=http://127.0.0.1:8765/ uvicorn app.main:app
+
+_EVENTS_PATH = re.compile(r"^/calendar/v3/calendars/([^/]+)/events(?:/([^/]+))?$")
+_NOT_FOUND = {"error": {"code": 404, "message": "Not Found"}}
+_BATCH_BOUNDARY = "batch_standin_boundary"
+
+
+def _parse_time(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _split_head(text: str) -> Tuple[str, str, str]:
+    """Splits a header block from its body (CRLF or LF line endings)."""
+    for separator in ("\r\n\r\n", "\n\n"):
+        if separator in text:
+            return text.partition(separator)
+    return text, "", ""
+
+
+def _header(block: str, name: str) -> str:
+    for line in block.splitlines():
+        key, _, value = line.partition(":")
+        if key.strip().lower() == name.lower():
+            return value.strip()
+    return ""
+
+
+def _event_bounds(event: dict) -> Optional[Tuple[datetime, datetime]]:
+    try:
+        return _parse_time(event["start"]["dateTime"]), _parse_time(event["end"]["dateTime"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class CalendarStore:
+    """In-memory calendars: {calendar id: {event id: event}}."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calendars: Dict[str, Dict[str, dict]] = {}
+        self.requests = 0
+        self.batches = 0
+
+    def insert(self, calendar_id: str, body: dict) -> dict:
+        event = dict(body)
+        event["id"] = uuid.uuid4().hex
+        event["status"] = "confirmed"
+        event["htmlLink"] = f"http://calendar.standin/event?eid={event['id']}"
+        event["updated"] = datetime.now(timezone.utc).isoformat()
+        with self.lock:
+            self.calendars.setdefault(calendar_id, {})[event["id"]] = event
+        return event
+
+    def get(self, calendar_id: str, event_id: str) -> Optional[dict]:
+        with self.lock:
+            return self.calendars.get(calendar_id, {}).get(event_id)
+
+    def patch(self, calendar_id: str, event_id: str, body: dict) -> Optional[dict]:
+        with self.lock:
+            event = self.calendars.get(calendar_id, {}).get(event_id)
+            if event is None:
+                return None
+            event.update(body)
+            event["updated"] = datetime.now(timezone.utc).isoformat()
+            return event
+
+    def delete(self, calendar_id: str, event_id: str) -> bool:
+        with self.lock:
+            return self.calendars.get(calendar_id, {}).pop(event_id, None) is not None
+
+    def list(self, calendar_id: str, time_min: Optional[str], time_max: Optional[str]) -> List[dict]:
+        with self.lock:
+            events = list(self.calendars.get(calendar_id, {}).values())
+
+        lower = _parse_time(time_min) if time_min else None
+        upper = _parse_time(time_max) if time_max else None
+        selected = []
+        for event in events:
+            bounds = _event_bounds(event)
+            if bounds and ((lower and bounds[1] <= lower) or (upper and bounds[0] >= upper)):
+                continue
+            selected.append(event)
+        return selected
+
+    def free_busy(self, body: dict) -> dict:
+        calendars = {}
+        for item in body.get("items", []):
+            busy = []
+            for event in self.list(item["id"], body.get("timeMin"), body.get("timeMax")):
+                if _event_bounds(event):
+                    busy.append({"start": event["start"]["dateTime"], "end": event["end"]["dateTime"]})
+            calendars[item["id"]] = {"busy": sorted(busy, key=lambda b: _parse_time(b["start"]))}
+        return {
+            "kind": "calendar#freeBusy",
+            "timeMin": body.get("timeMin"),
+            "timeMax": body.get("timeMax"),
+            "calendars": calendars,
+        }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    store: CalendarStore = CalendarStore()
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    # -----------------------------
+    # Plumbing
+    # -----------------------------
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _json_body(self) -> dict:
+        raw = self._body()
+        return json.loads(raw) if raw else {}
+
+    def _send(self, status: int, payload: Optional[dict] = None) -> None:
+        data = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # -----------------------------
+    # Routes
+    # -----------------------------
+    def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Optional[dict]]:
+        """Handles one API call; shared by plain and batched requests."""
+        self.store.requests += 1
+        url = urlparse(path)
+        query = parse_qs(url.query)
+        payload = json.loads(body) if body else {}
+
+        if method == "POST" and url.path == "/token":
+            return 200, {"access_token": uuid.uuid4().hex, "expires_in": 3600, "token_type": "Bearer"}
+
+        if method == "POST" and url.path == "/calendar/v3/freeBusy":
+            return 200, self.store.free_busy(payload)
+
+        match = _EVENTS_PATH.match(url.path)
+        if not match:
+            return 404, _NOT_FOUND
+
+        calendar_id, event_id = match.groups()
+        if event_id is None and method == "POST":
+            return 200, self.store.insert(calendar_id, payload)
+        if event_id is None and method == "GET":
+            items = self.store.list(calendar_id, query.get("timeMin", [None])[0], query.get("timeMax", [None])[0])
+            return 200, {"kind": "calendar#events", "items": items}
+        if event_id and method == "GET":
+            event = self.store.get(calendar_id, event_id)
+            return (200, event) if event else (404, _NOT_FOUND)
+        if event_id and method == "PATCH":
+            event = self.store.patch(calendar_id, event_id, payload)
+            return (200, event) if event else (404, _NOT_FOUND)
+        if event_id and method == "DELETE" and self.store.delete(calendar_id, event_id):
+            return 204, None
+        return 404, _NOT_FOUND
+
+    def _batch(self) -> None:
+        """
+        multipart/mixed batch: each part is an application/http request;
+        the reply echoes each Content-ID as <response-...>.
+        """
+        self.store.batches += 1
+        boundary = self.headers.get_param("boundary")
+        body = self._body().decode("utf-8")
+
+        parts = []
+        for raw in body.split(f"--{boundary}")[1:]:
+            if raw.startswith("--"):
+                break
+            part_headers, _, http_request = _split_head(raw.strip("\r\n"))
+            content_id = _header(part_headers, "Content-ID").strip("<>")
+
+            request_head, _, request_body = _split_head(http_request)
+            method, path, _ = request_head.splitlines()[0].split(" ", 2)
+            status, payload = self.dispatch(method, path, request_body.encode("utf-8"))
+
+            response_body = json.dumps(payload) if payload is not None else ""
+            parts.append(
+                f"--{_BATCH_BOUNDARY}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                "Content-Type: application/json; charset=UTF-8\r\n"
+                f"Content-Length: {len(response_body.encode('utf-8'))}\r\n\r\n"
+                f"{response_body}\r\n"
+            )
+
+        data = ("".join(parts) + f"--{_BATCH_BOUNDARY}--\r\n").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/mixed; boundary={_BATCH_BOUNDARY}")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method: str) -> None:
+        if method == "POST" and urlparse(self.path).path == "/batch/calendar/v3":
+            self._batch()
+            return
+
+        status, payload = self.dispatch(method, self.path, self._body())
+        self._send(status, payload)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """Starts the stand-in in a daemon thread and returns the server."""
+    server = ThreadingHTTPServer((host, port), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python tests/calendar_standin.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer((args.host, args.port), StandInHandler)
+    print(f"✔ Calendar stand-in listening on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
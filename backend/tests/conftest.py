@@ -0,0 +1,58 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from calendar_standin import CalendarStore, StandInHandler, serve  # noqa: E402
+
+
+# ---------------------------------------------------------
+# Test environment
+# ---------------------------------------------------------
+# app/ reads its configuration from the environment at import time, so
+# the throwaway database and the Calendar stand-in are set up here,
+# before any test module imports the app.
+
+_db_dir = tempfile.mkdtemp(prefix="moodstudy-tests-")
+_standin = serve(port=0)
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db_dir}/test.db")
+os.environ["GOOGLE_CALENDAR_ROOT_URL"] = f"http://127.0.0.1:{_standin.server_address[1]}/"
+os.environ["GOOGLE_TOKEN_URI"] = f"http://127.0.0.1:{_standin.server_address[1]}/token"
+os.environ.setdefault("SCHEDULER_ENABLED", "0")
+
+# Backend dependencies (requirements.txt); tests skip when they are missing
+BACKEND_MODULES = ("sqlmodel", "fastapi", "dotenv", "numpy")
+CALENDAR_MODULES = ("googleapiclient", "google.oauth2.credentials", "google_auth_httplib2", "httplib2")
+
+
+def require(*modules: str) -> None:
+    for module in modules:
+        pytest.importorskip(module)
+
+
+@pytest.fixture
+def db():
+    """The test database with every table and migration, emptied per test."""
+    require(*BACKEND_MODULES)
+    from sqlmodel import SQLModel
+
+    import app.models  # noqa: F401  (registers the tables)
+    from app.database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    yield engine
+    with engine.begin() as conn:
+        for table in reversed(SQLModel.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+
+@pytest.fixture
+def standin():
+    """The Calendar stand-in's store, reset per test."""
+    StandInHandler.store = CalendarStore()
+    return StandInHandler.store
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+
+def test_deleting_an_account_removes_its_calendar_rows(db):
+    from fastapi.testclient import TestClient
+    from sqlmodel import Session, select
+
+    from app.main import app
+    from app.models import CalendarSyncLease, TaskCalendarLink, User
+
+    client = TestClient(app)
+    credentials = {"email": "a@example.com", "password": "correct horse"}
+    user_id = client.post("/auth/signup", json=credentials).json()["id"]
+    token = client.post("/auth/login", json=credentials).json()["access_token"]
+
+    with Session(db) as session:
+        now = datetime.utcnow()
+        session.add(TaskCalendarLink(user_id=user_id, task_id=1, calendar_id="primary", event_id="event-1",
+                                     synced_task_updated_at=now, synced_at=now))
+        session.add(CalendarSyncLease(user_id=user_id))
+        session.commit()
+
+    response = client.delete("/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 204
+
+    with Session(db) as session:
+        assert session.get(User, user_id) is None
+        assert session.exec(select(TaskCalendarLink)).all() == []
+        assert session.exec(select(CalendarSyncLease)).all() == []
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import CALENDAR_MODULES, require
+
+
+@pytest.fixture
+def calendar(db, standin):
+    """(calendar_sync, service, credentials) talking to the stand-in."""
+    require(*CALENDAR_MODULES)
+    from google.oauth2.credentials import Credentials
+
+    from app import calendar_client, calendar_sync
+
+    credentials = Credentials(token="standin-token")
+    service, credentials = calendar_client.service_cache.get("tests", object(), lambda: credentials)
+    return calendar_sync, service, credentials
+
+
+def _user(session, email):
+    from app.models import User
+
+    user = User(email=email, hashed_password="x")
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    return user.id
+
+
+def _tasks(session, count):
+    from app.models import Task
+
+    due = datetime(2030, 1, 7, 10, 0)
+    tasks = [Task(title=f"Task {i}", due_datetime=due + timedelta(hours=i)) for i in range(count)]
+    session.add_all(tasks)
+    session.commit()
+    return [task.id for task in tasks]
+
+
+def _sync(calendar, user_id, **params):
+    from sqlmodel import Session
+
+    from app.database import engine
+    from app.models import CalendarSyncRequest
+
+    calendar_sync, service, credentials = calendar
+    with Session(engine, expire_on_commit=False) as session:
+        return calendar_sync.sync_tasks(session, service, credentials, user_id, CalendarSyncRequest(**params))
+
+
+def test_sync_inserts_updates_and_deletes_in_batches(db, calendar, standin, monkeypatch):
+    from sqlmodel import Session
+
+    from app.models import Task
+
+    monkeypatch.setattr(calendar[0], "CALENDAR_BATCH_SIZE", 2)
+    with Session(db) as session:
+        user_id = _user(session, "a@example.com")
+        task_ids = _tasks(session, 3)
+
+    result = _sync(calendar, user_id)
+    assert (result.inserted, result.updated, result.deleted, result.failed) == (3, 0, 0, 0)
+    assert result.batches == 2
+    assert len(standin.calendars["primary"]) == 3
+
+    # Nothing changed: no calendar calls at all
+    assert _sync(calendar, user_id).batches == 0
+
+    with Session(db) as session:
+        renamed = session.get(Task, task_ids[0])
+        renamed.title = "Renamed"
+        renamed.updated_at = datetime.utcnow()
+        session.add(renamed)
+        session.delete(session.get(Task, task_ids[1]))
+        session.commit()
+
+    result = _sync(calendar, user_id)
+    assert (result.inserted, result.updated, result.deleted, result.failed) == (0, 1, 1, 0)
+    titles = sorted(event["summary"] for event in standin.calendars["primary"].values())
+    assert titles == ["Renamed", "Task 2"]
+
+
+def test_event_deleted_on_the_calendar_is_recreated(db, calendar, standin):
+    from sqlmodel import Session
+
+    with Session(db) as session:
+        user_id = _user(session, "a@example.com")
+        _tasks(session, 1)
+
+    _sync(calendar, user_id)
+    standin.calendars["primary"].clear()
+
+    result = _sync(calendar, user_id, full=True)
+    assert (result.inserted, result.failed) == (1, 0)
+    assert len(standin.calendars["primary"]) == 1
+
+
+def test_links_are_kept_per_user(db, calendar, standin):
+    from sqlmodel import Session, select
+
+    from app.models import TaskCalendarLink
+
+    with Session(db) as session:
+        first = _user(session, "a@example.com")
+        second = _user(session, "b@example.com")
+        _tasks(session, 2)
+
+    assert _sync(calendar, first).inserted == 2
+    # The second user's calendar gets its own events, not PATCHes of the first's
+    result = _sync(calendar, second)
+    assert (result.inserted, result.updated) == (2, 0)
+
+    with Session(db) as session:
+        links = session.exec(select(TaskCalendarLink)).all()
+    assert sorted(link.user_id for link in links) == [first, first, second, second]
+    assert len({link.event_id for link in links}) == 4
+
+
+def test_free_busy_through_the_pooled_client(calendar, standin):
+    from app import calendar_client
+
+    _, service, credentials = calendar
+    calendar_client.execute(service.events().insert(calendarId="primary", body={
+        "summary": "Lecture",
+        "start": {"dateTime": "2030-01-07T09:00:00+05:30"},
+        "end": {"dateTime": "2030-01-07T11:00:00+05:30"},
+    }), credentials)
+
+    response = calendar_client.execute(service.freebusy().query(body={
+        "timeMin": "2030-01-07T00:00:00+05:30",
+        "timeMax": "2030-01-08T00:00:00+05:30",
+        "items": [{"id": "primary"}],
+    }), credentials)
+    assert response["calendars"]["primary"]["busy"] == [
+        {"start": "2030-01-07T09:00:00+05:30", "end": "2030-01-07T11:00:00+05:30"},
+    ]
@@ -0,0 +1,78 @@
+from datetime import date
+
+import pytest
+
+
+@pytest.fixture
+def enrichment(db, monkeypatch):
+    """journal_enrichment with the models stubbed and re-queues recorded."""
+    from app import chat_ai, journal_embeddings, journal_enrichment
+
+    queued = []
+    monkeypatch.setattr(journal_enrichment, "enqueue", lambda entry_id, delay=0.0: queued.append(entry_id))
+    monkeypatch.setattr(journal_embeddings, "JOURNAL_EMBEDDINGS_ENABLED", False)
+    monkeypatch.setattr(chat_ai, "request_reflection_text", lambda text, label=None: "A reflection.")
+    monkeypatch.setattr(journal_enrichment, "queued", queued, raising=False)
+    return journal_enrichment
+
+
+def _entry_with_job(db, **job):
+    from sqlmodel import Session
+
+    from app.models import JournalEnrichmentJob, JournalEntry
+
+    with Session(db) as session:
+        entry = JournalEntry(date=date(2030, 1, 7), content="Exams tomorrow and I feel ready.")
+        session.add(entry)
+        session.commit()
+        session.add(JournalEnrichmentJob(entry_id=entry.id, **job))
+        session.commit()
+        return entry.id
+
+
+def _load(db, entry_id):
+    from sqlmodel import Session
+
+    from app.models import JournalEnrichmentJob, JournalEntry
+
+    with Session(db) as session:
+        return session.get(JournalEntry, entry_id), session.get(JournalEnrichmentJob, entry_id)
+
+
+def test_model_outage_retries_instead_of_storing_no_label(db, enrichment, monkeypatch):
+    from app import emotion
+
+    monkeypatch.setattr(emotion, "analyze_emotion_text", lambda text: {"label": None, "score": None})
+    entry_id = _entry_with_job(db)
+
+    enrichment._run_job(entry_id)
+
+    entry, job = _load(db, entry_id)
+    assert (job.status, job.attempts) == ("pending", 1)
+    assert entry.emotion_label is None and entry.ai_reflection is None
+    assert enrichment.queued == [entry_id]
+
+
+def test_label_and_reflection_are_stored(db, enrichment, monkeypatch):
+    from app import emotion
+
+    monkeypatch.setattr(emotion, "analyze_emotion_text", lambda text: {"label": "joy", "score": 0.9})
+    entry_id = _entry_with_job(db)
+
+    enrichment._run_job(entry_id)
+
+    entry, job = _load(db, entry_id)
+    assert job.status == "done"
+    assert (entry.emotion_label, entry.ai_reflection) == ("joy", "A reflection.")
+
+
+def test_sweep_requeues_jobs_left_running_by_a_dead_process(db, enrichment):
+    from datetime import datetime, timedelta
+
+    stale = _entry_with_job(db, status="running", updated_at=datetime.utcnow() - timedelta(hours=1))
+    live = _entry_with_job(db, status="running", updated_at=datetime.utcnow())
+
+    assert enrichment.sweep_stale_jobs() == 1
+    assert enrichment.queued == [stale]
+    assert _load(db, stale)[1].status == "pending"
+    assert _load(db, live)[1].status == "running"
@@ -0,0 +1,47 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+
+CONTENT = "Studied <script>alert(1)</script> for the exam & felt calm"
+
+
+@pytest.fixture
+def search(db):
+    """Runs a search function through the sync-session adapter."""
+    from sqlmodel import Session
+
+    from app.database import SyncSessionAdapter
+    from app.models import JournalEntry
+    from app.pagination import PageParams
+
+    with Session(db) as session:
+        session.add(JournalEntry(date=date(2030, 1, 7), content=CONTENT, ai_reflection="<img src=x onerror=alert(1)> exam tips"))
+        session.commit()
+
+    def run(function, query):
+        from app import journal_search
+
+        with Session(db) as session:
+            hits, _, _ = asyncio.run(function(
+                SyncSessionAdapter(session),
+                journal_search.search_terms(query),
+                PageParams(cursor=None, limit=10, include_total=False),
+            ))
+        return hits
+
+    return run
+
+
+@pytest.mark.parametrize("function", ["search_fts", "search_like"])
+def test_snippets_escape_entry_text(search, function):
+    from app import journal_search
+
+    for query, field in (("exam", "<script>"), ("tips", "<img")):
+        [hit] = search(getattr(journal_search, function), query)
+        assert field not in hit["snippet"]
+        assert f"<mark>{query}</mark>" in hit["snippet"]
+    [hit] = search(getattr(journal_search, function), "exam")
+    assert "&lt;script&gt;" in hit["snippet"]
+    assert "&amp;" in hit["snippet"]
@@ -0,0 +1,63 @@
+import pytest
+
+from conftest import BACKEND_MODULES, require
+
+
+def test_hot_queries_use_an_index(db):
+    from app.migrations import check_query_plans
+
+    assert check_query_plans(db) == []
+
+
+def test_duplicate_emails_are_reported_before_the_unique_index(tmp_path):
+    require(*BACKEND_MODULES)
+    from sqlmodel import Session, SQLModel, create_engine
+
+    import app.models  # noqa: F401  (registers the tables)
+    from app.migrations import MigrationError, applied_versions, run_migrations
+    from app.models import User
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'duplicates.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([
+            User(email="same@example.com", hashed_password="x"),
+            User(email="same@example.com", hashed_password="y"),
+            User(email="other@example.com", hashed_password="z"),
+        ])
+        session.commit()
+
+    with pytest.raises(MigrationError, match=r"user\.email.*'same@example.com' \(2 rows\)"):
+        run_migrations(engine)
+    assert 1 not in applied_versions(engine)
+
+
+def test_calendar_links_move_to_the_single_connected_user(db):
+    from sqlalchemy import inspect, text
+    from sqlmodel import Session, select
+
+    from app.migrations import _m006_calendar_links_per_user
+    from app.models import TaskCalendarLink
+
+    with db.begin() as conn:
+        # taskcalendarlink as created before links were kept per user
+        conn.execute(text("DROP TABLE taskcalendarlink"))
+        conn.execute(text(
+            "CREATE TABLE taskcalendarlink (task_id INTEGER PRIMARY KEY, calendar_id VARCHAR,"
+            " event_id VARCHAR, synced_task_updated_at DATETIME, synced_at DATETIME)"
+        ))
+        conn.execute(text(
+            "INSERT INTO taskcalendarlink VALUES"
+            " (7, 'primary', 'event-7', '2024-01-01 10:00:00.000000', '2024-01-01 10:05:00.000000')"
+        ))
+        user_id = conn.execute(text(
+            "INSERT INTO user (email, hashed_password, created_at, google_refresh_token)"
+            " VALUES ('a@example.com', 'x', '2024-01-01 00:00:00.000000', 'refresh') RETURNING id"
+        )).scalar()
+
+        _m006_calendar_links_per_user(conn)
+        assert inspect(conn).get_pk_constraint("taskcalendarlink")["constrained_columns"] == ["user_id", "task_id"]
+
+    with Session(db) as session:
+        link = session.exec(select(TaskCalendarLink)).one()
+    assert (link.user_id, link.task_id, link.event_id) == (user_id, 7, "event-7")
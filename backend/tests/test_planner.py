@@ -0,0 +1,86 @@
+from app.planner import HIGH, LOW, MEDIUM, Block, PlanTask, energy_for_mood, free_slots, pack
+
+DAY = (540, 1260)  # 09:00-21:00
+
+
+def test_free_slots_skip_busy_time_and_the_past():
+    busy = [(600, 660), (630, 700), (1200, 1500), (1950, 2040)]
+    assert free_slots(2, *DAY, busy, not_before=560) == [
+        (560, 600, 0),
+        (700, 1200, 0),
+        (2040, 2700, 1),
+    ]
+    # A day whose window has already passed gets no slot
+    assert free_slots(2, *DAY, [], not_before=1300) == [(1980, 2700, 1)]
+
+
+def test_long_tasks_are_split_into_blocks_with_breaks():
+    tasks = [PlanTask(1, "essay", 2000, 150, MEDIUM)]
+    blocks, remaining, expired = pack(tasks, free_slots(1, *DAY, []), [MEDIUM], 1440)
+    assert blocks == [Block(0, 540, 630, False), Block(0, 640, 700, False)]
+    assert remaining == [0]
+    assert expired == []
+
+
+def test_overdue_tasks_are_still_planned_and_marked_late():
+    tasks = [PlanTask(1, "report", -60, 30, MEDIUM)]
+    blocks, remaining, expired = pack(tasks, free_slots(1, *DAY, []), [MEDIUM], 1440)
+    assert blocks == [Block(0, 540, 570, True)]
+    assert remaining == [0]
+    assert expired == []
+
+
+def test_task_without_time_before_its_due_time_expires():
+    # Ten minutes before the due time is less than a minimum block
+    tasks = [PlanTask(1, "quiz", 550, 60, MEDIUM)]
+    blocks, remaining, expired = pack(tasks, free_slots(1, *DAY, []), [MEDIUM], 1440)
+    assert blocks == []
+    assert remaining == [60]
+    assert expired == [0]
+
+
+def test_task_running_past_its_due_time_keeps_the_rest_unplanned():
+    tasks = [PlanTask(1, "quiz", 570, 60, MEDIUM)]
+    blocks, remaining, expired = pack(tasks, free_slots(1, *DAY, []), [MEDIUM], 1440)
+    assert blocks == [Block(0, 540, 570, False)]
+    assert remaining == [30]
+    assert expired == [0]
+
+
+def test_easier_work_comes_before_harder_work():
+    tasks = [PlanTask(1, "proofs", None, 90, HIGH), PlanTask(2, "flashcards", None, 30, LOW)]
+    blocks, _, _ = pack(tasks, free_slots(1, *DAY, []), [MEDIUM], 1440)
+    assert [block.task_index for block in blocks] == [1, 0]
+
+
+def test_low_energy_days_get_no_harder_work():
+    tasks = [PlanTask(1, "proofs", None, 90, HIGH), PlanTask(2, "flashcards", None, 30, LOW)]
+    blocks, remaining, _ = pack(tasks, free_slots(1, *DAY, []), [LOW], 1440)
+    assert [block.task_index for block in blocks] == [1]
+    assert remaining == [90, 0]
+
+
+def test_urgent_task_goes_first_whatever_its_energy():
+    tasks = [PlanTask(1, "reading", None, 60, MEDIUM), PlanTask(2, "exam prep", 1200, 90, HIGH)]
+    blocks, _, _ = pack(tasks, free_slots(1, *DAY, []), [MEDIUM], 1440)
+    assert blocks[0] == Block(1, 540, 630, False)
+
+
+def test_undated_task_is_not_urgent_at_the_end_of_the_window():
+    tasks = [PlanTask(1, "essay", None, 60, HIGH)]
+    blocks, remaining, expired = pack(tasks, free_slots(2, *DAY, []), [LOW, LOW], 2880)
+    assert blocks == []
+    assert remaining == [60]
+    assert expired == []
+
+
+def test_energy_for_mood():
+    assert energy_for_mood(" Happy ") == HIGH
+    assert energy_for_mood("tired") == LOW
+    # A confident emotion label pulls the mood toward its own energy, rounding down
+    assert energy_for_mood("happy", "sadness", 0.9) == MEDIUM
+    assert energy_for_mood("happy", "sadness", 0.3) == HIGH
+    # Unknown moods fall back to the emotion label, then to medium
+    assert energy_for_mood("meh", "fear", 0.2) == LOW
+    assert energy_for_mood("meh") == MEDIUM
+    assert energy_for_mood(None) == MEDIUM
@@ -0,0 +1,32 @@
+from datetime import date
+
+from conftest import require
+
+
+def test_archived_moods_survive_repeated_resets_and_rollup_rebuilds(db, monkeypatch):
+    require("apscheduler")
+    from sqlmodel import Session, select
+
+    from app import analytics, scheduler
+    from app.models import AnalyticsDailyRollup, Mood, MoodArchive
+
+    monkeypatch.setattr(scheduler, "SCHEDULER_ARCHIVE_MOODS", True)
+    today = date.today()
+
+    # SQLite hands the deleted (newest) mood ids out again
+    for mood in ("tired", "happy"):
+        with Session(db) as session:
+            session.add(Mood(date=today, mood=mood))
+            session.commit()
+        assert scheduler._delete_moods_for(today) == 1
+
+    with Session(db) as session:
+        archived = session.exec(select(MoodArchive).order_by(MoodArchive.id)).all()
+    assert [mood.mood for mood in archived] == ["tired", "happy"]
+    assert archived[0].mood_id == archived[1].mood_id
+
+    with db.begin() as conn:
+        analytics.rebuild_rollups(conn)
+    with Session(db) as session:
+        rollups = session.exec(select(AnalyticsDailyRollup).where(AnalyticsDailyRollup.source == "mood")).all()
+    assert sorted((row.mood, row.entries) for row in rollups) == [("happy", 1), ("tired", 1)]
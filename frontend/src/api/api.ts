@@ -30,6 +30,26 @@ async function handleResponse<T>(res: Response): Promise<T> {
   return res.json() as Promise<T>;
 }
 
+// List endpoints are cursor-paginated: follow X-Next-Cursor until the
+// last page so callers still get the full list.
+const PAGE_LIMIT = 500;
+
+async function fetchAllPages<T>(path: string): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | null = null;
+
+  do {
+    const params = new URLSearchParams({ limit: String(PAGE_LIMIT) });
+    if (cursor) params.set("cursor", cursor);
+
+    const res = await fetch(`${BASE_URL}${path}?${params}`);
+    items.push(...(await handleResponse<T[]>(res)));
+    cursor = res.headers.get("X-Next-Cursor");
+  } while (cursor);
+
+  return items;
+}
+
 // =====================================================
 // API OBJECT
 // =====================================================
@@ -70,8 +90,7 @@ export const api = {
   // MOODS
   // ------------------------------
   async getMoods(): Promise<MoodEntry[]> {
-    const res = await fetch(`${BASE_URL}/mood/`);
-    return handleResponse(res);
+    return fetchAllPages<MoodEntry>("/mood/");
   },
 
   async createMood(payload: {
@@ -93,8 +112,7 @@ export const api = {
   // TASKS
   // ------------------------------
   async getTasks(): Promise<Task[]> {
-    const res = await fetch(`${BASE_URL}/tasks/`);
-    return handleResponse(res);
+    return fetchAllPages<Task>("/tasks/");
   },
 
   async createTask(payload: {
@@ -139,8 +157,7 @@ export const api = {
   // JOURNAL
   // ------------------------------
   async getJournal(): Promise<JournalEntry[]> {
-    const res = await fetch(`${BASE_URL}/journal/`);
-    return handleResponse(res);
+    return fetchAllPages<JournalEntry>("/journal/");
   },
 
   async createJournal(payload: {
@@ -197,12 +214,16 @@ export const api = {
   // GOOGLE CALENDAR (correct backend paths)
   // ------------------------------
   async getGoogleCalendarStatus(): Promise<{ connected: boolean }> {
-    const res = await fetch(`${BASE_URL}/google-calendar/status`);
+    const res = await fetch(`${BASE_URL}/google-calendar/status`, {
+      headers: { ...authHeader() },
+    });
     return handleResponse(res);
   },
 
   async getGoogleAuthUrl(): Promise<{ auth_url: string }> {
-    const res = await fetch(`${BASE_URL}/google-calendar/auth-url`);
+    const res = await fetch(`${BASE_URL}/google-calendar/auth-url`, {
+      headers: { ...authHeader() },
+    });
     return handleResponse(res);
   },
 
@@ -224,7 +245,7 @@ export const api = {
   }) {
     const res = await fetch(`${BASE_URL}/google-calendar/events`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: { "Content-Type": "application/json", ...authHeader() },
       body: JSON.stringify(payload),
     });
     return handleResponse(res);